@@ -0,0 +1,171 @@
+"""
+Table-driven disorder indicators for emotion analysis reports.
+
+Indicator rules are data (disorder_rules.json next to this module, plus any
+*.json files in the directory named by DISORDER_RULES_DIR), so clinicians can
+add indicators without touching code. A rule file looks like:
+
+    {"rules": [
+        {"indicator": "Panic Disorder", "all": [{"emotion": "panic"}]},
+        {"indicator": "Mixed anxiety-depression",
+         "all": [{"emotion": "anxiety", "min_count": 2},
+                 {"emotion": "sadness", "min_confidence": 0.7}]},
+        {"indicator": "Acute distress",
+         "any": [{"emotion": "panic", "crisis": true},
+                 {"emotion": "trauma", "crisis": true}]}
+    ]}
+
+A condition holds when at least min_count (default 1) report entries have
+the emotion, a confidence of at least min_confidence (default 0) and, with
+"crisis": true, are flagged as a crisis. A rule fires when all of its "all"
+conditions and at least one of its "any" conditions hold. Indicators are
+reported in rule order: the default file first, then the extra files by name.
+
+Detection makes one pass over the report, counting entries against the
+conditions of their emotion only, and then checks just the rules that
+mention an emotion present in the report.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import glob
+import json
+import os
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "disorder_rules.json")
+
+# (min_confidence, crisis only) of a counted condition
+_Filter = Tuple[float, bool]
+
+
+class DisorderRuleSet:
+    """Compiled indicator rules."""
+
+    def __init__(self, rules: Sequence[Dict[str, Any]]):
+        """
+        Args:
+            rules: Rule dicts as in the rule files
+
+        Raises:
+            ValueError: If a rule is malformed
+        """
+        self.indicators: List[str] = []
+        # Per rule: (slots and min counts that must all hold, ... of which one must hold)
+        self._rules: List[Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]] = []
+        # emotion -> [(filter, slot)]; one counter slot per distinct filter of an emotion
+        self._filters: Dict[str, List[Tuple[_Filter, int]]] = {}
+        # emotion -> indices of the rules that mention it
+        self._rules_by_emotion: Dict[str, List[int]] = {}
+        slots: Dict[Tuple[str, _Filter], int] = {}
+
+        for number, rule in enumerate(rules):
+            indicator = rule.get("indicator")
+            if not isinstance(indicator, str) or not indicator:
+                raise ValueError(f"Rule {number} has no indicator: {rule!r}")
+            all_of, any_of = rule.get("all", []), rule.get("any", [])
+            if not all_of and not any_of:
+                raise ValueError(f"Rule {indicator!r} has no conditions")
+
+            compiled = []
+            for conditions in (all_of, any_of):
+                checks = []
+                for condition in conditions:
+                    emotion, condition_filter, min_count = self._parse_condition(indicator, condition)
+                    key = (emotion, condition_filter)
+                    if key not in slots:
+                        slots[key] = len(slots)
+                        self._filters.setdefault(emotion, []).append((condition_filter, slots[key]))
+                    checks.append((slots[key], min_count))
+                    rule_ids = self._rules_by_emotion.setdefault(emotion, [])
+                    if not rule_ids or rule_ids[-1] != len(self._rules):
+                        rule_ids.append(len(self._rules))
+                compiled.append(checks)
+            self.indicators.append(indicator)
+            self._rules.append((compiled[0], compiled[1]))
+        self._slot_count = len(slots)
+
+    @staticmethod
+    def _parse_condition(indicator: str, condition: Dict[str, Any]) -> Tuple[str, _Filter, int]:
+        emotion = condition.get("emotion") if isinstance(condition, dict) else None
+        if not isinstance(emotion, str):
+            raise ValueError(f"Rule {indicator!r} has a condition without an emotion: {condition!r}")
+        min_count = condition.get("min_count", 1)
+        min_confidence = condition.get("min_confidence", 0.0)
+        if not isinstance(min_count, int) or min_count < 1:
+            raise ValueError(f"Rule {indicator!r}: min_count must be a positive integer, got {min_count!r}")
+        if not isinstance(min_confidence, (int, float)):
+            raise ValueError(f"Rule {indicator!r}: min_confidence must be a number, got {min_confidence!r}")
+        return emotion, (float(min_confidence), bool(condition.get("crisis", False))), min_count
+
+    def detect(self, analysis_report: List[Dict[str, Any]]) -> List[str]:
+        """
+        Indicators of the rules the report satisfies.
+
+        Args:
+            analysis_report: Entries with 'emotion' (and 'confidence' /
+                'is_crisis' where a rule filters on them)
+
+        Returns:
+            Indicator names in rule order
+        """
+        counts = [0] * self._slot_count
+        seen = set()
+        filters = self._filters
+        for entry in analysis_report:
+            emotion = entry['emotion']
+            emotion_filters = filters.get(emotion)
+            if emotion_filters is None:
+                continue
+            seen.add(emotion)
+            for (min_confidence, crisis), slot in emotion_filters:
+                if (min_confidence <= 0 or entry['confidence'] >= min_confidence) and (not crisis or entry['is_crisis']):
+                    counts[slot] += 1
+
+        candidates = sorted({rule_id for emotion in seen for rule_id in self._rules_by_emotion[emotion]})
+        indicators = []
+        for rule_id in candidates:
+            all_of, any_of = self._rules[rule_id]
+            if all(counts[slot] >= min_count for slot, min_count in all_of) and \
+                    (not any_of or any(counts[slot] >= min_count for slot, min_count in any_of)):
+                indicators.append(self.indicators[rule_id])
+        return indicators
+
+
+def load_rule_files(paths: Sequence[str]) -> DisorderRuleSet:
+    """
+    Compile the rules of several files, in order.
+
+    Raises:
+        ValueError: If a file isn't a valid rule file
+    """
+    rules: List[Dict[str, Any]] = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Can't read disorder rules from {path}: {e}")
+        file_rules = data.get("rules") if isinstance(data, dict) else data
+        if not isinstance(file_rules, list):
+            raise ValueError(f"{path} has no list of rules")
+        rules.extend(file_rules)
+    return DisorderRuleSet(rules)
+
+
+def rule_paths() -> List[str]:
+    """The default rule file followed by the files in DISORDER_RULES_DIR, by name."""
+    paths = [DEFAULT_RULES_PATH]
+    extra_dir = os.environ.get("DISORDER_RULES_DIR")
+    if extra_dir:
+        paths.extend(sorted(glob.glob(os.path.join(extra_dir, "*.json"))))
+    return paths
+
+
+_rule_set: Optional[DisorderRuleSet] = None
+
+
+def get_rule_set() -> DisorderRuleSet:
+    """Shared rule set, loaded on first use."""
+    global _rule_set
+    if _rule_set is None:
+        _rule_set = load_rule_files(rule_paths())
+    return _rule_set
@@ -17,6 +17,28 @@ try:
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
 
+# Keywords that are always treated as a crisis, whatever the model predicts
+CRISIS_KEYWORDS = [
+    "suicide", "kill myself", "end it all", "end my life",
+    "want to die", "better off dead", "can't go on", "no reason to live"
+]
+
+# Map emotion to valence (positive/negative scale)
+EMOTION_VALENCE = {
+    # Positive emotions
+    "joy": 0.8, "contentment": 0.7, "excitement": 0.8, "pride": 0.7,
+    "gratitude": 0.8, "love": 0.9, "hope": 0.7,
+    
+    # Neutral emotions
+    "surprise": 0.0, "confusion": -0.1, "neutral": 0.0,
+    
+    # Negative emotions
+    "sadness": -0.7, "fear": -0.7, "anger": -0.7, "disgust": -0.6,
+    "anxiety": -0.7, "frustration": -0.6, "guilt": -0.6,
+    "hopelessness": -0.9, "loneliness": -0.7, "grief": -0.8,
+    "dread": -0.7, "embarrassment": -0.5
+}
+
 
 class EmotionAnalyzer:
     """
@@ -237,6 +259,63 @@ class EmotionAnalyzer:
         Returns:
             Dictionary with detected emotion, confidence, and metadata
         """
+        screened = self._screen_text(text)
+        if screened is not None:
+            return screened
+        
+        # Analyze with primary analyzer (ML or hybrid)
+        try:
+            result = self.analyzer(text)[0]
+            return self._build_result(result["label"], result["score"])
+        except Exception as e:
+            print(f"Error in emotion analysis: {e}")
+            return self._fallback_result()
+    
+    def analyze_batch(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, Any]]:
+        """
+        Analyze many texts, running the model on batches instead of one text at a time.
+        
+        Results are the same as calling analyze() on each text.
+        
+        Args:
+            texts: The texts to analyze
+            batch_size: Number of texts per model forward pass
+            
+        Returns:
+            One result dictionary per text, in order
+        """
+        results: List[Optional[Dict[str, Any]]] = [self._screen_text(text) for text in texts]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        if self.analyzer == self._hybrid_emotion_analyzer:
+            for i in pending:
+                results[i] = self.analyze(texts[i])
+            return results
+        
+        try:
+            predictions = self.analyzer([texts[i] for i in pending], batch_size=batch_size, truncation=True)
+        except Exception as e:
+            print(f"Error in batch emotion analysis, analyzing texts individually: {e}")
+            for i in pending:
+                results[i] = self.analyze(texts[i])
+            return results
+        
+        for i, prediction in zip(pending, predictions):
+            # Pipelines return a list of labels per text when asked for more than one
+            if isinstance(prediction, list):
+                prediction = prediction[0]
+            results[i] = self._build_result(prediction["label"], prediction["score"])
+        return results
+    
+    def _screen_text(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Results decided without the model: very short texts and crisis keywords.
+        
+        Returns:
+            The result, or None if the text needs the model
+        """
         # Skip analysis for very short texts
         if len(text.strip()) < 3:
             return {
@@ -248,12 +327,7 @@ class EmotionAnalyzer:
             }
         
         # Check for crisis keywords first (safety measure)
-        crisis_keywords = [
-            "suicide", "kill myself", "end it all", "end my life",
-            "want to die", "better off dead", "can't go on", "no reason to live"
-        ]
-        
-        if any(keyword in text.lower() for keyword in crisis_keywords):
+        if any(keyword in text.lower() for keyword in CRISIS_KEYWORDS):
             return {
                 "emotion": "crisis",
                 "confidence": 0.95,
@@ -262,53 +336,34 @@ class EmotionAnalyzer:
                 "intensity": 0.9
             }
         
-        # Analyze with primary analyzer (ML or hybrid)
-        try:
-            result = self.analyzer(text)[0]
-            emotion = result["label"] 
-            confidence = result["score"]
-            
-            # Map emotion to valence (positive/negative scale)
-            valence_map = {
-                # Positive emotions
-                "joy": 0.8, "contentment": 0.7, "excitement": 0.8, "pride": 0.7,
-                "gratitude": 0.8, "love": 0.9, "hope": 0.7,
-                
-                # Neutral emotions
-                "surprise": 0.0, "confusion": -0.1, "neutral": 0.0,
-                
-                # Negative emotions
-                "sadness": -0.7, "fear": -0.7, "anger": -0.7, "disgust": -0.6,
-                "anxiety": -0.7, "frustration": -0.6, "guilt": -0.6,
-                "hopelessness": -0.9, "loneliness": -0.7, "grief": -0.8,
-                "dread": -0.7, "embarrassment": -0.5
-            }
-            
-            valence = valence_map.get(emotion, 0.0)
-            
-            # Determine if this is a potential crisis  
-            is_crisis = (
-                emotion in ["hopelessness", "sadness", "fear"] and confidence > 0.8
-            )
-            
-            return {
-                "emotion": emotion,
-                "confidence": confidence,
-                "valence": valence,
-                "is_crisis": is_crisis,
-                "intensity": abs(valence) * confidence
-            }
-            
-        except Exception as e:
-            print(f"Error in emotion analysis: {e}")
-            # Fall back to a safe neutral response
-            return {
-                "emotion": "neutral",
-                "confidence": 0.5,
-                "valence": 0.0,
-                "is_crisis": False,
-                "intensity": 0.1
-            }
+        return None
+    
+    def _build_result(self, emotion: str, confidence: float) -> Dict[str, Any]:
+        """Derive valence, crisis flag and intensity from a predicted emotion."""
+        valence = EMOTION_VALENCE.get(emotion, 0.0)
+        
+        # Determine if this is a potential crisis  
+        is_crisis = (
+            emotion in ["hopelessness", "sadness", "fear"] and confidence > 0.8
+        )
+        
+        return {
+            "emotion": emotion,
+            "confidence": confidence,
+            "valence": valence,
+            "is_crisis": is_crisis,
+            "intensity": abs(valence) * confidence
+        }
+    
+    def _fallback_result(self) -> Dict[str, Any]:
+        """A safe neutral response for when analysis fails."""
+        return {
+            "emotion": "neutral",
+            "confidence": 0.5,
+            "valence": 0.0,
+            "is_crisis": False,
+            "intensity": 0.1
+        }
     
     def download_models_for_offline(self) -> bool:
         """
@@ -2,6 +2,8 @@
 
 from emotion_questions import questions
 from emotion_analysis import EmotionAnalyzer
+from questionnaire_scoring import get_scorer
+from disorder_rules import get_rule_set
 import json
 from typing import Dict, List, Any
 import os
@@ -42,133 +44,22 @@ class EmotionReportGenerator:
 
     def analyze_responses(self, responses: List[str]):
         """Analyze the emotional content of responses with enhanced precision."""
-        try:
-            # Parse responses with safe integer conversion
-            def safe_int(value, default=5):
-                try:
-                    if value is None or value.lower() == 'none':
-                        return default
-                    return int(value)
-                except (ValueError, TypeError):
-                    return default
-
-            # Parse responses with safe conversion
-            mood = safe_int(responses[0])
-            anxiety = responses[1].lower() if responses[1] else 'none'
-            sleep_quality = safe_int(responses[2])
-            energy_levels = safe_int(responses[3])
-            physical_symptoms = responses[4].lower() if responses[4] else 'none'
-            concentration = safe_int(responses[5])
-            self_care = responses[6].lower() if responses[6] else 'none'
-            social_interactions = safe_int(responses[7])
-            intrusive_thoughts = responses[8].lower() if responses[8] else 'none'
-            optimism = safe_int(responses[9])
-            stress_factors = responses[10] if responses[10] else ''
-            coping_strategies = responses[11] if responses[11] else ''
-            social_support = safe_int(responses[12])
-            self_harm = responses[13].lower() if responses[13] else 'none'
-            professional_discussion = responses[14] if responses[14] else ''
-
-            # Enhanced emotion mapping with detailed analysis
-            emotions_count = {}
-            
-            # Detailed mood analysis
-            if mood >= 8:
-                emotions_count['joyful'] = 2
-                emotions_count['energetic'] = 1
-                emotions_count['optimistic'] = 1
-            elif mood >= 6:
-                emotions_count['content'] = 2
-                emotions_count['stable'] = 1
-            elif mood >= 4:
-                emotions_count['neutral'] = 1
-                emotions_count['uncertain'] = 1
-            elif mood >= 2:
-                emotions_count['sad'] = 1
-                emotions_count['discouraged'] = 1
-            else:
-                emotions_count['depressed'] = 2
-                emotions_count['hopeless'] = 1
+        return self.analyze_responses_batch([responses])[0]
 
-            # Detailed anxiety analysis
-            anxiety_emotions = {
-                'none': {'calm': 2, 'relaxed': 1},
-                'mild': {'anxious': 1, 'uneasy': 1},
-                'moderate': {'anxious': 2, 'stressed': 1, 'worried': 1},
-                'severe': {'anxious': 2, 'panicked': 1, 'overwhelmed': 2}
-            }
-            
-            for emotion, count in anxiety_emotions.get(anxiety, {}).items():
-                emotions_count[emotion] = emotions_count.get(emotion, 0) + count
+    def analyze_responses_batch(self, responses_list: List[List[str]]) -> List[Dict[str, Any]]:
+        """
+        Analyze many questionnaires at once.
 
-            # Calculate risk factors
-            risk_factors = []
-            crisis_count = 0
-
-            # Analyze risk factors
-            if sleep_quality <= 3:
-                risk_factors.append("Poor sleep quality")
-                crisis_count += 1
-            if energy_levels <= 3:
-                risk_factors.append("Low energy levels")
-            if physical_symptoms in ['moderate', 'severe']:
-                risk_factors.append("Significant physical symptoms")
-                crisis_count += 1
-            if concentration <= 3:
-                risk_factors.append("Poor concentration")
-            if self_care == 'none':
-                risk_factors.append("Neglecting self-care")
-                crisis_count += 1
-            if social_interactions <= 3:
-                risk_factors.append("Social withdrawal")
-            if intrusive_thoughts in ['moderate', 'severe']:
-                risk_factors.append("Persistent intrusive thoughts")
-                crisis_count += 1
-            if optimism <= 3:
-                risk_factors.append("Low optimism")
-            if social_support <= 3:
-                risk_factors.append("Limited social support")
-            if self_harm in ['active', 'severe']:
-                risk_factors.append("Self-harm risk")
-                crisis_count += 2
-
-            # Calculate disorder indicators
-            disorder_indicators = []
-            if anxiety in ['moderate', 'severe'] and mood <= 4:
-                disorder_indicators.append("Moderate anxiety-depression indicators")
-            if sleep_quality <= 3 and energy_levels <= 3:
-                disorder_indicators.append("Sleep disturbance indicators")
-            if intrusive_thoughts in ['moderate', 'severe'] and anxiety in ['moderate', 'severe']:
-                disorder_indicators.append("Anxiety disorder indicators")
-            if self_harm in ['active', 'severe']:
-                disorder_indicators.append("Critical risk indicators")
-
-            # Prepare the report
-            report = {
-                "summary": {
-                    "emotions_count": emotions_count,
-                    "average_confidence": 0.7,  # Fixed value for now
-                    "average_valence": mood / 10.0,
-                    "crisis_count": crisis_count,
-                    "risk_factors": risk_factors
-                },
-                "disorder_indicators": disorder_indicators
-            }
+        Scoring rules are compiled into masks evaluated over all questionnaires
+        together (see questionnaire_scoring); results match analyze_responses.
 
-            return report
+        Args:
+            responses_list: Responses of each questionnaire
 
-        except Exception as e:
-            return {
-                "error": str(e),
-                "summary": {
-                    "emotions_count": {"neutral": 1},
-                    "average_confidence": 0.5,
-                    "average_valence": 0.5,
-                    "crisis_count": 0,
-                    "risk_factors": []
-                },
-                "disorder_indicators": []
-            }
+        Returns:
+            One report per questionnaire
+        """
+        return get_scorer().analyze_responses(responses_list)
 
     def summarize_report(self, analysis_report):
         summary = {
@@ -312,62 +203,13 @@ class EmotionReportGenerator:
             }
 
     def detect_disorder_indicators(self, analysis_report):
-        disorder_indicators = []
-        # Existing disorder detection logic
-        if any(entry['emotion'] == 'anxiety' for entry in analysis_report):
-            disorder_indicators.append('Possible Anxiety Disorder')
-        # Adding new disorders
-        if any(entry['emotion'] == 'sadness' for entry in analysis_report):
-            disorder_indicators.append('Major Depressive Disorder')
-        if any(entry['emotion'] == 'fear' for entry in analysis_report):
-            disorder_indicators.append('Generalized Anxiety Disorder')
-        if any(entry['emotion'] == 'social_anxiety' for entry in analysis_report):
-            disorder_indicators.append('Social Anxiety Disorder')
-        if any(entry['emotion'] == 'panic' for entry in analysis_report):
-            disorder_indicators.append('Panic Disorder')
-        if any(entry['emotion'] == 'trauma' for entry in analysis_report):
-            disorder_indicators.append('Post-Traumatic Stress Disorder (PTSD)')
-        if any(entry['emotion'] == 'obsessive' for entry in analysis_report):
-            disorder_indicators.append('Obsessive-Compulsive Disorder (OCD)')
-        if any(entry['emotion'] == 'bipolar' for entry in analysis_report):
-            disorder_indicators.append('Bipolar Disorder')
-        if any(entry['emotion'] == 'borderline' for entry in analysis_report):
-            disorder_indicators.append('Borderline Personality Disorder')
-        if any(entry['emotion'] == 'seasonal' for entry in analysis_report):
-            disorder_indicators.append('Seasonal Affective Disorder')
-        if any(entry['emotion'] == 'adhd' for entry in analysis_report):
-            disorder_indicators.append('Attention-Deficit/Hyperactivity Disorder (ADHD)')
-        if any(entry['emotion'] == 'eating' for entry in analysis_report):
-            disorder_indicators.append('Eating Disorders (e.g., Anorexia, Bulimia)')
-        if any(entry['emotion'] == 'substance' for entry in analysis_report):
-            disorder_indicators.append('Substance Use Disorder')
-        if any(entry['emotion'] == 'schizophrenia' for entry in analysis_report):
-            disorder_indicators.append('Schizophrenia')
-        if any(entry['emotion'] == 'dissociative' for entry in analysis_report):
-            disorder_indicators.append('Dissociative Identity Disorder')
-        if any(entry['emotion'] == 'phobia' for entry in analysis_report):
-            disorder_indicators.append('Phobias (e.g., Agoraphobia, Specific Phobias)')
-        if any(entry['emotion'] == 'chronic_stress' for entry in analysis_report):
-            disorder_indicators.append('Chronic Stress Disorder')
-        if any(entry['emotion'] == 'adjustment' for entry in analysis_report):
-            disorder_indicators.append('Adjustment Disorder')
-        if any(entry['emotion'] == 'impulse_control' for entry in analysis_report):
-            disorder_indicators.append('Impulse Control Disorder')
-        if any(entry['emotion'] == 'sleep' for entry in analysis_report):
-            disorder_indicators.append('Sleep Disorders (e.g., Insomnia)')
-        if any(entry['emotion'] == 'narcissistic' for entry in analysis_report):
-            disorder_indicators.append('Personality Disorders (e.g., Narcissistic Personality Disorder)')
-        if any(entry['emotion'] == 'psychotic' for entry in analysis_report):
-            disorder_indicators.append('Psychotic Disorders')
-        if any(entry['emotion'] == 'somatic' for entry in analysis_report):
-            disorder_indicators.append('Somatic Symptom Disorder')
-        if any(entry['emotion'] == 'factitious' for entry in analysis_report):
-            disorder_indicators.append('Factitious Disorder')
-        if any(entry['emotion'] == 'gender_dysphoria' for entry in analysis_report):
-            disorder_indicators.append('Gender Dysphoria')
-        if any(entry['emotion'] == 'complicated_grief' for entry in analysis_report):
-            disorder_indicators.append('Complicated Grief')
-        return disorder_indicators
+        """
+        Disorder indicators suggested by the emotions in a report.
+
+        Rules come from disorder_rules.json (and DISORDER_RULES_DIR); see
+        disorder_rules for the format.
+        """
+        return get_rule_set().detect(analysis_report)
 
 def generate_emotion_report(responses: List[str]) -> Dict[str, Any]:
     """
@@ -379,135 +221,10 @@ def generate_emotion_report(responses: List[str]) -> Dict[str, Any]:
     Returns:
         Dictionary containing structured emotion analysis
     """
-    try:
-        # Helper function for safe integer conversion
-        def safe_int(value, default=5):
-            try:
-                if value is None or str(value).lower() == 'none':
-                    return default
-                return int(value)
-            except (ValueError, TypeError):
-                return default
-
-        # Convert numeric responses to integers where applicable using safe conversion
-        mood = safe_int(responses[0])
-        anxiety_level = str(responses[1]).lower() if responses[1] else 'none'
-        sleep_quality = safe_int(responses[2])
-        energy_level = safe_int(responses[3])
-        physical_symptoms = str(responses[4]).lower() if responses[4] else 'none'
-        concentration = safe_int(responses[5])
-        self_care = str(responses[6]).lower() if responses[6] else 'none'
-        social_score = safe_int(responses[7])
-        intrusive_thoughts = str(responses[8]).lower() if responses[8] else 'none'
-        optimism = safe_int(responses[9])
-        stress_factors = responses[10] if responses[10] else ''
-        coping_strategies = responses[11] if responses[11] else ''
-        social_support = safe_int(responses[12])
-        self_harm = str(responses[13]).lower() if responses[13] else 'none'
-        professional_discussion = responses[14] if responses[14] else ''
-
-        # Calculate risk analysis
-        risk_factors = {
-            'low': 0,
-            'moderate': 0,
-            'high': 0
-        }
-
-        # Assess mood-related risks
-        if mood <= 3:
-            risk_factors['high'] += 1
-        elif mood <= 5:
-            risk_factors['moderate'] += 1
-        else:
-            risk_factors['low'] += 1
-
-        # Assess anxiety-related risks
-        if anxiety_level == 'severe':
-            risk_factors['high'] += 1
-        elif anxiety_level == 'moderate':
-            risk_factors['moderate'] += 1
-        else:
-            risk_factors['low'] += 1
-
-        # Assess self-harm risks
-        if self_harm in ['active', 'severe']:
-            risk_factors['high'] += 2
-        elif self_harm == 'passive':
-            risk_factors['moderate'] += 1
-
-        # Calculate anxiety trend
-        anxiety_status = 'stable'
-        if anxiety_level == 'severe':
-            anxiety_status = 'increasing'
-        elif anxiety_level == 'none':
-            anxiety_status = 'decreasing'
-
-        # Calculate stress response
-        stress_status = 'stable'
-        if physical_symptoms == 'severe':
-            stress_status = 'worsening'
-        elif physical_symptoms == 'none':
-            stress_status = 'improving'
-
-        # Assess mood stability
-        mood_status = 'stable'
-        if intrusive_thoughts in ['moderate', 'severe'] or mood <= 4:
-            mood_status = 'fluctuating'
-
-        # Generate patterns list
-        patterns = []
-        if sleep_quality <= 4:
-            patterns.append("Poor sleep quality affecting daily functioning")
-        if energy_level <= 4:
-            patterns.append("Low energy levels impacting activities")
-        if concentration <= 4:
-            patterns.append("Difficulty maintaining focus and concentration")
-        if social_score <= 4:
-            patterns.append("Limited social engagement")
-        if self_care == 'minimal' or self_care == 'none':
-            patterns.append("Reduced self-care activities")
-
-        # Calculate emotion counts
-        emotions_count = {
-            "anxiety": {"none": 0, "mild": 0, "moderate": 0, "severe": 0}[anxiety_level],
-            "depression": 10 - mood,  # Inverse of mood score
-            "stress": {"none": 0, "mild": 1, "moderate": 2, "severe": 3}[physical_symptoms],
-            "irritability": 10 - concentration,  # Lower concentration often correlates with higher irritability
-            "fatigue": 10 - energy_level  # Inverse of energy level
-        }
-
-        return {
-            "mainInsight": {
-                "mood": mood,
-                "anxiety": {"none": 1, "mild": 2, "moderate": 3, "severe": 4}[anxiety_level],
-                "stress": {"none": 1, "mild": 2, "moderate": 3, "severe": 4}[physical_symptoms],
-                "sleep": sleep_quality
-            },
-            "riskAnalysis": {
-                "low": risk_factors['low'],
-                "moderate": risk_factors['moderate'],
-                "high": risk_factors['high']
-            },
-            "anxietyTrend": {
-                "status": anxiety_status,
-                "percentage": {"none": 0, "mild": 33, "moderate": 66, "severe": 100}[anxiety_level],
-                "detail": f"Anxiety levels are {anxiety_level}, showing a {anxiety_status} trend"
-            },
-            "stressResponse": {
-                "status": stress_status,
-                "percentage": {"none": 0, "mild": 33, "moderate": 66, "severe": 100}[physical_symptoms],
-                "detail": f"Physical stress symptoms are {physical_symptoms}, indicating {stress_status} stress management"
-            },
-            "moodStability": {
-                "status": mood_status,
-                "detail": f"Mood appears to be {mood_status} with a base level of {mood}/10"
-            },
-            "patterns": patterns,
-            "emotions_count": emotions_count
-        }
-
-    except Exception as e:
-        raise Exception(f"Error generating emotion report: {str(e)}")
+    report = get_scorer().emotion_reports([responses])[0]
+    if isinstance(report, Exception):
+        raise Exception(f"Error generating emotion report: {str(report)}")
+    return report
 
 # Example usage
 if __name__ == "__main__":
@@ -6,12 +6,83 @@ achievements, streaks, and rewards to increase user engagement with
 mental health activities.
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
+from bisect import bisect_right
+from functools import lru_cache
 import json
 import os
 import random
 
+from agent.storage.user_store import get_user_store
+
+# Activity types mapped to the counter they increment in user_data["activity_counts"]
+ACTIVITY_COUNTERS = {
+    "mood_check_in": "mood_check_ins",
+    "cbt_exercise": "cbt_exercises",
+    "meditation": "meditation_minutes",
+    "journal_entry": "journal_entries",
+    "music_therapy": "music_therapy_sessions",
+    "crisis_tool": "crisis_tool_uses"
+}
+
+# Default points for different activities
+ACTIVITY_POINTS = {
+    "mood_check_in": 5,
+    "cbt_exercise": 10,
+    "meditation": 1,  # Per minute
+    "journal_entry": 10,
+    "music_therapy": 8,
+    "crisis_tool": 15
+}
+
+# Unlock criteria for the built-in achievements. "counter" is a path into the
+# profile ("activity_counts.<name>", "streak.current", or "emotions_recorded",
+# which counts distinct emotions); the achievement unlocks once it reaches "min".
+# Achievements without criteria are awarded by a specific action instead.
+ACHIEVEMENT_CRITERIA = {
+    "first_check_in": {"counter": "activity_counts.mood_check_ins", "min": 1},
+    "week_streak": {"counter": "streak.current", "min": 7},
+    "month_streak": {"counter": "streak.current", "min": 30},
+    "emotion_awareness": {"counter": "emotions_recorded", "min": 10},
+    "mindfulness_minutes": {"counter": "activity_counts.meditation_minutes", "min": 60},
+    "journal_entries": {"counter": "activity_counts.journal_entries", "min": 5},
+    "cbt_exercises": {"counter": "activity_counts.cbt_exercises", "min": 10},
+    "progress_insight": None,
+    "music_therapy": {"counter": "activity_counts.music_therapy_sessions", "min": 5},
+    "crisis_management": {"counter": "activity_counts.crisis_tool_uses", "min": 1}
+}
+
+
+@lru_cache(maxsize=None)
+def _load_achievement_catalog(file_path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Load achievement definitions from a JSON file.
+    
+    The file maps achievement IDs to their definition (name, description,
+    icon, points, tier) plus an optional "criteria" object.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        (achievements, criteria) dicts, or None if the file can't be loaded
+    """
+    try:
+        with open(file_path, 'r') as f:
+            catalog = json.load(f)
+    except Exception as e:
+        print(f"Error loading achievements from {file_path}: {e}")
+        return None
+    
+    achievements = {}
+    criteria = {}
+    for achievement_id, definition in catalog.items():
+        definition = dict(definition)
+        criteria[achievement_id] = definition.pop("criteria", None)
+        achievements[achievement_id] = definition
+    return achievements, criteria
+
 
 class GamificationSystem:
     """
@@ -22,16 +93,38 @@ class GamificationSystem:
     therapeutic activities.
     """
     
-    def __init__(self, user_id: str, storage_dir: str = "./data"):
+    def __init__(
+        self,
+        user_id: str,
+        storage_dir: str = "./data",
+        store=None,
+        write_behind: bool = False,
+        achievements_path: Optional[str] = None,
+        leaderboard=None
+    ):
         """
         Initialize the gamification system.
         
         Args:
             user_id: Unique identifier for the user
             storage_dir: Directory to store gamification data
+            store: Optional user data store; defaults to the configured store,
+                or a per-user JSON file in storage_dir if none is configured
+            write_behind: Batch profile writes through the shared write-behind
+                writer (logged to a write-ahead log) instead of saving on every activity
+            achievements_path: Optional JSON file of achievement definitions with
+                criteria; defaults to ACHIEVEMENTS_PATH if set, else the built-in set
+            leaderboard: Optional Leaderboard kept up to date with this user's profile
         """
         self.user_id = user_id
-        self.storage_dir = storage_dir
+        # Absolute, since write-behind flushes may run after the cwd changed
+        self.storage_dir = os.path.abspath(storage_dir)
+        self.store = store if store is not None else get_user_store()
+        self.write_behind = None
+        if write_behind:
+            from agent.engagement.write_behind import get_write_behind
+            self.write_behind = get_write_behind(storage_dir, self.store)
+        self.leaderboard = leaderboard
         
         # Define achievements with criteria, descriptions, and points
         self.achievements = {
@@ -107,6 +200,17 @@ class GamificationSystem:
             }
         }
         
+        self.achievement_criteria = dict(ACHIEVEMENT_CRITERIA)
+        
+        achievements_path = achievements_path or os.environ.get("ACHIEVEMENTS_PATH")
+        if achievements_path:
+            catalog = _load_achievement_catalog(achievements_path)
+            if catalog is not None:
+                self.achievements = dict(catalog[0])
+                self.achievement_criteria = dict(catalog[1])
+        
+        self._achievement_index = self._build_achievement_index()
+        
         # Define tiers and their benefits
         self.tiers = {
             "bronze": {
@@ -152,6 +256,48 @@ class GamificationSystem:
         # Load user data or create new profile
         self.user_data = self._load_user_data()
     
+    def _build_achievement_index(self) -> Dict[str, Tuple[List[float], List[str]]]:
+        """
+        Index achievement rules by the counter they depend on.
+        
+        Returns:
+            Counter path -> (thresholds ascending, achievement IDs in the same order)
+        """
+        order = {achievement_id: position for position, achievement_id in enumerate(self.achievements)}
+        self._achievement_order = order
+        rules: Dict[str, List[Tuple[float, int, str]]] = {}
+        
+        for achievement_id, criteria in self.achievement_criteria.items():
+            if not criteria or achievement_id not in order:
+                continue
+            rules.setdefault(criteria["counter"], []).append(
+                (criteria["min"], order[achievement_id], achievement_id)
+            )
+        
+        index = {}
+        for counter, counter_rules in rules.items():
+            counter_rules.sort()
+            index[counter] = (
+                [threshold for threshold, _, _ in counter_rules],
+                [achievement_id for _, _, achievement_id in counter_rules]
+            )
+        return index
+    
+    def _counter_value(self, counter: str) -> float:
+        """
+        Current value of a profile counter used by achievement rules.
+        
+        Args:
+            counter: Counter path, e.g. "activity_counts.mood_check_ins"
+            
+        Returns:
+            The counter value (list length for list-valued counters)
+        """
+        value: Any = self.user_data
+        for key in counter.split("."):
+            value = value.get(key, 0) if isinstance(value, dict) else 0
+        return len(value) if isinstance(value, list) else (value or 0)
+    
     def _load_user_data(self) -> Dict[str, Any]:
         """
         Load user gamification data from storage.
@@ -159,6 +305,19 @@ class GamificationSystem:
         Returns:
             Dictionary containing user gamification data
         """
+        # Updates not yet flushed by the write-behind writer are the latest state
+        if self.write_behind is not None:
+            pending = self.write_behind.pending_profile(self.user_id)
+            if pending is not None:
+                return pending
+        
+        if self.store is not None:
+            try:
+                return self.store.load_gamification_profile(self.user_id) or self._create_new_profile()
+            except Exception as e:
+                print(f"Error loading gamification data: {e}")
+                return self._create_new_profile()
+        
         # Create directory if it doesn't exist
         os.makedirs(self.storage_dir, exist_ok=True)
         
@@ -178,13 +337,29 @@ class GamificationSystem:
     
     def _save_user_data(self):
         """Save user gamification data to storage."""
-        os.makedirs(self.storage_dir, exist_ok=True)
-        file_path = os.path.join(self.storage_dir, f"{self.user_id}_gamification.json")
+        self._write_user_data(self.user_data)
+    
+    def _write_user_data(self, user_data: Dict[str, Any], raise_errors: bool = False):
+        """
+        Write a user gamification profile to storage.
         
+        Args:
+            user_data: The profile to write
+            raise_errors: Raise write errors instead of printing them (the
+                write-behind writer needs to know to keep the profile)
+        """
         try:
+            if self.store is not None:
+                self.store.save_gamification_profile(self.user_id, user_data)
+                return
+            
+            os.makedirs(self.storage_dir, exist_ok=True)
+            file_path = os.path.join(self.storage_dir, f"{self.user_id}_gamification.json")
             with open(file_path, 'w') as f:
-                json.dump(self.user_data, f, indent=2)
+                json.dump(user_data, f, indent=2)
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error saving gamification data: {e}")
     
     def _create_new_profile(self) -> Dict[str, Any]:
@@ -228,6 +403,32 @@ class GamificationSystem:
             activity_type: Type of activity (e.g., "mood_check_in", "cbt_exercise")
             details: Optional details about the activity
             
+        Returns:
+            Dictionary with updated gamification state and any new achievements
+        """
+        now = datetime.now()
+        result = self._apply_activity(activity_type, details, now)
+        
+        # Save updated data
+        if self.write_behind is not None:
+            self.write_behind.record(self, activity_type, details, now)
+        else:
+            self._save_user_data()
+        
+        if self.leaderboard is not None:
+            self.leaderboard.update(self.user_id, self.user_data)
+        
+        return result
+    
+    def _apply_activity(self, activity_type: str, details: Optional[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+        """
+        Apply an activity to the in-memory profile without saving it.
+        
+        Args:
+            activity_type: Type of activity
+            details: Optional details about the activity
+            now: Time of the activity, so replaying it gives the same result
+            
         Returns:
             Dictionary with updated gamification state and any new achievements
         """
@@ -242,16 +443,23 @@ class GamificationSystem:
         # Update activity count
         self._update_activity_count(activity_type, details, result)
         
+        # Counters this activity can change; only rules on these are evaluated
+        changed_counters = set()
+        if activity_type in ACTIVITY_COUNTERS:
+            changed_counters.add(f"activity_counts.{ACTIVITY_COUNTERS[activity_type]}")
+        
         # Update streak if this is a check-in activity
         if activity_type == "mood_check_in":
-            self._update_streak(result)
+            self._update_streak(result, now)
+            changed_counters.add("streak.current")
             
             # Record emotion if provided
             if details and "emotion" in details:
                 self._record_emotion(details["emotion"])
+                changed_counters.add("emotions_recorded")
         
         # Check for new achievements
-        new_achievements = self._check_achievements()
+        new_achievements = self._check_achievements(now, changed_counters)
         if new_achievements:
             result["new_achievements"] = new_achievements
         
@@ -270,9 +478,6 @@ class GamificationSystem:
         # Update tier if needed
         self.user_data["tier"] = self._calculate_tier()
         
-        # Save updated data
-        self._save_user_data()
-        
         return result
     
     def _update_activity_count(self, activity_type: str, details: Optional[Dict[str, Any]], result: Dict[str, Any]):
@@ -284,28 +489,10 @@ class GamificationSystem:
             details: Optional details about the activity
             result: Result dictionary to update with points earned
         """
-        # Map activity type to the corresponding field in user_data
-        activity_map = {
-            "mood_check_in": "mood_check_ins",
-            "cbt_exercise": "cbt_exercises",
-            "meditation": "meditation_minutes",
-            "journal_entry": "journal_entries",
-            "music_therapy": "music_therapy_sessions",
-            "crisis_tool": "crisis_tool_uses"
-        }
-        
-        # Default points for different activities
-        points_map = {
-            "mood_check_in": 5,
-            "cbt_exercise": 10,
-            "meditation": 1,  # Per minute
-            "journal_entry": 10,
-            "music_therapy": 8,
-            "crisis_tool": 15
-        }
+        points_map = ACTIVITY_POINTS
         
         # Get the corresponding field name
-        field_name = activity_map.get(activity_type)
+        field_name = ACTIVITY_COUNTERS.get(activity_type)
         
         if field_name:
             # Special case for meditation which counts minutes
@@ -317,14 +504,15 @@ class GamificationSystem:
                 self.user_data["activity_counts"][field_name] += 1
                 result["points_earned"] = points_map.get(activity_type, 0)
     
-    def _update_streak(self, result: Dict[str, Any]):
+    def _update_streak(self, result: Dict[str, Any], now: Optional[datetime] = None):
         """
         Update the user's check-in streak.
         
         Args:
             result: Result dictionary to update with streak information
+            now: Time of the check-in (defaults to the current time)
         """
-        now = datetime.now()
+        now = now or datetime.now()
         last_check_in = self.user_data["streak"]["last_check_in"]
         
         # If first check-in
@@ -379,73 +567,58 @@ class GamificationSystem:
         if emotion not in self.user_data["emotions_recorded"]:
             self.user_data["emotions_recorded"].append(emotion)
     
-    def _check_achievements(self) -> List[Dict[str, Any]]:
+    def _check_achievements(
+        self,
+        now: Optional[datetime] = None,
+        changed_counters: Optional[set] = None
+    ) -> List[Dict[str, Any]]:
         """
         Check for new achievements based on user activity.
         
+        Only rules on the changed counters are evaluated, and for each counter
+        only the rules whose threshold the counter has reached.
+        
+        Args:
+            now: Time the achievements are earned at (defaults to the current time)
+            changed_counters: Counters changed by the activity; None evaluates every rule
+            
         Returns:
             List of newly unlocked achievements
         """
         new_achievements = []
+        counters = self._achievement_index.keys() if changed_counters is None else changed_counters
         
-        # Check each achievement to see if it's been earned
-        for achievement_id, achievement in self.achievements.items():
-            # Skip if already earned
-            if achievement_id in self.user_data["achievements"]:
+        earned_ids = []
+        for counter in counters:
+            if counter not in self._achievement_index:
                 continue
-                
-            # Check criteria for each achievement
-            earned = False
+            thresholds, achievement_ids = self._achievement_index[counter]
+            reached = bisect_right(thresholds, self._counter_value(counter))
+            earned_ids.extend(
+                achievement_id for achievement_id in achievement_ids[:reached]
+                if achievement_id not in self.user_data["achievements"]
+            )
+        
+        # Award in catalog order
+        for achievement_id in sorted(set(earned_ids), key=self._achievement_order.__getitem__):
+            achievement = self.achievements[achievement_id]
             
-            if achievement_id == "first_check_in":
-                earned = self.user_data["activity_counts"]["mood_check_ins"] >= 1
-                
-            elif achievement_id == "week_streak":
-                earned = self.user_data["streak"]["current"] >= 7
-                
-            elif achievement_id == "month_streak":
-                earned = self.user_data["streak"]["current"] >= 30
-                
-            elif achievement_id == "emotion_awareness":
-                earned = len(self.user_data["emotions_recorded"]) >= 10
-                
-            elif achievement_id == "mindfulness_minutes":
-                earned = self.user_data["activity_counts"]["meditation_minutes"] >= 60
-                
-            elif achievement_id == "journal_entries":
-                earned = self.user_data["activity_counts"]["journal_entries"] >= 5
-                
-            elif achievement_id == "cbt_exercises":
-                earned = self.user_data["activity_counts"]["cbt_exercises"] >= 10
-                
-            elif achievement_id == "progress_insight":
-                # This would be triggered by a specific action
-                pass
-                
-            elif achievement_id == "music_therapy":
-                earned = self.user_data["activity_counts"]["music_therapy_sessions"] >= 5
-                
-            elif achievement_id == "crisis_management":
-                earned = self.user_data["activity_counts"]["crisis_tool_uses"] >= 1
+            self.user_data["achievements"][achievement_id] = {
+                "earned_at": (now or datetime.now()).isoformat(),
+                "details": achievement
+            }
             
-            # If earned, add to user achievements and new achievements list
-            if earned:
-                self.user_data["achievements"][achievement_id] = {
-                    "earned_at": datetime.now().isoformat(),
-                    "details": achievement
-                }
-                
-                # Add achievement points
-                self.user_data["points"] += achievement["points"]
-                
-                # Add to result
-                new_achievements.append({
-                    "id": achievement_id,
-                    "name": achievement["name"],
-                    "description": achievement["description"],
-                    "icon": achievement["icon"],
-                    "points": achievement["points"]
-                })
+            # Add achievement points
+            self.user_data["points"] += achievement["points"]
+            
+            # Add to result
+            new_achievements.append({
+                "id": achievement_id,
+                "name": achievement["name"],
+                "description": achievement["description"],
+                "icon": achievement["icon"],
+                "points": achievement["points"]
+            })
         
         return new_achievements
     
@@ -0,0 +1,498 @@
+"""
+Leaderboard and cohort statistics for MindGuard gamification.
+
+GamificationSystem only sees one user's profile at a time. This module keeps
+global rankings by points, level and streak in indexable skip lists, updated
+incrementally as profiles change. Top-K and rank-of-user queries take
+O(log n) (plus K for top-K) without scanning all users. Per-cohort aggregates
+(by tier, level or signup month) are maintained alongside.
+
+The leaderboard is built once per process, at API startup rather than on
+the first chat request (expect a few seconds and about 1 KB of memory per
+user). With the SQLite user store configured (USER_STORE=sqlite) it is a
+StoreLeaderboard, which also picks up the profiles other processes save
+before each query, so every API worker ranks the same users. Otherwise it is
+built from the per-user JSON profiles and only sees the profiles its own
+process saves, so it is only accurate for a single API worker; use the store
+with --workers > 1.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import glob
+import json
+import os
+import random
+import threading
+
+from agent.storage.user_store import get_user_store
+
+# Enough levels for tens of millions of entries
+MAX_LEVEL = 24
+
+# Leaderboards, as positions in a user's ranking summary
+BOARDS = {"points": 0, "level": 1, "streak": 2}
+
+# Cohort dimensions for aggregate stats, as positions in a ranking summary
+COHORTS = {"tier": 3, "level": 1, "signup_month": 4}
+
+
+def _summarize(profile: Dict[str, Any]) -> Tuple[Any, ...]:
+    """The profile fields rankings and cohorts depend on: (points, level, streak, tier, signup month)."""
+    return (
+        profile.get("points", 0),
+        profile.get("level", 1),
+        profile.get("streak", {}).get("current", 0),
+        profile.get("tier", "bronze"),
+        (profile.get("created_at") or "unknown")[:7]
+    )
+
+
+class _SkipNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: List[Optional["_SkipNode"]] = [None] * level
+        # Number of level-0 steps to the node reached by next[level]
+        self.width = [1] * level
+
+
+class IndexableSkipList:
+    """
+    Sorted collection with O(log n) insert, remove, rank and positional access.
+
+    Each link stores how many elements it skips, so positions can be found
+    while searching by key.
+    """
+
+    def __init__(self, max_level: int = MAX_LEVEL, seed: Optional[int] = None):
+        self.max_level = max_level
+        self._head = _SkipNode(None, max_level)
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.max_level and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def extend_sorted(self, keys: Iterable[Any]):
+        """
+        Build an empty list from keys already in ascending order.
+
+        Links are created in a single pass, which is much faster than
+        inserting one key at a time when loading a large number of users.
+        """
+        if self._size:
+            raise ValueError("extend_sorted requires an empty list")
+        last_nodes = [self._head] * self.max_level
+        last_positions = [0] * self.max_level
+        position = 0
+        for key in keys:
+            position += 1
+            node = _SkipNode(key, self._random_level())
+            for level in range(len(node.next)):
+                previous = last_nodes[level]
+                previous.next[level] = node
+                previous.width[level] = position - last_positions[level]
+                last_nodes[level] = node
+                last_positions[level] = position
+        for level in range(self.max_level):
+            last_nodes[level].width[level] = position + 1 - last_positions[level]
+        self._size = position
+
+    def insert(self, key: Any):
+        """Insert a key (keys must be unique and mutually comparable)."""
+        chain = [None] * self.max_level
+        steps_at_level = [0] * self.max_level
+        node = self._head
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_level = self._random_level()
+        new_node = _SkipNode(key, new_level)
+        steps = 0
+        for level in range(new_level):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(new_level, self.max_level):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Any):
+        """Remove a key, raising KeyError if it is not present."""
+        chain = [None] * self.max_level
+        node = self._head
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_level):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key: Any) -> int:
+        """0-based position of a key, raising KeyError if it is not present."""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+
+        found = node.next[0]
+        if found is None or found.key != key:
+            raise KeyError(key)
+        return position
+
+    def _node_at(self, index: int) -> _SkipNode:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        remaining = index + 1
+        node = self._head
+        for level in reversed(range(self.max_level)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        return self._node_at(index).key
+
+    def iter_from(self, index: int) -> Iterator[Any]:
+        """Iterate keys in order starting at a position."""
+        if index >= self._size:
+            return
+        node = self._node_at(index)
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """
+    Global rankings and cohort statistics across all users.
+
+    Rankings are ordered by score descending, then user ID, so ties have a
+    stable order.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Keys are (-score, user_id), so ascending order is best first
+        self._boards = {board: IndexableSkipList() for board in BOARDS}
+        # user_id -> ranking summary; kept compact since there is one per user
+        self._users: Dict[str, Tuple[Any, ...]] = {}
+        # dimension -> cohort -> [users, points, level, streak] totals
+        self._cohorts: Dict[str, Dict[Any, List[float]]] = {dimension: {} for dimension in COHORTS}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def update(self, user_id: str, profile: Dict[str, Any]):
+        """
+        Add or update a user's rankings from their gamification profile.
+
+        Args:
+            user_id: Unique identifier for the user
+            profile: The user's gamification profile
+        """
+        summary = _summarize(profile)
+        with self._lock:
+            current = self._users.get(user_id)
+            if current == summary:
+                return
+
+            for board, field in BOARDS.items():
+                if current is not None:
+                    if current[field] == summary[field]:
+                        continue
+                    self._boards[board].remove((-current[field], user_id))
+                self._boards[board].insert((-summary[field], user_id))
+
+            if current is not None:
+                self._update_cohorts(current, -1)
+            self._update_cohorts(summary, 1)
+            self._users[user_id] = summary
+
+    def load(self, profiles: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Rank many users at once.
+
+        On an empty leaderboard each ranking is sorted once and built in a
+        single pass; otherwise users are added one at a time.
+
+        Args:
+            profiles: (user_id, profile) pairs
+
+        Returns:
+            Number of users loaded
+        """
+        with self._lock:
+            if self._users:
+                count = 0
+                for user_id, profile in profiles:
+                    self.update(user_id, profile)
+                    count += 1
+                return count
+
+            for user_id, profile in profiles:
+                summary = _summarize(profile)
+                self._users[user_id] = summary
+                self._update_cohorts(summary, 1)
+
+            for board, field in BOARDS.items():
+                self._boards[board].extend_sorted(
+                    sorted((-summary[field], user_id) for user_id, summary in self._users.items())
+                )
+            return len(self._users)
+
+    def remove(self, user_id: str):
+        """Remove a user from all rankings and cohorts."""
+        with self._lock:
+            current = self._users.pop(user_id, None)
+            if current is None:
+                return
+            for board, field in BOARDS.items():
+                self._boards[board].remove((-current[field], user_id))
+            self._update_cohorts(current, -1)
+
+    def _update_cohorts(self, summary: Tuple[Any, ...], sign: int):
+        """Add (sign=1) or remove (sign=-1) a user's contribution to cohort totals."""
+        points, level, streak = summary[0], summary[1], summary[2]
+        for dimension, field in COHORTS.items():
+            cohorts = self._cohorts[dimension]
+            totals = cohorts.get(summary[field])
+            if totals is None:
+                totals = cohorts[summary[field]] = [0, 0, 0, 0]
+            totals[0] += sign
+            totals[1] += sign * points
+            totals[2] += sign * level
+            totals[3] += sign * streak
+            if totals[0] == 0:
+                del cohorts[summary[field]]
+
+    def _check_board(self, board: str):
+        if board not in BOARDS:
+            raise ValueError(f"Unknown leaderboard: {board}")
+
+    def top(self, board: str = "points", limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Highest ranked users on a leaderboard.
+
+        Args:
+            board: 'points', 'level' or 'streak'
+            limit: Number of users to return
+            offset: Number of top users to skip (for paging)
+
+        Returns:
+            List of {"rank", "user_id", "score"}, rank 1 first
+        """
+        self._check_board(board)
+        entries = []
+        with self._lock:
+            for position, (negative_score, user_id) in enumerate(self._boards[board].iter_from(offset), offset):
+                if len(entries) >= limit:
+                    break
+                entries.append({"rank": position + 1, "user_id": user_id, "score": -negative_score})
+        return entries
+
+    def rank(self, user_id: str, board: str = "points") -> Optional[Dict[str, Any]]:
+        """
+        A user's position on a leaderboard.
+
+        Args:
+            user_id: Unique identifier for the user
+            board: 'points', 'level' or 'streak'
+
+        Returns:
+            {"rank", "user_id", "score", "total", "percentile"}, or None if the user isn't ranked
+        """
+        self._check_board(board)
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None:
+                return None
+            score = current[BOARDS[board]]
+            position = self._boards[board].rank((-score, user_id))
+            total = len(self._boards[board])
+
+        return {
+            "rank": position + 1,
+            "user_id": user_id,
+            "score": score,
+            "total": total,
+            # Share of users ranked at or below this user
+            "percentile": round((total - position) / total * 100, 2)
+        }
+
+    def cohort_stats(self, by: str = "tier") -> Dict[str, Dict[str, float]]:
+        """
+        Aggregate stats per cohort.
+
+        Args:
+            by: Cohort dimension: 'tier', 'level' or 'signup_month'
+
+        Returns:
+            Cohort -> {"users", "avg_points", "avg_level", "avg_streak"}
+        """
+        if by not in COHORTS:
+            raise ValueError(f"Unknown cohort dimension: {by}")
+        with self._lock:
+            return {
+                str(cohort): {
+                    "users": users,
+                    "avg_points": points / users,
+                    "avg_level": level / users,
+                    "avg_streak": streak / users
+                }
+                for cohort, (users, points, level, streak) in sorted(self._cohorts[by].items())
+            }
+
+    def load_from_store(self, store) -> int:
+        """
+        Rank every profile in a user store.
+
+        Args:
+            store: SQLiteUserStore
+
+        Returns:
+            Number of users loaded
+        """
+        return self.load((profile["user_id"], profile) for profile in store.iter_gamification_summaries())
+
+    def load_from_directory(self, storage_dir: str) -> int:
+        """
+        Rank every *_gamification.json profile in a directory.
+
+        Args:
+            storage_dir: Directory with per-user gamification files
+
+        Returns:
+            Number of users loaded
+        """
+        suffix = "_gamification.json"
+
+        def profiles():
+            for file_path in glob.glob(os.path.join(storage_dir, f"*{suffix}")):
+                try:
+                    with open(file_path, 'r') as f:
+                        profile = json.load(f)
+                except Exception as e:
+                    print(f"Error loading gamification data from {file_path}: {e}")
+                    continue
+                yield profile.get("user_id") or os.path.basename(file_path)[:-len(suffix)], profile
+
+        return self.load(profiles())
+
+
+class StoreLeaderboard(Leaderboard):
+    """
+    Leaderboard of the profiles in a SQLite user store, kept in sync with it.
+
+    Every profile saved to the store gets the next change sequence number,
+    so before answering a query the board reads just the profiles saved since
+    it last looked (by any process) and updates its rankings and cohort
+    totals with them. Queries then take O(log n) as usual, without counting
+    or scanning the table.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store: SQLiteUserStore holding the gamification profiles
+        """
+        super().__init__()
+        self.store = store
+        self._last_change = 0
+        self._sync_lock = threading.Lock()
+
+    def load_all(self) -> int:
+        """
+        Rank every profile in the store.
+
+        Returns:
+            Number of users loaded
+        """
+        with self._sync_lock:
+            # Read first: profiles saved during the load are picked up again by sync
+            self._last_change = self.store.last_gamification_change()
+            return self.load_from_store(self.store)
+
+    def sync(self):
+        """Apply the profiles saved to the store since the last sync."""
+        with self._sync_lock:
+            for profile in self.store.iter_gamification_changes(self._last_change):
+                self.update(profile["user_id"], profile)
+                self._last_change = profile["change_seq"]
+
+    def __len__(self) -> int:
+        self.sync()
+        return super().__len__()
+
+    def top(self, board: str = "points", limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        self.sync()
+        return super().top(board, limit, offset)
+
+    def rank(self, user_id: str, board: str = "points") -> Optional[Dict[str, Any]]:
+        self.sync()
+        return super().rank(user_id, board)
+
+    def cohort_stats(self, by: str = "tier") -> Dict[str, Dict[str, float]]:
+        self.sync()
+        return super().cohort_stats(by)
+
+
+_leaderboards: Dict[Tuple[str, int], Leaderboard] = {}
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboard(storage_dir: str = "./data", store=None) -> Leaderboard:
+    """
+    Get the shared leaderboard.
+
+    With a user store this is a StoreLeaderboard of its profiles; otherwise
+    a Leaderboard of the directory's profiles. Either is built on first use
+    (call this at startup so no request pays for it).
+
+    Args:
+        storage_dir: Directory with per-user gamification files, used when no store is configured
+        store: Optional user store; defaults to the configured store
+
+    Returns:
+        The shared leaderboard
+    """
+    store = store if store is not None else get_user_store()
+    key = (os.path.abspath(storage_dir), id(store))
+    with _leaderboards_lock:
+        leaderboard = _leaderboards.get(key)
+        if leaderboard is None:
+            if store is not None:
+                leaderboard = StoreLeaderboard(store)
+                leaderboard.load_all()
+            else:
+                leaderboard = Leaderboard()
+                if os.path.isdir(storage_dir):
+                    leaderboard.load_from_directory(storage_dir)
+            _leaderboards[key] = leaderboard
+        return leaderboard
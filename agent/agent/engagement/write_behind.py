@@ -0,0 +1,316 @@
+"""
+Write-behind persistence for gamification profiles.
+
+Instead of rewriting a user's profile on every activity, GamificationSystem
+instances created with write_behind=True hand their updated profile to a
+shared writer. The writer appends the activity to a write-ahead log (one
+line, no rewrite) and keeps the latest profile per user in memory. Dirty
+profiles are written out on an interval, when enough activities are pending,
+and at interpreter exit.
+
+Each process (e.g. each API worker under --workers N) writes its own log,
+gamification.<pid>.wal, and holds an exclusive lock on it while running. On
+startup a writer replays the logs no live process holds: each logged
+activity newer than the profile's last applied log sequence number is
+applied again with its original timestamp, so activities recorded before a
+crash are not lost and none are applied twice. Recovery runs under a shared
+lock file, so two processes starting at once don't replay the same log.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import copy
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Held by the writer recovering the logs of processes that are gone
+RECOVERY_LOCK_NAME = "gamification.wal.lock"
+
+
+class GamificationWriteBehind:
+    """
+    Coalesces gamification profile writes for all users sharing a storage location.
+    """
+
+    def __init__(
+        self,
+        storage_dir: str = "./data",
+        store=None,
+        flush_interval: float = 5.0,
+        max_pending: int = 50,
+        fsync: bool = False
+    ):
+        """
+        Initialize the writer, replaying any activities left in the log.
+
+        Args:
+            storage_dir: Directory of the JSON profiles and the write-ahead log
+            store: Optional user data store the profiles are saved to
+            flush_interval: Seconds between background flushes
+            max_pending: Flush early once this many activities are pending
+            fsync: Fsync the log after every activity; survives power loss as
+                well as process crashes, at the cost of one disk sync per activity
+        """
+        # Absolute, since the exit-time flush may run after the cwd changed
+        self.storage_dir = os.path.abspath(storage_dir)
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.wal_path = os.path.join(self.storage_dir, f"gamification.{os.getpid()}.wal")
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # user_id -> (system used to write the profile, profile snapshot)
+        self._dirty: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        # Log lines not yet covered by a flush, as (sequence number, user ID, line)
+        self._records: List[Tuple[int, str, str]] = []
+        self._last_seq = 0
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        with open(os.path.join(self.storage_dir, RECOVERY_LOCK_NAME), "a") as recovery_lock:
+            fcntl.flock(recovery_lock, fcntl.LOCK_EX)
+            self._recover()
+            # Created and locked before the recovery lock is released, so no
+            # other process takes it for a leftover log
+            self._wal = open(self.wal_path, "a")
+            fcntl.flock(self._wal, fcntl.LOCK_EX)
+
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="gamification-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _next_seq(self) -> int:
+        """Next log sequence number; increasing across restarts."""
+        self._last_seq = max(self._last_seq + 1, time.time_ns())
+        return self._last_seq
+
+    def record(self, system, activity_type: str, details: Optional[Dict[str, Any]], timestamp: datetime):
+        """
+        Log an activity that was applied to a profile and mark the profile dirty.
+
+        Args:
+            system: The GamificationSystem the activity was applied to
+            activity_type: Type of activity
+            details: Optional details about the activity
+            timestamp: Time the activity was applied with
+        """
+        with self._lock:
+            seq = self._next_seq()
+            line = json.dumps({
+                "seq": seq,
+                "user_id": system.user_id,
+                "activity_type": activity_type,
+                "details": details,
+                "timestamp": timestamp.isoformat()
+            })
+            self._wal.write(line + "\n")
+            self._wal.flush()
+            if self.fsync:
+                os.fsync(self._wal.fileno())
+
+            system.user_data["wal_seq"] = seq
+            self._dirty[system.user_id] = (system, copy.deepcopy(system.user_data))
+            self._records.append((seq, system.user_id, line))
+            pending = len(self._records)
+
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def pending_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The latest unflushed profile for a user, if any.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            A copy of the pending profile, or None
+        """
+        with self._lock:
+            entry = self._dirty.get(user_id)
+            return copy.deepcopy(entry[1]) if entry else None
+
+    def flush(self):
+        """
+        Write all dirty profiles and drop the log records they cover.
+
+        Profiles that fail to write stay dirty and keep their log records, so
+        they are retried on the next flush (or replayed after a restart).
+        """
+        with self._flush_lock:
+            with self._lock:
+                dirty = self._dirty
+                self._dirty = {}
+                flushed_seq = self._last_seq
+
+            failed = set()
+            for user_id, (system, profile) in dirty.items():
+                try:
+                    system._write_user_data(profile, raise_errors=True)
+                except Exception as e:
+                    print(f"Error saving gamification data for {user_id}, will retry: {e}")
+                    failed.add(user_id)
+
+            with self._lock:
+                for user_id in failed:
+                    # A newer snapshot recorded meanwhile supersedes this one
+                    self._dirty.setdefault(user_id, dirty[user_id])
+                self._records = [
+                    record for record in self._records
+                    if record[0] > flushed_seq or record[1] in failed
+                ]
+                self._rewrite_wal()
+
+    def _rewrite_wal(self):
+        """Replace the log with the records not yet flushed (caller holds the lock)."""
+        temp_path = self.wal_path + ".tmp"
+        wal = open(temp_path, "w")
+        for _, _, line in self._records:
+            wal.write(line + "\n")
+        wal.flush()
+        os.fsync(wal.fileno())
+        # Locked before it replaces the old (still locked) log, so recovery in
+        # another process never sees this log unlocked
+        fcntl.flock(wal, fcntl.LOCK_EX)
+        os.replace(temp_path, self.wal_path)
+        self._wal.close()
+        self._wal = wal
+
+    def _recover(self):
+        """
+        Replay activities that were never flushed from the logs of processes
+        that are gone (caller holds the recovery lock).
+        """
+        records_by_user: Dict[str, List[Dict[str, Any]]] = {}
+        recovered = []
+        for path in sorted(glob.glob(os.path.join(self.storage_dir, "gamification*.wal"))):
+            try:
+                wal = open(path, "r")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(wal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # The log of a running process
+                wal.close()
+                continue
+            for line in wal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+                records_by_user.setdefault(record["user_id"], []).append(record)
+                self._last_seq = max(self._last_seq, record["seq"])
+            recovered.append((path, wal))
+
+        try:
+            if records_by_user:
+                self._replay(records_by_user)
+            for path, _ in recovered:
+                for leftover in (path, path + ".tmp"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        finally:
+            for _, wal in recovered:
+                wal.close()
+
+    def _replay(self, records_by_user: Dict[str, List[Dict[str, Any]]]):
+        """Apply logged activities that are newer than the users' saved profiles."""
+        from agent.engagement.gamification import GamificationSystem
+
+        replayed = 0
+        for user_id, records in records_by_user.items():
+            system = GamificationSystem(user_id, storage_dir=self.storage_dir, store=self.store)
+            applied_seq = system.user_data.get("wal_seq", 0)
+            # Logs of several processes may hold activities of one user
+            for record in sorted(records, key=lambda record: record["seq"]):
+                if record["seq"] <= applied_seq:
+                    continue
+                system._apply_activity(
+                    record["activity_type"],
+                    record["details"],
+                    datetime.fromisoformat(record["timestamp"])
+                )
+                system.user_data["wal_seq"] = record["seq"]
+                replayed += 1
+            system._save_user_data()
+
+        if replayed:
+            print(f"Recovered {replayed} gamification activities in {self.storage_dir}")
+
+    def _run(self):
+        """Background flush loop."""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing gamification data: {e}")
+
+    def close(self):
+        """Flush everything and stop the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing gamification data: {e}")
+        with self._lock:
+            # Removed while still locked, so no other process recovers it meanwhile
+            if not self._records and os.path.exists(self.wal_path):
+                os.remove(self.wal_path)
+            self._wal.close()
+
+
+_writers: Dict[Tuple[str, int], GamificationWriteBehind] = {}
+_writers_lock = threading.Lock()
+
+
+def get_write_behind(storage_dir: str = "./data", store=None) -> GamificationWriteBehind:
+    """
+    Get the shared writer for a storage location.
+
+    Flush settings are read from GAMIFICATION_FLUSH_INTERVAL (seconds),
+    GAMIFICATION_FLUSH_THRESHOLD (activities) and GAMIFICATION_WAL_FSYNC.
+
+    Args:
+        storage_dir: Directory of the JSON profiles and the write-ahead log
+        store: Optional user data store the profiles are saved to
+
+    Returns:
+        The shared writer
+    """
+    key = (os.path.abspath(storage_dir), id(store))
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer._closed:
+            writer = _writers[key] = GamificationWriteBehind(
+                storage_dir,
+                store,
+                flush_interval=float(os.environ.get("GAMIFICATION_FLUSH_INTERVAL", 5.0)),
+                max_pending=int(os.environ.get("GAMIFICATION_FLUSH_THRESHOLD", 50)),
+                fsync=os.environ.get("GAMIFICATION_WAL_FSYNC", "false").lower() == "true"
+            )
+        return writer
+
+
+def close_all():
+    """Flush and stop every shared writer (e.g. before leaving a scratch directory)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
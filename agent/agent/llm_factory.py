@@ -1,6 +1,10 @@
 import os
+import re
+import zlib
 from typing import Optional, Dict, Any, List
 
+import numpy as np
+
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI
@@ -11,6 +15,9 @@ from langchain_core.outputs import ChatGeneration, ChatResult
 from agent.gemini_integration import ChatGemini
 from agent.gemini_embeddings import GeminiEmbeddings
 
+# Word tokenizer for offline embedding features
+TOKEN_PATTERN = re.compile(r"\w+")
+
 
 class SimpleFallbackLLM(BaseChatModel):
     """A simple fallback LLM that works offline with basic templated responses."""
@@ -50,21 +57,71 @@ class SimpleFallbackLLM(BaseChatModel):
 
 
 class SimpleOfflineEmbeddings(Embeddings):
-    """Simple fallback embeddings that produce random vectors."""
+    """
+    Offline embeddings from hashed n-gram features.
+    
+    Word unigrams, word bigrams and character trigrams are hashed into a
+    fixed number of dimensions (the "hashing trick") with log-scaled counts,
+    then each vector is unit-normalized. Texts sharing words and word pieces
+    get similar vectors, so similarity search works without a model or network.
+    """
+    
+    dimension: int = 512
+    
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+    
+    def _features(self, text: str) -> List[str]:
+        """Extract the hashed features of a text."""
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = ["w:" + word for word in words]
+        features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
     
-    dimension: int = 128
+    def _hash_feature(self, feature: str) -> tuple:
+        """Map a feature to a dimension and a sign, deterministically across processes."""
+        digest = zlib.crc32(feature.encode("utf-8"))
+        # The top bit picks the sign so collisions tend to cancel out
+        return digest % self.dimension, 1.0 if digest & 0x80000000 else -1.0
+    
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts into a matrix.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 array of shape (len(texts), dimension) with unit-length rows
+            (all-zero rows for texts without any words)
+        """
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                column, sign = self._hash_feature(feature)
+                rows.append(row)
+                columns.append(column)
+                signs.append(sign)
+        
+        counts = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)),
+                  np.array(signs, dtype=np.float32))
+        
+        # Sublinear term frequency keeps long texts from being dominated by repeats
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate random embeddings of the same dimension for offline mode."""
-        import random
-        random.seed(42)  # For reproducibility
-        return [[random.uniform(-1, 1) for _ in range(self.dimension)] for _ in texts]
+        """Embed documents with hashed n-gram features."""
+        return self.embed_array(texts).tolist()
     
     def embed_query(self, text: str) -> List[float]:
-        """Generate a random embedding for a query."""
-        import random
-        random.seed(hash(text) % 10000)  # Seed based on text for consistency
-        return [random.uniform(-1, 1) for _ in range(self.dimension)]
+        """Embed a query with hashed n-gram features."""
+        return self.embed_array([text])[0].tolist()
 
 
 class LLMFactory:
@@ -81,13 +138,28 @@ class LLMFactory:
         Create an LLM instance based on available API keys or specified provider.
         
         Args:
-            provider: Optional provider to use ('openai', 'gemini', or 'groq')
+            provider: Optional provider to use ('openai', 'gemini', 'groq', or for
+                capacity testing 'mock' / 'mock-http')
             temperature: Temperature for the model
             **kwargs: Additional arguments to pass to the model
             
         Returns:
             A LangChain chat model instance
         """
+        # Mock providers simulate real provider latency and failures offline
+        if provider and provider.lower() == "mock":
+            from agent.mock_llm import MockLLM
+            return MockLLM.from_env(temperature=temperature, **kwargs)
+        if provider and provider.lower() == "mock-http":
+            # ChatOpenAI against the local OpenAI-compatible stand-in (python -m agent.mock_llm)
+            return ChatOpenAI(
+                temperature=temperature,
+                base_url=os.environ.get("MOCK_LLM_BASE_URL", "http://127.0.0.1:8001/v1"),
+                api_key="mock",
+                model_name="mock",
+                **kwargs
+            )
+        
         # Check if we're in offline mode (environment variable)
         if os.environ.get("OFFLINE_MODE") == "true":
             print("Using offline fallback LLM")
@@ -140,14 +212,18 @@ class LLMFactory:
         Create an embeddings instance based on available API keys or specified provider.
         
         Args:
-            provider: Optional provider to use ('openai', 'gemini', or 'groq')
+            provider: Optional provider to use ('openai', 'gemini', 'groq', 'mock' or 'mock-http')
             
         Returns:
             A LangChain embeddings instance
         """
+        # Mock providers only simulate chat models
+        if provider and provider.lower() in ("mock", "mock-http"):
+            return SimpleOfflineEmbeddings()
+        
         # Check if we're in offline mode
         if os.environ.get("OFFLINE_MODE") == "true":
-            print("Using offline simple embeddings")
+            print("Using offline hashed n-gram embeddings")
             return SimpleOfflineEmbeddings()
         
         # If provider is specified, try to use it
@@ -53,11 +53,16 @@ class MemoryManager:
         }
         self.conversations.append(conversation)
         
-        # If we have a vector store and it's available, add the conversation to it
-        if self.vector_storage_available and self.vector_store:
+        # If vector storage is available, add the conversation to the store
+        if self.vector_storage_available:
+            text = f"User: {user_input}\nAI: {ai_response}"
+            if not self.vector_store:
+                # The store is created with the first conversation
+                self.initialize_vector_store([text], metadatas=[metadata or {}])
+                return
             try:
                 self.vector_store.add_texts(
-                    [f"User: {user_input}\nAI: {ai_response}"],
+                    [text],
                     metadatas=[metadata or {}]
                 )
             except Exception as e:
@@ -72,12 +77,17 @@ class MemoryManager:
         """
         return self.memory.load_memory_variables({})["history"]
     
-    def initialize_vector_store(self, texts: Optional[List[str]] = None):
+    def initialize_vector_store(
+        self,
+        texts: Optional[List[str]] = None,
+        metadatas: Optional[List[Dict[str, Any]]] = None
+    ):
         """
         Initialize the vector store with optional initial texts.
         
         Args:
             texts: Optional list of texts to initialize the vector store with
+            metadatas: Optional metadata for each text
         """
         if not self.vector_storage_available:
             print("Vector storage not available")
@@ -87,7 +97,7 @@ class MemoryManager:
             texts = []
         
         try:
-            self.vector_store = FAISS.from_texts(texts, self.embeddings)
+            self.vector_store = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas)
         except Exception as e:
             print(f"Warning: Could not initialize vector store: {e}")
             self.vector_storage_available = False
@@ -128,7 +138,6 @@ class MemoryManager:
             
         # Use vector search if available
         try:
-            self.initialize_vector_store()
             results = self.vector_store.similarity_search(query, k=k)
             
             # Convert results to the right format
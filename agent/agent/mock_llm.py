@@ -0,0 +1,387 @@
+"""
+Mock LLM provider for capacity and failover testing.
+
+MockLLM behaves like SimpleFallbackLLM but simulates a real provider: each
+call waits for a sampled latency, streams tokens at a configurable rate and
+fails with configurable error, timeout and rate-limit rates. Sampling is
+seeded, so a given configuration produces the same sequence of delays and
+failures on every run.
+
+The same model can be served over HTTP as a stand-in for the OpenAI
+chat-completions API, so the real ChatOpenAI client can be load-tested
+against it:
+
+    python -m agent.mock_llm --port 8001 --latency-ms 800 --error-rate 0.02
+
+Configuration is read from the environment by MockLLM.from_env:
+    MOCK_LLM_LATENCY_MS            Mean time to first token (default 800)
+    MOCK_LLM_LATENCY_JITTER_MS     Spread of the distribution (default 200)
+    MOCK_LLM_LATENCY_DISTRIBUTION  fixed, uniform, normal or lognormal (default lognormal)
+    MOCK_LLM_TOKENS_PER_SECOND     Streaming rate, 0 for no delay (default 50)
+    MOCK_LLM_ERROR_RATE            Fraction of calls failing with a server error (default 0)
+    MOCK_LLM_TIMEOUT_RATE          Fraction of calls that time out (default 0)
+    MOCK_LLM_TIMEOUT_S             How long a timed-out call hangs first (default 30)
+    MOCK_LLM_RATE_LIMIT_RATE       Fraction of calls rejected as rate limited (default 0)
+    MOCK_LLM_SEED                  Seed for latency and failure sampling (default 42)
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from agent.llm_factory import SimpleFallbackLLM
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+class MockLLMError(Exception):
+    """Simulated provider failure."""
+
+    status_code = 500
+
+
+class MockRateLimitError(MockLLMError):
+    """Simulated rate-limit rejection."""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MockTimeoutError(MockLLMError):
+    """Simulated request timeout."""
+
+    status_code = 504
+
+
+class MockLLM(SimpleFallbackLLM):
+    """SimpleFallbackLLM with simulated latency, streaming and failures."""
+
+    latency_ms: float = 800.0
+    latency_jitter_ms: float = 200.0
+    latency_distribution: str = "lognormal"
+    tokens_per_second: float = 50.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_s: float = 30.0
+    rate_limit_rate: float = 0.0
+    seed: int = 42
+
+    _rng: random.Random = PrivateAttr()
+    _rng_lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        """Initialize the mock model and its seeded random generator."""
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {self.latency_distribution}")
+        self._rng = random.Random(self.seed)
+        self._rng_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **overrides) -> "MockLLM":
+        """
+        Create a mock model configured from MOCK_LLM_* environment variables.
+
+        Args:
+            **overrides: Field values that take precedence over the environment
+
+        Returns:
+            A configured MockLLM
+        """
+        env_fields = {
+            "latency_ms": ("MOCK_LLM_LATENCY_MS", float),
+            "latency_jitter_ms": ("MOCK_LLM_LATENCY_JITTER_MS", float),
+            "latency_distribution": ("MOCK_LLM_LATENCY_DISTRIBUTION", str),
+            "tokens_per_second": ("MOCK_LLM_TOKENS_PER_SECOND", float),
+            "error_rate": ("MOCK_LLM_ERROR_RATE", float),
+            "timeout_rate": ("MOCK_LLM_TIMEOUT_RATE", float),
+            "timeout_s": ("MOCK_LLM_TIMEOUT_S", float),
+            "rate_limit_rate": ("MOCK_LLM_RATE_LIMIT_RATE", float),
+            "seed": ("MOCK_LLM_SEED", int)
+        }
+        config = {
+            field: parse(os.environ[name])
+            for field, (name, parse) in env_fields.items()
+            if os.environ.get(name)
+        }
+        config.update(overrides)
+        return cls(**config)
+
+    def _sample_call(self) -> Dict[str, Any]:
+        """Sample the latency and outcome of one call."""
+        with self._rng_lock:
+            rng = self._rng
+            mean = self.latency_ms / 1000
+            spread = self.latency_jitter_ms / 1000
+
+            if self.latency_distribution == "fixed" or spread <= 0 or mean <= 0:
+                latency = mean
+            elif self.latency_distribution == "uniform":
+                latency = rng.uniform(mean - spread, mean + spread)
+            elif self.latency_distribution == "normal":
+                latency = rng.gauss(mean, spread)
+            else:
+                # Parameterized so the distribution has the requested mean and std dev
+                sigma = math.sqrt(math.log(1 + (spread / mean) ** 2))
+                latency = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+            roll = rng.random()
+
+        if roll < self.rate_limit_rate:
+            outcome = "rate_limit"
+        elif roll < self.rate_limit_rate + self.timeout_rate:
+            outcome = "timeout"
+        elif roll < self.rate_limit_rate + self.timeout_rate + self.error_rate:
+            outcome = "error"
+        else:
+            outcome = "success"
+
+        return {"latency": max(0.0, latency), "outcome": outcome}
+
+    def _raise_for_outcome(self, outcome: str):
+        """Raise the simulated failure for a sampled outcome."""
+        if outcome == "rate_limit":
+            raise MockRateLimitError("Mock provider rate limit exceeded", retry_after=1.0)
+        if outcome == "timeout":
+            raise MockTimeoutError(f"Mock provider timed out after {self.timeout_s}s")
+        if outcome == "error":
+            raise MockLLMError("Mock provider internal error")
+
+    def _wait_before_response(self, call: Dict[str, Any]) -> float:
+        """Seconds the call takes before responding (or failing)."""
+        if call["outcome"] == "timeout":
+            return self.timeout_s
+        if call["outcome"] == "rate_limit":
+            # Rejections come back quickly
+            return min(call["latency"], 0.05)
+        return call["latency"]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _build_result(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        """Keyword response from SimpleFallbackLLM with token usage attached."""
+        result = super()._generate(messages, **kwargs)
+        content = result.generations[0].message.content
+        input_tokens = count_tokens(messages)
+        output_tokens = len(tokenize(content))
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        """Generate a response after the simulated latency and generation time."""
+        call = self._sample_call()
+        time.sleep(self._wait_before_response(call))
+        self._raise_for_outcome(call["outcome"])
+
+        result = self._build_result(messages, **kwargs)
+        # Non-streaming calls still pay for generating every token
+        time.sleep(self._token_delay() * result.generations[0].message.usage_metadata["output_tokens"])
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        """Async variant of _generate that does not block the event loop."""
+        call = self._sample_call()
+        await asyncio.sleep(self._wait_before_response(call))
+        self._raise_for_outcome(call["outcome"])
+
+        result = self._build_result(messages, **kwargs)
+        await asyncio.sleep(self._token_delay() * result.generations[0].message.usage_metadata["output_tokens"])
+        return result
+
+    def _stream(self, messages: List[BaseMessage], **kwargs) -> Iterator[ChatGenerationChunk]:
+        """Stream the response token by token at tokens_per_second."""
+        call = self._sample_call()
+        time.sleep(self._wait_before_response(call))
+        self._raise_for_outcome(call["outcome"])
+
+        content = self._build_result(messages, **kwargs).generations[0].message.content
+        delay = self._token_delay()
+        for token in tokenize(content):
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        """Async variant of _stream."""
+        call = self._sample_call()
+        await asyncio.sleep(self._wait_before_response(call))
+        self._raise_for_outcome(call["outcome"])
+
+        content = self._build_result(messages, **kwargs).generations[0].message.content
+        delay = self._token_delay()
+        for token in tokenize(content):
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into word tokens that rejoin to the original text."""
+    words = text.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    """Approximate prompt token count by whitespace-separated words."""
+    return sum(len(str(message.content).split()) for message in messages)
+
+
+def create_mock_openai_app(llm: Optional[MockLLM] = None):
+    """
+    Create a FastAPI app speaking the OpenAI chat-completions protocol.
+
+    Supports POST /v1/chat/completions with and without "stream": true.
+    Simulated failures are returned as HTTP errors: 429 with Retry-After for
+    rate limits, 504 for timeouts and 500 for server errors.
+
+    Args:
+        llm: Mock model answering requests; configured from the environment if omitted
+
+    Returns:
+        The FastAPI application
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    llm = llm or MockLLM.from_env()
+    app = FastAPI(title="MindGuard Mock LLM")
+
+    def error_response(error: MockLLMError) -> JSONResponse:
+        headers = {}
+        if isinstance(error, MockRateLimitError):
+            headers["Retry-After"] = str(int(math.ceil(error.retry_after)))
+        error_type = "rate_limit_exceeded" if isinstance(error, MockRateLimitError) else "server_error"
+        return JSONResponse(
+            status_code=error.status_code,
+            content={"error": {"message": str(error), "type": error_type, "code": error.status_code}},
+            headers=headers
+        )
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mindguard"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        # Only the last user message matters to the keyword responder
+        messages = [
+            HumanMessage(content=str(message.get("content", "")))
+            for message in body.get("messages", [])
+            if message.get("role") == "user"
+        ]
+        model = body.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            try:
+                result = await llm._agenerate(messages)
+            except MockLLMError as e:
+                return error_response(e)
+
+            message = result.generations[0].message
+            usage = message.usage_metadata
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": message.content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": usage["input_tokens"],
+                    "completion_tokens": usage["output_tokens"],
+                    "total_tokens": usage["total_tokens"]
+                }
+            }
+
+        # Fail before the stream starts, like a real provider would
+        call = llm._sample_call()
+        await asyncio.sleep(llm._wait_before_response(call))
+        try:
+            llm._raise_for_outcome(call["outcome"])
+        except MockLLMError as e:
+            return error_response(e)
+
+        content = llm._build_result(messages).generations[0].message.content
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def event_stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokenize(content):
+                await asyncio.sleep(llm._token_delay())
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI-compatible chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, help="Mean time to first token")
+    parser.add_argument("--latency-jitter-ms", type=float, help="Spread of the latency distribution")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--tokens-per-second", type=float, help="Streaming rate")
+    parser.add_argument("--error-rate", type=float, help="Fraction of calls returning 500")
+    parser.add_argument("--timeout-rate", type=float, help="Fraction of calls timing out")
+    parser.add_argument("--rate-limit-rate", type=float, help="Fraction of calls returning 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    overrides = {
+        field: value
+        for field, value in vars(args).items()
+        if field not in ("host", "port") and value is not None
+    }
+    llm = MockLLM.from_env(**overrides)
+    print(f"Serving mock LLM on http://{args.host}:{args.port}/v1 "
+          f"({llm.latency_distribution} latency {llm.latency_ms}ms +/- {llm.latency_jitter_ms}ms)")
+    uvicorn.run(create_mock_openai_app(llm), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
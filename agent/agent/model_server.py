@@ -0,0 +1,412 @@
+"""
+Shared model serving for MindGuard.
+
+Each MentalHealthAgent used to load its own EmotionAnalyzer, and every
+uvicorn worker loads its own agents, so transformer weights were held once
+per user per worker. This module provides:
+
+- ModelServer: one inference process that loads the models once and answers
+  requests from any number of API workers over a local socket
+  (multiprocessing.connection). Requests arriving together are batched into a
+  single forward pass.
+- RemoteEmotionAnalyzer / RemoteCrisisDetectionModel: drop-in clients for
+  EmotionAnalyzer and CrisisDetectionModel that call the server.
+- get_emotion_analyzer(): the remote analyzer when MODEL_SERVER_ADDRESS is
+  set, otherwise one analyzer shared by everything in the process.
+
+Run the server on its own:
+    python -m agent.model_server --address ./data/model_server.sock
+or let main.py start it with `python main.py --workers 4`.
+"""
+
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple, Union
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+
+from agent.emotion_analysis import EmotionAnalyzer
+
+DEFAULT_ADDRESS = "./data/model_server.sock"
+DEFAULT_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """'host:port' for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def get_authkey() -> bytes:
+    """Shared secret clients authenticate with, from MODEL_SERVER_AUTHKEY."""
+    key = os.environ.get("MODEL_SERVER_AUTHKEY")
+    if not key:
+        raise ValueError("MODEL_SERVER_AUTHKEY must be set to use the model server")
+    return key.encode()
+
+
+class _Job:
+    __slots__ = ("method", "texts", "result", "done")
+
+    def __init__(self, method: str, texts: List[str]):
+        self.method = method
+        self.texts = texts
+        self.result: Tuple[str, Any] = ("error", "not processed")
+        self.done = threading.Event()
+
+
+class ModelServer:
+    """
+    Inference process holding the only copy of the models.
+
+    Each client connection is served by a thread that queues its requests.
+    A single batching thread takes whatever requests are queued (waiting up
+    to max_wait for more, up to max_batch texts) and runs them through the
+    model together.
+    """
+
+    def __init__(
+        self,
+        address: Address = DEFAULT_ADDRESS,
+        authkey: Optional[bytes] = None,
+        model_path: str = DEFAULT_MODEL,
+        offline_mode: bool = False,
+        cache_dir: str = "./cached_models",
+        crisis_model: Optional[str] = None,
+        max_batch: int = 64,
+        max_wait: float = 0.005
+    ):
+        """
+        Initialize the server and load the models.
+
+        Args:
+            address: Unix socket path or (host, port) to listen on
+            authkey: Shared secret; defaults to MODEL_SERVER_AUTHKEY
+            model_path: Emotion model name or path
+            offline_mode: Use the lexicon and rule-based emotion analyzer
+            cache_dir: Directory to cache models
+            crisis_model: Optional base model for CrisisDetectionModel
+            max_batch: Maximum texts per forward pass
+            max_wait: Seconds to wait for more requests before running a batch
+        """
+        self.address = address
+        self.authkey = authkey or get_authkey()
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.emotion_analyzer = EmotionAnalyzer(model_path=model_path, offline_mode=offline_mode, cache_dir=cache_dir)
+        self.crisis_model = None
+        if crisis_model:
+            from agent.models import CrisisDetectionModel
+            self.crisis_model = CrisisDetectionModel(crisis_model)
+
+        self._jobs: "queue.Queue[_Job]" = queue.Queue()
+        self._listener: Optional[Listener] = None
+        self._closed = False
+
+    def serve_forever(self, ready: Optional[Any] = None):
+        """
+        Accept connections until close() is called.
+
+        Args:
+            ready: Optional event set once the server is listening
+        """
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        if isinstance(self.address, str) and os.path.dirname(self.address):
+            os.makedirs(os.path.dirname(self.address), exist_ok=True)
+
+        self._listener = Listener(self.address, authkey=self.authkey)
+        threading.Thread(target=self._batch_loop, name="model-server-batcher", daemon=True).start()
+        print(f"Model server listening on {self.address}")
+        if ready is not None:
+            ready.set()
+
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except Exception as e:
+                if self._closed:
+                    break
+                # Failed handshakes (e.g. a wrong authkey) only affect that client
+                print(f"Model server rejected a connection: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def close(self):
+        """Stop accepting connections."""
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+
+    def _serve_connection(self, connection):
+        """Answer one client's requests in order."""
+        with connection:
+            while True:
+                try:
+                    method, texts = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if method == "ping":
+                    connection.send(("ok", {"crisis_model": self.crisis_model is not None}))
+                    continue
+                job = _Job(method, texts)
+                self._jobs.put(job)
+                job.done.wait()
+                try:
+                    connection.send(job.result)
+                except (EOFError, OSError):
+                    return
+
+    def _batch_loop(self):
+        """Run queued requests through the models in batches."""
+        while True:
+            jobs = [self._jobs.get()]
+            size = len(jobs[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._jobs.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                size += len(job.texts)
+
+            for method in {job.method for job in jobs}:
+                self._run_batch([job for job in jobs if job.method == method])
+
+    def _run_batch(self, jobs: List[_Job]):
+        """Run one method for several requests in a single call and split the results."""
+        method = jobs[0].method
+        texts = [text for job in jobs for text in job.texts]
+        try:
+            if method == "emotion":
+                results = self.emotion_analyzer.analyze_batch(texts, batch_size=self.max_batch)
+            elif method == "crisis" and self.crisis_model is not None:
+                results = self.crisis_model.predict_batch(texts)
+            else:
+                raise ValueError(f"Unsupported method: {method}")
+        except Exception as e:
+            for job in jobs:
+                job.result = ("error", str(e))
+                job.done.set()
+            return
+
+        offset = 0
+        for job in jobs:
+            job.result = ("ok", results[offset:offset + len(job.texts)])
+            offset += len(job.texts)
+            job.done.set()
+
+
+def run_server(address: Address, authkey: bytes, ready=None, **kwargs):
+    """Process entry point: load the models and serve."""
+    ModelServer(address, authkey, **kwargs).serve_forever(ready)
+
+
+def start_server_process(address: Address = DEFAULT_ADDRESS, authkey: Optional[bytes] = None, **kwargs):
+    """
+    Start a model server in a child process and wait until it is listening.
+
+    Args:
+        address: Unix socket path or (host, port) to listen on
+        authkey: Shared secret; defaults to MODEL_SERVER_AUTHKEY
+        **kwargs: Further ModelServer arguments
+
+    Returns:
+        The server process
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(
+        target=run_server,
+        args=(address, authkey or get_authkey(), ready),
+        kwargs=kwargs,
+        name="model-server",
+        daemon=True
+    )
+    process.start()
+    while not ready.wait(0.5):
+        if not process.is_alive():
+            raise RuntimeError("Model server exited during startup")
+    return process
+
+
+class ModelClient:
+    """
+    Connection to a model server, one per calling thread.
+    """
+
+    def __init__(self, address: Optional[Address] = None, authkey: Optional[bytes] = None):
+        """
+        Initialize the client; connections are opened on first use.
+
+        Args:
+            address: Server address; defaults to MODEL_SERVER_ADDRESS
+            authkey: Shared secret; defaults to MODEL_SERVER_AUTHKEY
+        """
+        self.address = address or parse_address(os.environ.get("MODEL_SERVER_ADDRESS", DEFAULT_ADDRESS))
+        self.authkey = authkey or get_authkey()
+        self._local = threading.local()
+
+    def call(self, method: str, texts: List[str]) -> Any:
+        """
+        Send a request and wait for the result.
+
+        Raises:
+            RuntimeError: If the server reports an error
+            OSError/EOFError: If the server can't be reached
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = Client(self.address, authkey=self.authkey)
+        try:
+            connection.send((method, texts))
+            status, result = connection.recv()
+        except (EOFError, OSError):
+            # Drop the broken connection so the next call reconnects
+            self._local.connection = None
+            connection.close()
+            raise
+        if status != "ok":
+            raise RuntimeError(f"Model server error: {result}")
+        return result
+
+
+class RemoteEmotionAnalyzer:
+    """
+    EmotionAnalyzer that runs the model in the model server.
+
+    Falls back to the local lexicon and rule-based analyzer if the server
+    can't be reached, so the chat keeps working.
+    """
+
+    def __init__(self, client: Optional[ModelClient] = None):
+        self.client = client or ModelClient()
+        self._fallback: Optional[EmotionAnalyzer] = None
+
+    def _fallback_analyzer(self) -> EmotionAnalyzer:
+        if self._fallback is None:
+            self._fallback = EmotionAnalyzer(offline_mode=True)
+        return self._fallback
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """Analyze text for emotional content (see EmotionAnalyzer.analyze)."""
+        return self.analyze_batch([text])[0]
+
+    def analyze_batch(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, Any]]:
+        """Analyze many texts (see EmotionAnalyzer.analyze_batch)."""
+        try:
+            return self.client.call("emotion", texts)
+        except Exception as e:
+            print(f"Model server unavailable, using local emotion analysis: {e}")
+            return self._fallback_analyzer().analyze_batch(texts, batch_size)
+
+
+class RemoteCrisisDetectionModel:
+    """
+    CrisisDetectionModel that runs the model in the model server.
+
+    The server must be started with a crisis model. Falls back to the
+    rule-based prediction if the server can't be reached.
+    """
+
+    def __init__(self, client: Optional[ModelClient] = None):
+        self.client = client or ModelClient()
+
+    def predict(self, text: str) -> Tuple[bool, float]:
+        """Predict if the text contains crisis signals (see CrisisDetectionModel.predict)."""
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> List[Tuple[bool, float]]:
+        """Predict crisis signals for many texts."""
+        try:
+            return [tuple(result) for result in self.client.call("crisis", texts)]
+        except Exception as e:
+            print(f"Model server unavailable, using rule-based crisis detection: {e}")
+            from agent.models import CrisisDetectionModel
+            return [CrisisDetectionModel._rule_based_prediction(text) for text in texts]
+
+
+_analyzers: Dict[Tuple[Any, ...], Any] = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_emotion_analyzer(
+    model_path: str = DEFAULT_MODEL,
+    offline_mode: bool = True,
+    cache_dir: Optional[str] = None
+):
+    """
+    Get the emotion analyzer for this process.
+
+    With MODEL_SERVER_ADDRESS set, returns a client of the model server.
+    Otherwise analyzers are shared per configuration, so the model is loaded
+    once per process rather than once per agent.
+
+    Args:
+        model_path: Path to the emotion detection model or model name
+        offline_mode: Whether to operate in offline mode
+        cache_dir: Directory to cache models and lexicons
+
+    Returns:
+        An EmotionAnalyzer or RemoteEmotionAnalyzer
+    """
+    remote = bool(os.environ.get("MODEL_SERVER_ADDRESS"))
+    key = ("remote",) if remote else (model_path, offline_mode, cache_dir)
+    with _analyzers_lock:
+        analyzer = _analyzers.get(key)
+        if analyzer is None:
+            if remote:
+                analyzer = RemoteEmotionAnalyzer()
+            else:
+                analyzer = EmotionAnalyzer(model_path=model_path, offline_mode=offline_mode, cache_dir=cache_dir)
+            _analyzers[key] = analyzer
+        return analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve MindGuard models to API workers")
+    parser.add_argument("--address", default=os.environ.get("MODEL_SERVER_ADDRESS", DEFAULT_ADDRESS),
+                        help="Unix socket path or host:port")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Emotion model name or path")
+    parser.add_argument("--offline", action="store_true", help="Use the lexicon and rule-based emotion analyzer")
+    parser.add_argument("--cache-dir", default="./cached_models", help="Directory to cache models")
+    parser.add_argument("--crisis-model", default=None, help="Base model for crisis detection (optional)")
+    parser.add_argument("--max-batch", type=int, default=64, help="Maximum texts per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Milliseconds to wait to fill a batch")
+    args = parser.parse_args()
+
+    if not os.environ.get("MODEL_SERVER_AUTHKEY"):
+        os.environ["MODEL_SERVER_AUTHKEY"] = secrets.token_hex(16)
+        print(f"Generated MODEL_SERVER_AUTHKEY={os.environ['MODEL_SERVER_AUTHKEY']} (set it for the API workers)")
+
+    server = ModelServer(
+        parse_address(args.address),
+        model_path=args.model,
+        offline_mode=args.offline,
+        cache_dir=args.cache_dir,
+        crisis_model=args.crisis_model,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
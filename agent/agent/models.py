@@ -75,7 +75,34 @@ class CrisisDetectionModel:
             # Use sophisticated rule-based approach
             return self._rule_based_prediction(text)
     
-    def _rule_based_prediction(self, text: str) -> Tuple[bool, float]:
+    def predict_batch(self, texts: List[str]) -> List[Tuple[bool, float]]:
+        """
+        Predict crisis signals for several texts in one forward pass.
+        
+        Args:
+            texts: The texts to analyze
+            
+        Returns:
+            List of (is_crisis, confidence_score), one per text
+        """
+        if self.model and self.tokenizer and texts:
+            try:
+                inputs = self.tokenizer(
+                    texts, return_tensors="pt", truncation=True, padding=True
+                ).to(self.device)
+                
+                with torch.no_grad():
+                    outputs = self.model(**inputs)
+                    scores = torch.nn.functional.softmax(outputs.logits, dim=1)
+                    crisis_scores = scores[:, 1].tolist()
+                
+                return [(score > 0.5, score) for score in crisis_scores]
+            except Exception as e:
+                print(f"Error in model prediction: {e}")
+        return [self._rule_based_prediction(text) for text in texts]
+    
+    @staticmethod
+    def _rule_based_prediction(text: str) -> Tuple[bool, float]:
         """
         Rule-based crisis detection with weighted features.
         
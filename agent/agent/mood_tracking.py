@@ -10,9 +10,13 @@ from typing import Dict, List, Any, Optional
 import datetime
 import json
 import os
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+
+from agent.storage.user_store import get_user_store, SESSION_SOURCE
+from agent.tracking.charts import chart_data, get_renderer
+from agent.tracking.engine import MoodSeries
+from agent.tracking.timeseries import period_report
 
 
 class MoodTracker:
@@ -26,21 +30,34 @@ class MoodTracker:
     - Data visualization for progress monitoring
     """
     
-    def __init__(self, user_id: str, data_dir: str = "./user_data"):
+    def __init__(self, user_id: str, data_dir: str = "./user_data", store=None):
         """
         Initialize the mood tracker.
         
         Args:
             user_id: Unique identifier for the user
             data_dir: Directory to store mood tracking data
+            store: Optional user data store; defaults to the configured store,
+                or a per-user JSON file in data_dir if none is configured
         """
         self.user_id = user_id
         self.data_dir = data_dir
         self.user_data_path = os.path.join(data_dir, f"{user_id}_mood_data.json")
+        self.store = store if store is not None else get_user_store()
         self.mood_data = self._load_data()
+        # Columnar copy of the entries for reports, kept alongside them
+        self.series = MoodSeries.from_entries(self.mood_data["entries"])
         
     def _load_data(self) -> Dict[str, Any]:
         """Load mood data from disk or initialize if not exists."""
+        if self.store is not None:
+            return {
+                "user_id": self.user_id,
+                "entries": self.store.get_mood_entries(self.user_id, SESSION_SOURCE),
+                "insights": self.store.get_insights(self.user_id),
+                "last_report_date": self.store.get_last_report_date(self.user_id)
+            }
+        
         os.makedirs(self.data_dir, exist_ok=True)
         
         if os.path.exists(self.user_data_path):
@@ -103,7 +120,11 @@ class MoodTracker:
         }
         
         self.mood_data["entries"].append(entry)
-        self._save_data()
+        self.series.append_entry(entry)
+        if self.store is not None:
+            self.store.add_mood_entry(self.user_id, SESSION_SOURCE, entry)
+        else:
+            self._save_data()
         
         # Generate new insights if we have enough data
         if len(self.mood_data["entries"]) % 5 == 0:  # Every 5 entries
@@ -120,12 +141,14 @@ class MoodTracker:
             
         # Get recent entries (last 2 weeks)
         recent_entries = self.mood_data["entries"][-14:]
+        # Check-in scores, where entries carry them (chat entries don't, and
+        # their "mood" is an emotion name rather than a score)
+        sleep_hours = self._scores(recent_entries, "sleep_quality")
+        stress_scores = self._scores(recent_entries, "stress")
+        mood_scores = self._scores(recent_entries, "mood")
         
         # Analyze sleep patterns
-        sleep_hours = [e.get("sleep_quality", 0) for e in recent_entries]
-        avg_sleep = sum(sleep_hours) / len(sleep_hours) if sleep_hours else 0
-        
-        if avg_sleep < 5:
+        if len(sleep_hours) and sleep_hours.mean() < 5:
             new_insights.append({
                 "type": "sleep",
                 "timestamp": datetime.datetime.now().isoformat(),
@@ -134,10 +157,7 @@ class MoodTracker:
             })
         
         # Analyze stress levels
-        stress_scores = [e.get("stress", 0) for e in recent_entries]
-        avg_stress = sum(stress_scores) / len(stress_scores) if stress_scores else 0
-        
-        if avg_stress > 7:
+        if len(stress_scores) and stress_scores.mean() > 7:
             new_insights.append({
                 "type": "stress",
                 "timestamp": datetime.datetime.now().isoformat(),
@@ -146,10 +166,7 @@ class MoodTracker:
             })
         
         # Analyze mood stability
-        mood_scores = [e.get("mood", 0) for e in recent_entries]
-        mood_fluctuation = max(mood_scores) - min(mood_scores) if mood_scores else 0
-        
-        if mood_fluctuation > 5:
+        if len(mood_scores) and mood_scores.max() - mood_scores.min() > 5:
             new_insights.append({
                 "type": "mood_fluctuation",
                 "timestamp": datetime.datetime.now().isoformat(),
@@ -158,8 +175,7 @@ class MoodTracker:
             })
         
         # Analyze persistent low mood
-        low_mood_days = sum(1 for score in mood_scores if score < 4)
-        if low_mood_days > 10:  # More than 10 days of low mood in 2 weeks
+        if np.count_nonzero(mood_scores < 4) > 10:  # More than 10 days of low mood in 2 weeks
             new_insights.append({
                 "type": "persistent_low_mood",
                 "timestamp": datetime.datetime.now().isoformat(),
@@ -180,10 +196,10 @@ class MoodTracker:
             })
         
         # Analyze improvement trends
-        if len(recent_entries) >= 7:  # At least a week of data
-            week_ago = recent_entries[-7:]
-            current_avg = sum(e.get("mood", 0) for e in week_ago[-3:]) / 3  # Last 3 days
-            previous_avg = sum(e.get("mood", 0) for e in week_ago[:4]) / 4  # Previous 4 days
+        week_scores = self._scores(recent_entries[-7:], "mood")
+        if len(week_scores) == 7:  # At least a week of data
+            current_avg = week_scores[-3:].mean()  # Last 3 days
+            previous_avg = week_scores[:4].mean()  # Previous 4 days
             
             improvement = ((current_avg - previous_avg) / previous_avg * 100) if previous_avg != 0 else 0
             
@@ -204,9 +220,20 @@ class MoodTracker:
         
         # Add insights to storage
         self.mood_data["insights"].extend(new_insights)
-        self._save_data()
+        if self.store is not None:
+            self.store.add_insights(self.user_id, new_insights)
+        else:
+            self._save_data()
         
         return new_insights
+
+    @staticmethod
+    def _scores(entries: List[Dict[str, Any]], key: str) -> np.ndarray:
+        """Numeric values of a field, skipping entries without one."""
+        return np.array([
+            e[key] for e in entries
+            if isinstance(e.get(key), (int, float)) and not isinstance(e.get(key), bool)
+        ], dtype=float)
         
     def _get_recommendation_for_mood(self, mood: str) -> str:
         """Get a recommendation based on mood."""
@@ -233,14 +260,13 @@ class MoodTracker:
         Returns:
             List of mood entries
         """
-        cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
-        
-        recent_entries = []
-        for entry in reversed(self.mood_data["entries"]):
-            if entry["date"] >= cutoff_date:
-                recent_entries.append(entry)
-                
-        return recent_entries
+        entries = self.mood_data["entries"]
+        return [entries[i] for i in self._recent_rows(days)]
+
+    def _recent_rows(self, days: int) -> np.ndarray:
+        """Series rows of the last `days` days, newest first."""
+        cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+        return self.series.on_or_after_day(cutoff_date)[::-1]
     
     def get_latest_insights(self, count: int = 3) -> List[Dict[str, Any]]:
         """
@@ -262,9 +288,9 @@ class MoodTracker:
             Report data
         """
         today = datetime.datetime.now().strftime("%Y-%m-%d")
-        today_entries = [e for e in self.mood_data["entries"] if e["date"] == today]
+        today_rows = self.series.on_day(datetime.date.fromisoformat(today))
         
-        if not today_entries:
+        if not len(today_rows):
             return {
                 "date": today,
                 "summary": "No mood data recorded today.",
@@ -272,13 +298,8 @@ class MoodTracker:
             }
         
         # Calculate average valence and most frequent mood
-        avg_valence = sum(e["valence"] for e in today_entries) / len(today_entries)
-        
-        mood_counts = defaultdict(int)
-        for entry in today_entries:
-            mood_counts[entry["mood"]] += 1
-            
-        most_frequent_mood = max(mood_counts, key=mood_counts.get) if mood_counts else "neutral"
+        avg_valence = float(self.series.valences[today_rows].mean())
+        most_frequent_mood = self.series.dominant_emotion(today_rows) or "neutral"
         
         # Generate recommendations
         recommendations = [self._get_recommendation_for_mood(most_frequent_mood)]
@@ -293,7 +314,7 @@ class MoodTracker:
         
         report = {
             "date": today,
-            "entry_count": len(today_entries),
+            "entry_count": len(today_rows),
             "dominant_mood": most_frequent_mood,
             "avg_valence": avg_valence,
             "summary": f"Today you've mostly felt {most_frequent_mood}.",
@@ -301,7 +322,10 @@ class MoodTracker:
         }
         
         self.mood_data["last_report_date"] = today
-        self._save_data()
+        if self.store is not None:
+            self.store.set_last_report_date(self.user_id, today)
+        else:
+            self._save_data()
         
         return report
         
@@ -313,9 +337,9 @@ class MoodTracker:
             Report data with visualizations
         """
         # Get data from the last 7 days
-        recent_entries = self.get_recent_moods(days=7)
+        recent_rows = self._recent_rows(days=7)
         
-        if not recent_entries:
+        if not len(recent_rows):
             return {
                 "period": "last 7 days",
                 "summary": "No mood data recorded in the last week.",
@@ -323,29 +347,15 @@ class MoodTracker:
             }
         
         # Organize data by day
-        days = []
-        valences = []
-        intensities = []
-        
-        for i in range(7):
-            date = (datetime.datetime.now() - datetime.timedelta(days=6-i)).strftime("%Y-%m-%d")
-            day_entries = [e for e in recent_entries if e["date"] == date]
-            
-            days.append(date)
-            
-            if day_entries:
-                valences.append(sum(e["valence"] for e in day_entries) / len(day_entries))
-                intensities.append(sum(e["intensity"] for e in day_entries) / len(day_entries))
-            else:
-                valences.append(0)
-                intensities.append(0)
+        first_day = (datetime.datetime.now() - datetime.timedelta(days=6)).date()
+        days = [(first_day + datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
+        day_valences, day_intensities, _ = self.series.daily_means(recent_rows, first_day, 7)
+        valences = day_valences.tolist()
+        intensities = day_intensities.tolist()
                 
         # Count moods
-        mood_counts = defaultdict(int)
-        for entry in recent_entries:
-            mood_counts[entry["mood"]] += 1
-            
-        top_moods = sorted(mood_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+        mood_counts = self.series.emotion_counts(recent_rows)
+        top_moods = sorted(mood_counts, key=lambda x: x[1], reverse=True)[:3]
         top_moods = [{"mood": mood, "count": count} for mood, count in top_moods]
         
         # Check for trends
@@ -384,49 +394,70 @@ class MoodTracker:
         }
         
         return report
+
+    def generate_monthly_report(self) -> Dict[str, Any]:
+        """
+        Generate a 30-day mood report with trend and volatility analytics.
+        
+        Returns:
+            Report data (see agent.tracking.timeseries.period_report) with a
+            summary and recommendations
+        """
+        report = period_report(self.series, days=30)
+        report["period"] = "last 30 days"
+        
+        if not report["entry_count"]:
+            report["summary"] = "No mood data recorded in the last month."
+            report["recommendations"] = ["Regular mood logging helps build meaningful insights."]
+            return report
+        
+        recommendations = []
+        if report["trend"] == "improving":
+            recommendations.append("Your mood has improved over the month. Keep up what you're doing!")
+        elif report["trend"] == "declining":
+            recommendations.append("Your mood has been declining this month. Consider what factors might be contributing.")
+        rmssd = report["volatility"]["rmssd"]
+        if rmssd is not None and rmssd > 0.5:
+            recommendations.append("Your mood has been changing a lot from day to day. Noting what happens on difficult days can help spot patterns.")
+        recommendations.append(self._get_recommendation_for_mood(report["dominant_emotion"]))
+        
+        report["summary"] = f"Your mood has been {report['trend']} over the past month."
+        report["recommendations"] = recommendations
+        return report
+        
+    def get_chart_data(self, report_type: str = "weekly") -> Dict[str, Any]:
+        """
+        Series for drawing a mood chart client-side.
+        
+        Args:
+            report_type: Type of report ("daily", "weekly" or "monthly")
+            
+        Returns:
+            Chart data (see agent.tracking.charts.chart_data)
+        """
+        return chart_data(self.series, report_type)
         
     def generate_visualization(self, output_path: str, report_type: str = "weekly") -> bool:
         """
         Generate a visualization of mood data.
         
+        The chart is rendered by the shared chart renderer (in a worker
+        process, cached until the data changes); the format follows the
+        file extension (.svg, otherwise PNG).
+        
         Args:
             output_path: Path to save the visualization
-            report_type: Type of report ("daily" or "weekly")
+            report_type: Type of report ("daily", "weekly" or "monthly")
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            if report_type == "weekly":
-                report = self.generate_weekly_report()
-                
-                fig, ax = plt.subplots(figsize=(10, 6))
-                
-                # Plot valence line
-                ax.plot(report["days"], report["valences"], marker='o', linewidth=2, label="Mood Valence")
-                
-                # Add intensity as area
-                ax.fill_between(report["days"], report["intensities"], alpha=0.2, color="orange", label="Intensity")
-                
-                # Add labels and title
-                ax.set_xlabel("Date")
-                ax.set_ylabel("Valence (-1 to +1)")
-                ax.set_title("Weekly Mood Tracking")
-                ax.grid(True, linestyle="--", alpha=0.7)
-                ax.legend()
-                
-                # Save the figure
-                plt.tight_layout()
-                plt.savefig(output_path)
-                plt.close()
-                
-                return True
-                
-            elif report_type == "daily":
-                # Implementation for daily visualization
-                return True
-                
-            return False
+            fmt = "svg" if output_path.lower().endswith(".svg") else "png"
+            image = get_renderer().render(self.user_id, self.get_chart_data(report_type), fmt)
+            with open(output_path, 'wb') as f:
+                f.write(image)
+            return True
             
         except Exception as e:
             print(f"Error generating visualization: {e}")
@@ -0,0 +1,364 @@
+"""
+Metrics and tracing for the MindGuard agent.
+
+Keeps Prometheus-style counters and histograms in process and renders them in
+the Prometheus text exposition format for the /metrics endpoint. Timing spans
+are also exported through OpenTelemetry when the SDK is installed and
+configured; without it spans only feed the histograms.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from opentelemetry import trace
+    OPENTELEMETRY_AVAILABLE = True
+except ImportError:
+    OPENTELEMETRY_AVAILABLE = False
+
+# Latency buckets in seconds, from fast in-process nodes to slow LLM calls
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set, e.g. {node="safety_check",le="0.1"}."""
+    parts = [
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    """Base class for labelled metrics."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, description: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """Render the metric in Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            for key, value in items:
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    @abstractmethod
+    def _render_value(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        """Prometheus text lines of one label set's value."""
+
+    def reset(self):
+        """Clear all recorded values."""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        """
+        Increment the counter.
+
+        Args:
+            amount: Amount to add
+            **labels: Label values for this observation
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value for a label set."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    """Histogram with cumulative buckets, sum and count."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value
+            **labels: Label values for this observation
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """Count and sum for a label set."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": state[2], "sum": state[1]}
+
+    def _render_value(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Register a metric, returning the existing one if the name is taken."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Clear all recorded values."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+# Content type for the Prometheus text exposition format
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+NODE_LATENCY = REGISTRY.histogram(
+    "mindguard_node_latency_seconds",
+    "Time spent in each workflow node",
+    ("node",)
+)
+NODE_ERRORS = REGISTRY.counter(
+    "mindguard_node_errors_total",
+    "Workflow node calls that raised an exception",
+    ("node",)
+)
+LLM_LATENCY = REGISTRY.histogram(
+    "mindguard_llm_latency_seconds",
+    "LLM call latency by provider",
+    ("provider",)
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "mindguard_llm_requests_total",
+    "LLM calls by provider and outcome",
+    ("provider", "status")
+)
+LLM_TOKENS = REGISTRY.histogram(
+    "mindguard_llm_tokens",
+    "Tokens per LLM call by provider and direction",
+    ("provider", "direction"),
+    buckets=TOKEN_BUCKETS
+)
+CHAT_TURNS = REGISTRY.counter(
+    "mindguard_chat_turns_total",
+    "Chat turns processed by the workflow"
+)
+ESCALATIONS = REGISTRY.counter(
+    "mindguard_escalations_total",
+    "Chat turns escalated to crisis resources, by detected emotion",
+    ("emotion",)
+)
+
+
+def _get_tracer():
+    """Get the OpenTelemetry tracer, or None when unavailable."""
+    if not OPENTELEMETRY_AVAILABLE:
+        return None
+    return trace.get_tracer("mindguard.agent")
+
+
+@contextmanager
+def span(name: str, histogram: Optional[Histogram] = None, **attributes) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block of work as a span.
+
+    Args:
+        name: Span name
+        histogram: Optional histogram to record the duration in, labelled
+            with the given attributes
+        **attributes: Span attributes (also used as histogram labels)
+
+    Yields:
+        A dict of attributes; values added to it are attached to the span
+    """
+    tracer = _get_tracer()
+    extra: Dict[str, Any] = {}
+    start = time.perf_counter()
+
+    if tracer is None:
+        try:
+            yield extra
+        finally:
+            if histogram is not None:
+                histogram.observe(time.perf_counter() - start, **attributes)
+        return
+
+    with tracer.start_as_current_span(name, attributes=attributes) as otel_span:
+        try:
+            yield extra
+        finally:
+            if histogram is not None:
+                histogram.observe(time.perf_counter() - start, **attributes)
+            for key, value in extra.items():
+                otel_span.set_attribute(key, value)
+
+
+def traced_node(name: str, func: Callable) -> Callable:
+    """
+    Wrap a workflow node so each call is timed and traced.
+
+    Args:
+        name: Node name used for the span and metric label
+        func: The node function
+
+    Returns:
+        The wrapped node function
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(f"node.{name}", NODE_LATENCY, node=name):
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                NODE_ERRORS.inc(node=name)
+                raise
+    return wrapper
+
+
+def get_token_usage(response: Any) -> Dict[str, int]:
+    """
+    Extract token counts from an LLM response message.
+
+    Reads LangChain's usage_metadata, falling back to the provider's
+    token_usage in response_metadata.
+
+    Args:
+        response: The message returned by the LLM
+
+    Returns:
+        Dict with 'input' and 'output' token counts (missing counts omitted)
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        return {
+            direction: usage[key]
+            for direction, key in (("input", "input_tokens"), ("output", "output_tokens"))
+            if usage.get(key) is not None
+        }
+
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return {
+        direction: token_usage[key]
+        for direction, key in (("input", "prompt_tokens"), ("output", "completion_tokens"))
+        if token_usage.get(key) is not None
+    }
+
+
+def record_llm_call(provider: str, seconds: float, response: Any = None, error: bool = False):
+    """
+    Record the latency, outcome and token usage of an LLM call.
+
+    Args:
+        provider: Provider label
+        seconds: Call duration in seconds
+        response: The response message, if the call succeeded
+        error: Whether the call failed
+    """
+    LLM_LATENCY.observe(seconds, provider=provider)
+    LLM_REQUESTS.inc(provider=provider, status="error" if error else "success")
+    if response is not None:
+        for direction, count in get_token_usage(response).items():
+            LLM_TOKENS.observe(count, provider=provider, direction=direction)
+
+
+def render_metrics() -> str:
+    """Render all MindGuard metrics in Prometheus text format."""
+    return REGISTRY.render()
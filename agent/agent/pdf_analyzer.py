@@ -1,152 +1,390 @@
+"""
+Analyze a PDF medical report with a local llama.cpp model.
+
+One-off use loads the model, analyzes the PDF and exits:
+    python pdf_analyzer.py report.pdf
+
+Loading a multi-GB gguf for every PDF dominates the run time, so the model
+can also be kept resident in an analyzer service:
+    python pdf_analyzer.py --serve --address ./data/pdf_analyzer.sock
+With PDF_ANALYZER_ADDRESS set to the same address, `python pdf_analyzer.py
+report.pdf` extracts the text and sends it to the service instead of loading
+the model, falling back to a local model if the service isn't running.
+A host:port address serves over TCP, which requires a shared secret in
+PDF_ANALYZER_AUTHKEY on both ends.
+
+Answers are constrained to the questionnaire schema with a GBNF grammar and
+streamed through a validating parser (see structured_output).
+
+The service holds a pool of model contexts over one memory-mapped copy of
+the weights, so several report chunks (from one PDF or from different
+clients) are analyzed at once, and each context reuses the evaluated
+instruction prefix that every chunk prompt starts with.
+"""
+
 import sys
 import json
-import fitz  # PyMuPDF
-from typing import Dict, Any
+import argparse
+import queue
+import threading
+from contextlib import contextmanager, nullcontext
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 import os
 from llama_cpp import Llama
+from pdf_text import extract_pages_from_pdf
+from pdf_cache import analysis_version, cached_pages, file_digest, open_cache
+from report_extraction import (
+    split_report, build_chunk_prompt, instruction_prefix, normalize_partial,
+    reduce_questionnaire, reduce_emotion_reports, map_chunks, extraction_fingerprint
+)
+from structured_output import (
+    QUESTIONNAIRE_KEY, gbnf_grammar, generate_structured, questionnaire_validator
+)
+
+try:
+    from llama_cpp import LlamaRAMCache
+except ImportError:
+    LlamaRAMCache = None
+
+try:
+    from llama_cpp import LlamaGrammar
+except ImportError:
+    LlamaGrammar = None
+
+# Tokens each chunk's answer may use; the chunk and prompt must fit in the rest of the context
+CHUNK_MAX_TOKENS = 768
+
+# New generations tried after an invalid chunk answer
+STRUCTURED_RETRIES = 1
+
+DEFAULT_MODEL_PATH = "models/llama-2-7b-chat.gguf"
+DEFAULT_ADDRESS = "./data/pdf_analyzer.sock"
+
+# Saved prompt states per context; enough for the instruction prefix and a few recent chunks
+PROMPT_CACHE_BYTES = 256 << 20
+
+Address = Union[str, Tuple[str, int]]
+
+
+class LlamaPool:
+    """
+    A fixed set of Llama contexts over one model file.
+
+    The weights are memory-mapped, so every context (and every process
+    serving the same file) shares one copy in the page cache; each context
+    only adds its own KV cache. The available cores are divided between the
+    contexts. A Llama instance can't run two calls at once, so callers
+    borrow a context with acquire().
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        size: Optional[int] = None,
+        n_ctx: int = 4096,
+        n_threads: Optional[int] = None
+    ):
+        """
+        Load the model contexts.
+
+        Args:
+            model_path: gguf file; defaults to LLAMA_MODEL_PATH
+            size: Number of contexts; defaults to LLAMA_POOL_SIZE or 1
+            n_ctx: Context window of each context
+            n_threads: Total threads across the pool; defaults to LLAMA_THREADS or the CPU count
+        """
+        self.model_path = model_path or os.getenv("LLAMA_MODEL_PATH", DEFAULT_MODEL_PATH)
+        self.size = max(1, size or int(os.getenv("LLAMA_POOL_SIZE", "1")))
+        total_threads = n_threads or int(os.getenv("LLAMA_THREADS", "0")) or os.cpu_count() or 1
+        threads_per_context = max(1, total_threads // self.size)
+
+        self._available: "queue.Queue[Llama]" = queue.Queue()
+        for _ in range(self.size):
+            llm = Llama(
+                model_path=self.model_path,
+                n_ctx=n_ctx,
+                n_threads=threads_per_context,
+                n_threads_batch=threads_per_context,
+                use_mmap=True,
+                verbose=False
+            )
+            if LlamaRAMCache is not None:
+                llm.set_cache(LlamaRAMCache(capacity_bytes=PROMPT_CACHE_BYTES))
+            self._warm_up(llm)
+            self._available.put(llm)
+
+    @staticmethod
+    def _warm_up(llm: Llama):
+        """Evaluate the shared instruction prefix so the first chunk starts from a cached state."""
+        try:
+            llm(instruction_prefix(include_emotion_report=True), max_tokens=1, temperature=0.0)
+        except Exception as e:
+            print(f"Warm-up failed, continuing without it: {e}", file=sys.stderr)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Llama]:
+        """Borrow a context, waiting until one is free."""
+        llm = self._available.get()
+        try:
+            yield llm
+        finally:
+            self._available.put(llm)
+
+
+def chunk_chars() -> int:
+    """Characters per report chunk; the chunk and prompt must fit the context window."""
+    return int(os.getenv("REPORT_CHUNK_CHARS", "8000"))
+
+
+def cache_version(model_path: str) -> str:
+    """Version of the analyses a model produces, for the result cache."""
+    return analysis_version(os.path.basename(model_path), CHUNK_MAX_TOKENS, chunk_chars(), extraction_fingerprint())
+
+
+def analyze_medical_report(report: Union[str, List[str]], llm: Union[Llama, LlamaPool]) -> Dict[str, Any]:
+    """
+    Analyze medical report text using LLM.
+
+    The report is split into chunks that fit the model's context window; each
+    chunk is analyzed separately and the results are merged (see report_extraction).
+
+    Args:
+        report: Report text, or its pages in order
+        llm: The loaded model, or a pool of contexts to analyze chunks concurrently
+    """
+    chunks = split_report(report, max_chars=chunk_chars())
+    pool = llm if isinstance(llm, LlamaPool) else None
+
+    def stream(prompt: str) -> Iterator[str]:
+        # Grammar state is per generation, so each call gets its own
+        grammar = LlamaGrammar.from_string(gbnf_grammar(include_emotion_report=True), verbose=False) if LlamaGrammar else None
+        with pool.acquire() if pool else nullcontext(llm) as context:
+            for part in context(
+                prompt,
+                max_tokens=CHUNK_MAX_TOKENS,
+                temperature=0.2,
+                stop=["```"],
+                grammar=grammar,
+                stream=True,
+                echo=False
+            ):
+                yield part["choices"][0]["text"]
+
+    def extract_chunk(chunk: str, index: int, total: int) -> Dict[str, Any]:
+        # Stream the response from the LLM, stopping once the JSON object is closed
+        prompt = build_chunk_prompt(chunk, index, total, include_emotion_report=True)
+        analysis = generate_structured(
+            lambda: stream(prompt),
+            questionnaire_validator((QUESTIONNAIRE_KEY,)),
+            retries=STRUCTURED_RETRIES
+        )
+        return {
+            "questionnaire_data": normalize_partial(analysis.get("questionnaire_data") or {}),
+            "emotion_report": analysis.get("emotion_report") or {}
+        }
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a PDF file."""
     try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        # One Llama instance can't run calls concurrently, so without a pool chunks are analyzed in turn
+        partials = map_chunks(chunks, extract_chunk, max_workers=pool.size if pool else 1)
+        return {
+            "questionnaire_data": reduce_questionnaire([p["questionnaire_data"] for p in partials]),
+            "emotion_report": reduce_emotion_reports([p["emotion_report"] for p in partials])
+        }
     except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
-    finally:
-        if 'doc' in locals():
-            doc.close()
-
-def analyze_medical_report(text: str, llm: Llama) -> Dict[str, Any]:
-    """Analyze medical report text using LLM."""
-    
-    # Prompt for the LLM to analyze the medical report
-    prompt = f"""You are a mental health professional analyzing a medical report. Based on the following report text, extract relevant information about the patient's mental health state and provide structured data according to our questionnaire format.
-
-Report Text:
-{text}
-
-Please analyze the text and provide a JSON response with the following structure:
-{{
-    "questionnaire_data": {{
-        "mood": <number 1-10>,
-        "anxiety": <"none"|"mild"|"moderate"|"severe">,
-        "sleep_quality": <number 1-10>,
-        "energy_levels": <number 1-10>,
-        "physical_symptoms": <"none"|"mild"|"moderate"|"severe">,
-        "concentration": <number 1-10>,
-        "self_care": <"none"|"minimal"|"moderate"|"extensive">,
-        "social_interactions": <number 1-10>,
-        "intrusive_thoughts": <"none"|"mild"|"moderate"|"severe">,
-        "optimism": <number 1-10>,
-        "stress_factors": <string describing main stressors>,
-        "coping_strategies": <string describing coping methods>,
-        "social_support": <number 1-10>,
-        "self_harm": <"none"|"passive"|"active"|"severe">,
-        "discuss_professional": <string about professional discussion needs>
-    }},
-    "emotion_report": {{
-        "summary": {{
-            "emotions_count": {{"neutral": 1}},
-            "average_confidence": <number 0-1>,
-            "average_valence": <number 0-1>,
-            "crisis_count": <number>,
-            "risk_factors": []
-        }},
-        "disorder_indicators": []
-    }}
-}}
-
-Ensure all numeric values are within their specified ranges and categorical values match the exact options given. Make educated guesses based on the context if specific values aren't directly stated, but maintain clinical accuracy."""
-
-    # Get response from LLM
-    response = llm(
-        prompt,
-        max_tokens=2000,
-        temperature=0.2,
-        stop=["```"],
-        echo=False
-    )
+        raise Exception(f"Error processing LLM response: {str(e)}")
+
+
+def parse_address(address: str) -> Address:
+    """'host:port' for TCP, anything else is a Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def get_authkey(address: Address) -> Optional[bytes]:
+    """
+    Shared secret for the analyzer service, from PDF_ANALYZER_AUTHKEY.
+
+    Optional for a Unix socket, which only the user running the service can
+    reach, but required for TCP: requests are unpickled, so an
+    unauthenticated port would let anyone who can reach it run code.
 
+    Raises:
+        ValueError: If the address is TCP and no key is set
+    """
+    key = os.getenv("PDF_ANALYZER_AUTHKEY")
+    if not key and not isinstance(address, str):
+        raise ValueError("PDF_ANALYZER_AUTHKEY must be set to use the analyzer service over TCP")
+    return key.encode() if key else None
+
+
+def serve(address: Address, pool: LlamaPool, authkey: Optional[bytes] = None):
+    """
+    Answer analysis requests until interrupted.
+
+    Each connection is served by its own thread and may send any number of
+    requests: {"pages": [...]} (or {"text": ...}) is answered with
+    ("ok", analysis) or ("error", message), and {"ping": True} with
+    ("ok", {"version": ...}) (see cache_version).
+
+    Args:
+        address: Unix socket path or (host, port)
+        pool: The loaded model contexts
+        authkey: Shared secret clients must present; required for TCP, a
+            Unix socket is otherwise only reachable by the user running the
+            service
+
+    Raises:
+        ValueError: If the address is TCP and there is no authkey
+    """
+    if authkey is None and not isinstance(address, str):
+        raise ValueError("An authkey is required to serve over TCP")
+    if isinstance(address, str):
+        os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+        if os.path.exists(address):
+            os.unlink(address)
+        previous_umask = os.umask(0o177)
     try:
-        # Extract the JSON part from the response
-        response_text = response["choices"][0]["text"]
-        # Find the start and end of the JSON object
-        start = response_text.find("{")
-        end = response_text.rfind("}") + 1
-        json_str = response_text[start:end]
-        
-        # Parse the JSON response
-        analysis = json.loads(json_str)
-        
-        # Validate the response structure
-        required_fields = {
-            "questionnaire_data": [
-                "mood", "anxiety", "sleep_quality", "energy_levels",
-                "physical_symptoms", "concentration", "self_care",
-                "social_interactions", "intrusive_thoughts", "optimism",
-                "stress_factors", "coping_strategies", "social_support",
-                "self_harm", "discuss_professional"
-            ],
-            "emotion_report": {
-                "summary": [
-                    "emotions_count", "average_confidence",
-                    "average_valence", "crisis_count", "risk_factors"
-                ],
-                "disorder_indicators": []
-            }
-        }
+        listener = Listener(address, authkey=authkey)
+    finally:
+        if isinstance(address, str):
+            os.umask(previous_umask)
 
-        # Validate questionnaire_data
-        for field in required_fields["questionnaire_data"]:
-            if field not in analysis["questionnaire_data"]:
-                raise ValueError(f"Missing required field: questionnaire_data.{field}")
+    print(f"PDF analyzer listening on {address} with {pool.size} context(s)", file=sys.stderr)
+    with listener:
+        while True:
+            try:
+                connection = listener.accept()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                # Failed handshakes (e.g. a wrong authkey) only affect that client
+                print(f"Rejected connection: {e}", file=sys.stderr)
+                continue
+            threading.Thread(target=_serve_connection, args=(connection, pool), daemon=True).start()
 
-        # Validate emotion_report
-        for field in required_fields["emotion_report"]["summary"]:
-            if field not in analysis["emotion_report"]["summary"]:
-                raise ValueError(f"Missing required field: emotion_report.summary.{field}")
 
-        if "disorder_indicators" not in analysis["emotion_report"]:
-            raise ValueError("Missing required field: emotion_report.disorder_indicators")
+def _serve_connection(connection, pool: LlamaPool):
+    """Answer one client's requests until it disconnects."""
+    with connection:
+        while True:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if request.get("ping"):
+                    connection.send(("ok", {"version": cache_version(pool.model_path)}))
+                    continue
+                report = request["pages"] if "pages" in request else request["text"]
+                connection.send(("ok", analyze_medical_report(report, pool)))
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                connection.send(("error", str(e)))
 
-        return analysis
 
-    except json.JSONDecodeError as e:
-        raise Exception(f"Error parsing LLM response as JSON: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Error processing LLM response: {str(e)}")
+def connect_service(address: Address, authkey: Optional[bytes] = None):
+    """
+    Connect to a running analyzer service.
+
+    Returns:
+        (connection, cache version of the service's analyses), or None if it can't be reached
+    """
+    try:
+        connection = Client(address, authkey=authkey)
+        connection.send({"ping": True})
+        _, info = connection.recv()
+        return connection, info["version"]
+    except (OSError, EOFError) as e:
+        print(f"PDF analyzer service not reachable at {address}: {e}", file=sys.stderr)
+        return None
+    except AuthenticationError as e:
+        print(f"PDF analyzer service at {address} rejected the authkey: {e}", file=sys.stderr)
+        return None
+
+
+def analyze_remote(connection, pages: List[str]) -> Dict[str, Any]:
+    """
+    Analyze report pages with the analyzer service.
+
+    Raises:
+        Exception: If the service failed to analyze the report
+    """
+    connection.send({"pages": pages})
+    status, result = connection.recv()
+    if status != "ok":
+        raise Exception(result)
+    return result
+
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python pdf_analyzer.py <pdf_path>")
+    parser = argparse.ArgumentParser(description="Analyze a PDF medical report with a local LLM")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to analyze")
+    parser.add_argument("--serve", action="store_true", help="Keep the model loaded and serve analysis requests")
+    parser.add_argument("--address", default=None, help=f"Service socket path or host:port (default: PDF_ANALYZER_ADDRESS or {DEFAULT_ADDRESS})")
+    parser.add_argument("--pool-size", type=int, default=None, help="Model contexts in the service (default: LLAMA_POOL_SIZE or 1)")
+    args = parser.parse_args()
+
+    if not args.serve and not args.pdf_path:
+        print("Usage: python pdf_analyzer.py <pdf_path> | --serve [--address ADDRESS] [--pool-size N]")
         sys.exit(1)
 
-    pdf_path = sys.argv[1]
-    
+    if args.serve:
+        address = parse_address(args.address or os.getenv("PDF_ANALYZER_ADDRESS", DEFAULT_ADDRESS))
+        try:
+            authkey = get_authkey(address)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        serve(address, LlamaPool(size=args.pool_size), authkey)
+        return
+
+    service = None
+    address = args.address or os.getenv("PDF_ANALYZER_ADDRESS")
+    if address:
+        address = parse_address(address)
+        try:
+            service = connect_service(address, get_authkey(address))
+        except ValueError as e:
+            print(f"Not using the PDF analyzer service: {e}", file=sys.stderr)
+        if service is None:
+            print("Loading the model locally", file=sys.stderr)
+
+    cache = open_cache()
     try:
-        # Initialize LLM
-        model_path = os.getenv("LLAMA_MODEL_PATH", "models/llama-2-7b-chat.gguf")
-        llm = Llama(
-            model_path=model_path,
-            n_ctx=4096,  # Increased context window
-            n_threads=4
-        )
-        
-        # Extract text from PDF
-        text = extract_text_from_pdf(pdf_path)
-        
-        # Analyze the text
-        analysis = analyze_medical_report(text, llm)
-        
+        # A re-uploaded report is answered from the cache by its content hash
+        digest = file_digest(args.pdf_path)
+        model_path = os.getenv("LLAMA_MODEL_PATH", DEFAULT_MODEL_PATH)
+        version = service[1] if service else cache_version(model_path)
+        analysis = cache.get_analysis(digest, version) if cache else None
+
+        if analysis is None:
+            # Extract text from PDF
+            pages = cached_pages(cache, digest, lambda: extract_pages_from_pdf(args.pdf_path))
+
+            # Analyze the text, in the service or with a locally loaded model
+            if service:
+                analysis = analyze_remote(service[0], pages)
+            else:
+                analysis = analyze_medical_report(pages, LlamaPool(model_path, size=1))
+            if cache:
+                cache.put_analysis(digest, version, analysis)
+
         # Output the analysis as JSON
         print(json.dumps(analysis))
-        
+
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
         sys.exit(1)
+    finally:
+        if cache:
+            cache.close()
+        if service:
+            service[0].close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
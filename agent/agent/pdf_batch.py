@@ -0,0 +1,315 @@
+"""
+Batch analysis of many PDF reports, e.g. a clinic's historical records.
+
+Text extraction runs in a process pool while LLM analysis runs in threads
+behind a concurrency limit, so both stay busy. Each finished report is
+appended to a JSONL file straight away; rerunning the same command skips
+reports already analyzed there, so an interrupted batch resumes where it
+stopped. Progress, throughput and latency go to stderr.
+
+Results and extracted pages also go through the PDF cache (see pdf_cache),
+so duplicate files in a batch are only analyzed once.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+from pdf_cache import file_digest, open_cache
+from pdf_text import extract_pages_from_pdf
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 10.0
+
+
+class RateLimiter:
+    """
+    Spaces out requests to stay under a requests-per-minute quota.
+
+    Shared by all threads making requests. After a rate-limit error, back_off()
+    holds every caller for a while instead of letting each retry hit the quota.
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for the next request slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def back_off(self, seconds: float):
+        """Hold all requests for at least `seconds`."""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an API error means the quota was exceeded (HTTP 429 / ResourceExhausted)."""
+    message = str(error).lower()
+    return (
+        type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+        or "429" in message
+        or "rate limit" in message
+        or "quota" in message
+    )
+
+
+def call_with_retries(
+    func: Callable[[], Any],
+    limiter: Optional[RateLimiter] = None,
+    retries: int = 5,
+    base_delay: float = 2.0
+) -> Any:
+    """
+    Call an API function, retrying rate-limit errors with exponential back-off.
+
+    Args:
+        func: The request to make
+        limiter: Rate limiter to wait on before each attempt
+        retries: Retries after the first attempt
+        base_delay: Back-off before the first retry, doubled each time
+
+    Returns:
+        The function's result
+
+    Raises:
+        Exception: Errors other than rate limiting, or the last rate-limit error
+    """
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or not is_rate_limit_error(e):
+                raise
+            delay = base_delay * 2 ** attempt
+            if limiter:
+                limiter.back_off(delay)
+            else:
+                time.sleep(delay)
+
+
+def collect_pdfs(source: str) -> List[str]:
+    """
+    PDF paths to analyze.
+
+    Args:
+        source: A directory (searched recursively for *.pdf) or a manifest
+            file with one path per line; relative paths are relative to the
+            manifest, and blank lines and # comments are ignored
+
+    Returns:
+        Absolute paths, in a stable order
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        return sorted(os.path.abspath(path) for path in paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(os.path.abspath(os.path.join(base, line)))
+    return list(dict.fromkeys(paths))
+
+
+def completed_paths(output_path: str) -> Set[str]:
+    """
+    Paths with a successful result in an existing output file.
+
+    A line cut short by a crash is ignored, so that report is redone.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def _extract(pdf_path: str) -> List[str]:
+    """Worker task: page texts of a PDF (extracted in-process; the pool is the parallelism)."""
+    return extract_pages_from_pdf(pdf_path, workers=1)
+
+
+class BatchStats:
+    """Counts and latencies of a batch run."""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.cached = 0
+        self.pages = 0
+        self.latencies: List[float] = []
+        self.llm_latencies: List[float] = []
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def record(self, ok: bool, latency: float, pages: int = 0, llm_latency: Optional[float] = None, cached: bool = False):
+        """Count one finished report."""
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.cached += cached
+        self.pages += pages
+        self.latencies.append(latency)
+        if llm_latency is not None:
+            self.llm_latencies.append(llm_latency)
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + self.failed
+
+    def maybe_report(self):
+        """Print a progress line if PROGRESS_INTERVAL has passed."""
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            print(self.progress_line(), file=sys.stderr)
+
+    def progress_line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = self.total - self.done
+        eta = f"{remaining / rate:.0f}s" if rate else "?"
+        return f"{self.done}/{self.total} reports ({self.failed} failed), {rate:.2f} reports/s, ETA {eta}"
+
+    def summary(self) -> str:
+        """Final throughput and latency report."""
+        elapsed = time.perf_counter() - self.started
+        lines = [
+            f"Analyzed {self.succeeded} reports ({self.cached} from cache), {self.failed} failed, "
+            f"{self.skipped} already done, in {elapsed:.1f}s",
+            f"Throughput: {self.done / elapsed if elapsed else 0:.2f} reports/s, "
+            f"{self.pages / elapsed if elapsed else 0:.1f} pages/s",
+        ]
+        for name, values in (("Report latency", self.latencies), ("LLM latency", self.llm_latencies)):
+            if values:
+                ordered = sorted(values)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                lines.append(
+                    f"{name}: p50 {statistics.median(ordered):.2f}s, p95 {p95:.2f}s, max {ordered[-1]:.2f}s"
+                )
+        return "\n".join(lines)
+
+
+async def _run_batch(
+    paths: List[str],
+    analyze: Callable[[List[str]], Dict[str, Any]],
+    version: str,
+    out,
+    stats: BatchStats,
+    extract_workers: int,
+    concurrency: int
+):
+    loop = asyncio.get_running_loop()
+    cache = open_cache()
+    llm_slots = asyncio.Semaphore(concurrency)
+    # Reports between extraction and output, so pages of a huge batch aren't all held at once
+    in_flight = asyncio.Semaphore(concurrency + 2 * extract_workers)
+
+    def write(record: Dict[str, Any]):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as llm_pool:
+
+        async def handle(path: str):
+            async with in_flight:
+                start = time.perf_counter()
+                try:
+                    digest = await loop.run_in_executor(extract_pool, file_digest, path)
+                    analysis = cache.get_analysis(digest, version) if cache else None
+                    pages, llm_latency = [], None
+                    if analysis is None:
+                        pages = cache.get_pages(digest) if cache else None
+                        if pages is None:
+                            pages = await loop.run_in_executor(extract_pool, _extract, path)
+                            if cache:
+                                cache.put_pages(digest, pages)
+                        async with llm_slots:
+                            llm_start = time.perf_counter()
+                            analysis = await loop.run_in_executor(llm_pool, analyze, pages)
+                            llm_latency = time.perf_counter() - llm_start
+                        if cache:
+                            cache.put_analysis(digest, version, analysis)
+                    write({"path": path, "sha256": digest, "result": analysis})
+                    stats.record(True, time.perf_counter() - start, len(pages), llm_latency, cached=llm_latency is None)
+                except Exception as e:
+                    write({"path": path, "error": str(e)})
+                    stats.record(False, time.perf_counter() - start)
+                stats.maybe_report()
+
+        try:
+            await asyncio.gather(*(handle(path) for path in paths))
+        finally:
+            if cache:
+                cache.close()
+
+
+def run_batch(
+    source: str,
+    output_path: str,
+    analyze: Callable[[List[str]], Dict[str, Any]],
+    version: str,
+    extract_workers: Optional[int] = None,
+    concurrency: int = 4
+) -> BatchStats:
+    """
+    Analyze every PDF in a directory or manifest, appending results to a JSONL file.
+
+    Each output line is {"path", "sha256", "result"} or {"path", "error"}.
+    Paths that already have a result in the output file are skipped; failed
+    ones are retried.
+
+    Args:
+        source: Directory or manifest file (see collect_pdfs)
+        output_path: JSONL file to append to
+        analyze: Analyzes a report's pages; called from worker threads
+        version: Analysis version for the result cache
+        extract_workers: Extraction processes; defaults to the CPU count
+        concurrency: Reports analyzed by the LLM at once
+
+    Returns:
+        The run's statistics
+    """
+    paths = collect_pdfs(source)
+    done = completed_paths(output_path)
+    pending = [path for path in paths if path not in done]
+    stats = BatchStats(len(pending), len(paths) - len(pending))
+    if not pending:
+        return stats
+
+    extract_workers = max(1, extract_workers or os.cpu_count() or 1)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "a") as out:
+        asyncio.run(_run_batch(pending, analyze, version, out, stats, extract_workers, max(1, concurrency)))
+    return stats
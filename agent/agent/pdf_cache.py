@@ -0,0 +1,229 @@
+"""
+On-disk cache for PDF analysis, keyed by the document's content hash.
+
+Users often upload the same report again. Each upload used to be extracted
+and sent to the LLM in full. This cache stores, per SHA-256 of the PDF bytes:
+
+- the extracted page texts
+- the final analysis, per analysis version (model, chunking and prompt
+  fingerprint), so changing any of them makes old results miss instead of
+  being served stale
+
+Entries live in one SQLite file, compressed, with a total size limit; the
+least recently used entries are evicted first. Several processes can share
+the file.
+
+Page texts and analyses are medical data, so entries are also deleted once
+they are older than the retention period (counted from when they were
+stored, however often they are used): they are no longer served, and are
+removed whenever the cache is opened or written to.
+
+Settings:
+    PDF_CACHE_PATH: database file (default ./data/pdf_cache.sqlite)
+    PDF_CACHE_MAX_MB: size limit (default 512)
+    PDF_CACHE_TTL_DAYS: retention period (default 30; 0 keeps entries until evicted for space)
+    PDF_CACHE=0: disable caching
+"""
+
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = "./data/pdf_cache.sqlite"
+DEFAULT_MAX_MB = 512
+DEFAULT_TTL_DAYS = 30
+
+PAGES = "pages"
+ANALYSIS = "analysis"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def analysis_version(*parts: Any) -> str:
+    """Combine everything an analysis depends on into one version string."""
+    return ":".join(str(part) for part in parts)
+
+
+class PdfCache:
+    """LRU cache of extracted pages and analyses in a SQLite file."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_MB << 20,
+        ttl: float = DEFAULT_TTL_DAYS * 86400,
+        timeout: float = 30.0
+    ):
+        """
+        Open (or create) the cache, deleting expired entries.
+
+        Args:
+            path: Database file
+            max_bytes: Total size of stored values to keep
+            ttl: Seconds an entry is kept after it is stored; 0 for no limit
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    kind TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    created REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, digest, version)
+                )"""
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+            if "created" not in columns:
+                # Caches from before the retention limit: count entries from their last use
+                self._conn.execute("ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE entries SET created = last_used")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            self._expire()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def _get(self, kind: str, digest: str, version: str) -> Optional[Any]:
+        try:
+            return self._read(kind, digest, version)
+        except sqlite3.Error as e:
+            # A busy or damaged cache only costs the speedup
+            print(f"PDF cache read failed: {e}", file=sys.stderr)
+            return None
+
+    def _read(self, kind: str, digest: str, version: str) -> Optional[Any]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE kind = ? AND digest = ? AND version = ? AND created >= ?",
+                (kind, digest, version, self._oldest_kept())
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE kind = ? AND digest = ? AND version = ?",
+                (time.time(), kind, digest, version)
+            )
+        return json.loads(zlib.decompress(row[0]))
+
+    def _put(self, kind: str, digest: str, version: str, value: Any):
+        blob = zlib.compress(json.dumps(value).encode(), 6)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            self._write(kind, digest, version, blob)
+        except sqlite3.Error as e:
+            print(f"PDF cache write failed: {e}", file=sys.stderr)
+
+    def _write(self, kind: str, digest: str, version: str, blob: bytes):
+        with self._lock, self._conn:
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (kind, digest, version, value, size, last_used, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, digest, version, blob, len(blob), now, now)
+            )
+            self._expire()
+            self._evict()
+
+    def _oldest_kept(self) -> float:
+        """Storage time of the oldest entry still within the retention period."""
+        return time.time() - self.ttl if self.ttl > 0 else 0
+
+    def _expire(self):
+        """Delete entries older than the retention period."""
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (self._oldest_kept(),))
+
+    def _evict(self):
+        """Delete least recently used entries until the total fits max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM entries ORDER BY last_used"):
+            victims.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE rowid = ?", victims)
+
+    def get_pages(self, digest: str) -> Optional[List[str]]:
+        """Cached page texts of a document, or None."""
+        return self._get(PAGES, digest, "")
+
+    def put_pages(self, digest: str, pages: List[str]):
+        """Store the page texts of a document."""
+        self._put(PAGES, digest, "", pages)
+
+    def get_analysis(self, digest: str, version: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis of a document for an analysis version, or None."""
+        return self._get(ANALYSIS, digest, version)
+
+    def put_analysis(self, digest: str, version: str, analysis: Dict[str, Any]):
+        """Store the analysis of a document."""
+        self._put(ANALYSIS, digest, version, analysis)
+
+
+def open_cache() -> Optional[PdfCache]:
+    """
+    The cache configured by the environment, or None when disabled or unavailable.
+
+    A cache that can't be opened only costs the speedup, so the error is
+    reported on stderr (stdout carries results) and analysis goes ahead.
+    """
+    if os.getenv("PDF_CACHE", "1") == "0":
+        return None
+    try:
+        return PdfCache(
+            os.getenv("PDF_CACHE_PATH", DEFAULT_CACHE_PATH),
+            int(os.getenv("PDF_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) << 20,
+            float(os.getenv("PDF_CACHE_TTL_DAYS", str(DEFAULT_TTL_DAYS))) * 86400
+        )
+    except Exception as e:
+        print(f"PDF cache unavailable: {e}", file=sys.stderr)
+        return None
+
+
+def cached_pages(cache: Optional[PdfCache], digest: str, extract) -> List[str]:
+    """
+    Page texts from the cache, or from extract() (then cached).
+
+    Args:
+        cache: The cache, or None
+        digest: Document hash
+        extract: Called with no arguments to extract the pages on a miss
+    """
+    pages = cache.get_pages(digest) if cache else None
+    if pages is None:
+        pages = extract()
+        if cache:
+            cache.put_pages(digest, pages)
+    return pages
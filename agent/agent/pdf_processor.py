@@ -1,98 +1,75 @@
-from typing import Dict, Any
-import fitz  # PyMuPDF
+from typing import Dict, Any, List, Optional, Union
 import google.generativeai as genai
 from pathlib import Path
 import os
 from emotion_report_generator import generate_emotion_report
+from pdf_text import extract_pages_from_pdf
+from pdf_cache import analysis_version, cached_pages, file_digest, open_cache
+from pdf_batch import RateLimiter, call_with_retries, run_batch
+from report_extraction import (
+    split_report, build_chunk_prompt, normalize_partial, reduce_questionnaire,
+    map_chunks, extraction_fingerprint
+)
+from structured_output import gemini_response_schema, generate_structured, questionnaire_validator
 import json
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a PDF file."""
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
-    except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
-    finally:
-        if 'doc' in locals():
-            doc.close()
+GEMINI_MODEL = 'gemini-1.5-pro'
+
+# New generations tried after an invalid chunk answer
+STRUCTURED_RETRIES = 1
 
-def process_medical_report(text: str) -> Dict[str, Any]:
-    """Process medical report text and convert it to questionnaire format using Gemini."""
+def chunk_chars() -> int:
+    """Characters per report chunk sent to Gemini."""
+    return int(os.getenv("REPORT_CHUNK_CHARS", "20000"))
+
+def analysis_cache_version() -> str:
+    """Version of the analyses this script produces, for the result cache."""
+    return analysis_version(GEMINI_MODEL, chunk_chars(), extraction_fingerprint())
+
+def process_medical_report(report: Union[str, List[str]], limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+    """
+    Process medical report text and convert it to questionnaire format using Gemini.
+    
+    The report is split into chunks that are extracted concurrently and
+    merged (see report_extraction), so long reports don't become one huge prompt.
+    
+    Gemini answers in JSON mode with the questionnaire as response schema;
+    each answer is streamed and validated field by field (see
+    structured_output). Rate-limit errors are retried with back-off.
+    
+    Args:
+        report: Report text, or its pages in order
+        limiter: Shared requests-per-minute limit for Gemini calls
+    """
     
     # Configure Gemini
     genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    
-    # Create a prompt for Gemini
-    extraction_prompt = f"""You are a mental health professional analyzing a medical report. 
-    Extract key information about the patient's mental health state and convert it into structured responses.
+    model = genai.GenerativeModel(GEMINI_MODEL)
     
-    Medical Report:
-    {text}
+    generation_config = {
+        "response_mime_type": "application/json",
+        "response_schema": gemini_response_schema()
+    }
     
-    Based on the report content, provide responses for the following questions in a JSON format.
-    IMPORTANT: Return ONLY the raw JSON object with no markdown formatting or additional text.
+    chunks = split_report(report, max_chars=chunk_chars())
     
-    {{
-        "mood": <number between 1-10>,
-        "anxiety": <"none"/"mild"/"moderate"/"severe">,
-        "sleep_quality": <number between 1-10>,
-        "energy_levels": <number between 1-10>,
-        "physical_symptoms": <"none"/"mild"/"moderate"/"severe">,
-        "concentration": <number between 1-10>,
-        "self_care": <"none"/"minimal"/"moderate"/"extensive">,
-        "social_interactions": <number between 1-10>,
-        "intrusive_thoughts": <"none"/"mild"/"moderate"/"severe">,
-        "optimism": <number between 1-10>,
-        "stress_factors": <text description>,
-        "coping_strategies": <text description>,
-        "social_support": <number between 1-10>,
-        "self_harm": <"none"/"passive"/"active"/"severe">,
-        "discuss_professional": <text description>
-    }}
-
-    Ensure:
-    1. All numeric values are between 1-10
-    2. Categorical values exactly match the provided options
-    3. The response is a valid JSON object
-    4. No additional text or formatting is included"""
-
-    try:
-        # Get structured responses from Gemini
-        response = model.generate_content(extraction_prompt)
-        response_text = response.text.strip()
-        
-        # Remove any potential markdown code block formatting
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
+    def extract_chunk(chunk: str, index: int, total: int) -> Dict[str, Any]:
+        prompt = build_chunk_prompt(chunk, index, total)
         
-        response_text = response_text.strip()
+        def stream():
+            for part in model.generate_content(prompt, generation_config=generation_config, stream=True):
+                yield part.text
         
-        # Parse the JSON response
-        try:
-            questionnaire_data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            raise Exception(f"Invalid JSON response from Gemini: {str(e)}\nResponse: {response_text}")
-        
-        # Validate the response format
-        required_fields = [
-            "mood", "anxiety", "sleep_quality", "energy_levels", "physical_symptoms",
-            "concentration", "self_care", "social_interactions", "intrusive_thoughts",
-            "optimism", "stress_factors", "coping_strategies", "social_support",
-            "self_harm", "discuss_professional"
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in questionnaire_data]
-        if missing_fields:
-            raise Exception(f"Missing required fields in Gemini response: {', '.join(missing_fields)}")
+        partial = call_with_retries(
+            lambda: generate_structured(stream, questionnaire_validator(), retries=STRUCTURED_RETRIES),
+            limiter
+        )
+        return normalize_partial(partial)
+
+    try:
+        # Get partial responses from Gemini for each chunk and merge them
+        partials = map_chunks(chunks, extract_chunk, max_workers=int(os.getenv("REPORT_MAP_WORKERS", "4")))
+        questionnaire_data = reduce_questionnaire(partials)
         
         # Generate emotion report using the existing function
         responses = [
@@ -124,13 +101,26 @@ def process_medical_report(text: str) -> Dict[str, Any]:
         raise Exception(f"Error processing medical report: {str(e)}")
 
 async def analyze_pdf(pdf_path: str) -> Dict[str, Any]:
-    """Main function to analyze a PDF medical report."""
+    """
+    Main function to analyze a PDF medical report.
+    
+    Results are cached by the PDF's content hash (see pdf_cache), so a
+    re-uploaded report is answered without extraction or LLM calls.
+    """
+    cache = open_cache()
     try:
-        # Extract text from PDF
-        text = extract_text_from_pdf(pdf_path)
+        digest = file_digest(pdf_path)
+        version = analysis_cache_version()
+        result = cache.get_analysis(digest, version) if cache else None
         
-        # Process the medical report
-        result = process_medical_report(text)
+        if result is None:
+            # Extract text from PDF
+            pages = cached_pages(cache, digest, lambda: extract_pages_from_pdf(pdf_path))
+            
+            # Process the medical report
+            result = process_medical_report(pages)
+            if cache:
+                cache.put_analysis(digest, version, result)
         
         # Print the JSON result so it can be captured by Node.js
         print(json.dumps(result))
@@ -141,15 +131,44 @@ async def analyze_pdf(pdf_path: str) -> Dict[str, Any]:
         error_json = {"error": str(e)}
         print(json.dumps(error_json))
         raise Exception(f"Error analyzing PDF: {str(e)}")
+    finally:
+        if cache:
+            cache.close()
 
-if __name__ == "__main__":
-    # If run directly, process the PDF file provided as argument
+def main():
+    import argparse
     import sys
-    if len(sys.argv) > 1:
-        pdf_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Analyze PDF medical reports with Gemini")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to analyze; the result is printed as JSON")
+    parser.add_argument("--batch", metavar="SOURCE", help="Analyze every PDF in a directory or manifest file")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file batch results are appended to")
+    parser.add_argument("--extract-workers", type=int, default=None, help="Text extraction processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Reports sent to Gemini at once")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("GEMINI_RPM", "60")),
+                        help="Gemini requests per minute across the batch, 0 for no limit (default: GEMINI_RPM or 60)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        limiter = RateLimiter(args.rpm) if args.rpm > 0 else None
+        stats = run_batch(
+            args.batch,
+            args.output,
+            lambda pages: process_medical_report(pages, limiter),
+            analysis_cache_version(),
+            extract_workers=args.extract_workers,
+            concurrency=args.concurrency
+        )
+        print(stats.summary(), file=sys.stderr)
+        sys.exit(1 if stats.failed else 0)
+    
+    # If run directly, process the PDF file provided as argument
+    if args.pdf_path:
         try:
             import asyncio
-            result = asyncio.run(analyze_pdf(pdf_path))
+            result = asyncio.run(analyze_pdf(args.pdf_path))
             sys.exit(0)
         except Exception as e:
-            sys.exit(1) 
\ No newline at end of file
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
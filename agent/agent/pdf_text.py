@@ -0,0 +1,121 @@
+"""
+PDF text extraction for the report analysis scripts.
+
+Pages are yielded one at a time so callers can process long reports without
+holding the whole document, and the full text is built with a single join.
+Large documents can be split into page ranges extracted in parallel by
+worker processes; pages are still yielded in document order.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+import os
+
+import fitz  # PyMuPDF
+
+# Documents shorter than this are extracted in-process; starting workers costs more than it saves
+PARALLEL_MIN_PAGES = 64
+
+# Pages extracted per worker task
+CHUNK_PAGES = 16
+
+
+def page_count(pdf_path: str) -> int:
+    """Number of pages in a PDF."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the text of each page in a PDF.
+
+    Args:
+        pdf_path: Path to the PDF file
+        start: First page (0-based)
+        stop: Page to stop before; defaults to the end of the document
+
+    Yields:
+        Page text, in page order
+    """
+    with fitz.open(pdf_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_number in range(start, stop):
+            yield doc.load_page(page_number).get_text()
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Worker task: the text of a range of pages."""
+    return list(iter_pdf_pages(pdf_path, start, stop))
+
+
+def iter_pdf_pages_parallel(
+    pdf_path: str,
+    workers: Optional[int] = None,
+    chunk_pages: int = CHUNK_PAGES
+) -> Iterator[str]:
+    """
+    Yield the text of each page, extracting page ranges in worker processes.
+
+    Only a few ranges per worker are in flight at once, so memory stays
+    bounded if the caller consumes pages slowly.
+
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Number of worker processes; defaults to the CPU count
+        chunk_pages: Pages per worker task
+
+    Yields:
+        Page text, in page order
+    """
+    total = page_count(pdf_path)
+    workers = max(1, min(workers or os.cpu_count() or 1, -(-total // chunk_pages)))
+    if workers == 1:
+        yield from iter_pdf_pages(pdf_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start in range(0, total, chunk_pages):
+            pending.append(executor.submit(_extract_page_range, pdf_path, start, start + chunk_pages))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def extract_pages_from_pdf(pdf_path: str, workers: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of each page of a PDF file.
+
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Worker processes for large documents; defaults to the CPU
+            count (or PDF_EXTRACT_WORKERS). Use 1 to always extract in-process.
+
+    Returns:
+        Page texts in page order
+    """
+    try:
+        if workers is None:
+            workers = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+        if workers > 1 and page_count(pdf_path) >= PARALLEL_MIN_PAGES:
+            return list(iter_pdf_pages_parallel(pdf_path, workers))
+        return list(iter_pdf_pages(pdf_path))
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+
+def extract_text_from_pdf(pdf_path: str, workers: Optional[int] = None) -> str:
+    """
+    Extract text from a PDF file.
+
+    Args:
+        pdf_path: Path to the PDF file
+        workers: Worker processes for large documents (see extract_pages_from_pdf)
+
+    Returns:
+        The text of all pages
+    """
+    return "".join(extract_pages_from_pdf(pdf_path, workers))
@@ -0,0 +1,598 @@
+"""
+Declarative, vectorized scoring of questionnaire responses.
+
+The emotion report generators used to parse each questionnaire with ad-hoc
+safe_int calls and walk long if-chains per response. Here the scoring rules
+are data: each rule is a label with a list of conditions on questionnaire
+fields (all must hold). Responses are encoded once into numpy columns
+(numbers as integers, categories as option codes), every rule becomes a
+boolean mask over all questionnaires at once, and the per-questionnaire
+label lists are looked up by mask pattern. Free-text answers that need the
+emotion model are analyzed in one batch.
+
+Two questionnaires are scored:
+- the 15-field questionnaire (report_extraction.QUESTIONNAIRE_FIELDS), as
+  EmotionReportGenerator.analyze_responses and generate_emotion_report
+- the 5-answer daily check-in (mood, anxiety, sleep, self-care yes/no,
+  stressors) of the legacy report generator
+
+Output is identical to the original per-response code, including its
+parsing quirks and error reports.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import re
+
+import numpy as np
+
+from report_extraction import CATEGORICAL_FIELDS, NUMERIC_FIELDS, QUESTIONNAIRE_FIELDS
+
+# A condition is (field, operator, value); a rule's conditions must all hold
+Condition = Tuple[str, str, Any]
+
+DEFAULT_SCORE = 5
+
+# analyze_responses: (label, conditions, crisis weight)
+RISK_RULES: List[Tuple[str, List[Condition], int]] = [
+    ("Poor sleep quality", [("sleep_quality", "<=", 3)], 1),
+    ("Low energy levels", [("energy_levels", "<=", 3)], 0),
+    ("Significant physical symptoms", [("physical_symptoms", "in", ["moderate", "severe"])], 1),
+    ("Poor concentration", [("concentration", "<=", 3)], 0),
+    ("Neglecting self-care", [("self_care", "==", "none")], 1),
+    ("Social withdrawal", [("social_interactions", "<=", 3)], 0),
+    ("Persistent intrusive thoughts", [("intrusive_thoughts", "in", ["moderate", "severe"])], 1),
+    ("Low optimism", [("optimism", "<=", 3)], 0),
+    ("Limited social support", [("social_support", "<=", 3)], 0),
+    ("Self-harm risk", [("self_harm", "in", ["active", "severe"])], 2),
+]
+
+DISORDER_RULES: List[Tuple[str, List[Condition]]] = [
+    ("Moderate anxiety-depression indicators", [("anxiety", "in", ["moderate", "severe"]), ("mood", "<=", 4)]),
+    ("Sleep disturbance indicators", [("sleep_quality", "<=", 3), ("energy_levels", "<=", 3)]),
+    ("Anxiety disorder indicators", [("intrusive_thoughts", "in", ["moderate", "severe"]), ("anxiety", "in", ["moderate", "severe"])]),
+    ("Critical risk indicators", [("self_harm", "in", ["active", "severe"])]),
+]
+
+# Emotions for the first band whose minimum mood is reached (None: any mood)
+MOOD_EMOTIONS: List[Tuple[Optional[int], Dict[str, int]]] = [
+    (8, {"joyful": 2, "energetic": 1, "optimistic": 1}),
+    (6, {"content": 2, "stable": 1}),
+    (4, {"neutral": 1, "uncertain": 1}),
+    (2, {"sad": 1, "discouraged": 1}),
+    (None, {"depressed": 2, "hopeless": 1}),
+]
+
+ANXIETY_EMOTIONS = {
+    "none": {"calm": 2, "relaxed": 1},
+    "mild": {"anxious": 1, "uneasy": 1},
+    "moderate": {"anxious": 2, "stressed": 1, "worried": 1},
+    "severe": {"anxious": 2, "panicked": 1, "overwhelmed": 2},
+}
+
+# generate_emotion_report: (risk level, conditions, weight)
+RISK_LEVEL_RULES: List[Tuple[str, List[Condition], int]] = [
+    ("high", [("mood", "<=", 3)], 1),
+    ("moderate", [("mood", ">", 3), ("mood", "<=", 5)], 1),
+    ("low", [("mood", ">", 5)], 1),
+    ("high", [("anxiety", "==", "severe")], 1),
+    ("moderate", [("anxiety", "==", "moderate")], 1),
+    ("low", [("anxiety", "not in", ["severe", "moderate"])], 1),
+    ("high", [("self_harm", "in", ["active", "severe"])], 2),
+    ("moderate", [("self_harm", "==", "passive")], 1),
+]
+
+PATTERN_RULES: List[Tuple[str, List[Condition]]] = [
+    ("Poor sleep quality affecting daily functioning", [("sleep_quality", "<=", 4)]),
+    ("Low energy levels impacting activities", [("energy_levels", "<=", 4)]),
+    ("Difficulty maintaining focus and concentration", [("concentration", "<=", 4)]),
+    ("Limited social engagement", [("social_interactions", "<=", 4)]),
+    ("Reduced self-care activities", [("self_care", "in", ["minimal", "none"])]),
+]
+
+# Mood is "fluctuating" if any of these rules holds
+MOOD_FLUCTUATING_RULES: List[List[Condition]] = [
+    [("intrusive_thoughts", "in", ["moderate", "severe"])],
+    [("mood", "<=", 4)],
+]
+
+ANXIETY_TREND = {"severe": "increasing", "none": "decreasing"}
+STRESS_TREND = {"severe": "worsening", "none": "improving"}
+SEVERITY_PERCENTAGE = [0, 33, 66, 100]
+
+# Daily check-in: answers are compared as given (not lowercased), as the legacy generator did
+CHECKIN_OPTIONS = {
+    "anxiety": ["none", "mild", "moderate", "severe"],
+    "self_care": ["yes", "no"],
+}
+
+CHECKIN_DISORDER_RULES: List[Tuple[str, List[Condition]]] = [
+    ("Possible Major Depressive Disorder", [("mood", "<=", 3)]),
+    ("Mild Mood Disturbance", [("mood", ">", 3), ("mood", "<=", 5)]),
+    ("Severe Anxiety Disorder", [("anxiety", "==", "severe")]),
+    ("Moderate Anxiety Disorder", [("anxiety", "==", "moderate")]),
+    ("Mild Anxiety Symptoms", [("anxiety", "==", "mild")]),
+    ("Severe Sleep Disturbance", [("sleep", "<=", 3)]),
+    ("Moderate Sleep Issues", [("sleep", ">", 3), ("sleep", "<=", 5)]),
+    ("Self-Care Deficit", [("self_care", "==", "no")]),
+    ("High Stress Levels", [("stressed", "==", True)]),
+]
+
+STRESS_KEYWORDS = ["overwhelmed", "cant cope", "too much", "stressed", "pressure"]
+_STRESS_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in STRESS_KEYWORDS))
+
+_OPERATORS: Dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "<=": lambda column, value: column <= value,
+    "<": lambda column, value: column < value,
+    ">=": lambda column, value: column >= value,
+    ">": lambda column, value: column > value,
+    "==": lambda column, value: column == value,
+    "in": lambda column, value: np.isin(column, value),
+    "not in": lambda column, value: ~np.isin(column, value),
+}
+
+
+def compile_conditions(conditions: List[Condition], options: Dict[str, List[str]]) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    """
+    Compile a rule's conditions into a function from encoded columns to a mask.
+
+    Category values are translated to option codes once, here.
+
+    Args:
+        conditions: (field, operator, value) conditions, all of which must hold
+        options: Options of each categorical field, in code order
+
+    Returns:
+        Function mapping the encoded columns to a boolean array
+    """
+    compiled = []
+    for field, operator, value in conditions:
+        if operator not in _OPERATORS:
+            raise ValueError(f"Unknown operator {operator!r} in rule on {field}")
+        if field in options:
+            codes = [options[field].index(v) for v in (value if isinstance(value, list) else [value])]
+            value = codes if isinstance(value, list) else codes[0]
+        compiled.append((field, _OPERATORS[operator], value))
+
+    def evaluate(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        mask = np.ones(len(next(iter(columns.values()))), dtype=bool)
+        for field, operator, value in compiled:
+            mask &= np.asarray(operator(columns[field], value), dtype=bool)
+        return mask
+    return evaluate
+
+
+def rule_masks(rules: Sequence[Tuple], options: Dict[str, List[str]]) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    """Compile rules (label, conditions, ...) into a function returning an (n, rules) mask."""
+    evaluators = [compile_conditions(rule[1], options) for rule in rules]
+
+    def evaluate(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.column_stack([evaluator(columns) for evaluator in evaluators])
+    return evaluate
+
+
+def labels_per_row(masks: np.ndarray, labels: List[str]) -> List[List[str]]:
+    """
+    The labels of the rules that hold for each row, in rule order.
+
+    Rows are grouped by their mask pattern, so each distinct combination of
+    labels is built once.
+    """
+    keys = masks.astype(np.int64) @ (np.int64(1) << np.arange(masks.shape[1], dtype=np.int64))
+    patterns: Dict[int, List[str]] = {}
+    rows = []
+    for key in keys.tolist():
+        found = patterns.get(key)
+        if found is None:
+            found = patterns[key] = [label for bit, label in enumerate(labels) if key >> bit & 1]
+        rows.append(list(found))
+    return rows
+
+
+def _int_column(values: List[int]) -> np.ndarray:
+    """Integer column; arbitrarily large answers fall back to Python ints."""
+    try:
+        return np.array(values, dtype=np.int64)
+    except OverflowError:
+        return np.array(values, dtype=object)
+
+
+def _safe_int(value, default: int = DEFAULT_SCORE) -> int:
+    # analyze_responses: non-string answers fail on .lower(), failing the whole report
+    try:
+        if value is None or value.lower() == 'none':
+            return default
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def _safe_int_str(value, default: int = DEFAULT_SCORE) -> int:
+    # generate_emotion_report: any answer is converted with str() first
+    try:
+        if value is None or str(value).lower() == 'none':
+            return default
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def _parse_category(value) -> str:
+    # analyze_responses: non-string answers fail on .lower()
+    return value.lower() if value else 'none'
+
+
+def _parse_category_str(value) -> str:
+    return str(value).lower() if value else 'none'
+
+
+def parse_columns(responses_list: List[List[Any]], stringify: bool) -> Tuple[Dict[str, List[Any]], List[Optional[Exception]]]:
+    """
+    Parse questionnaires field by field.
+
+    Numbers are parsed with the safe_int rules (5 for missing or unparseable
+    answers) and categories lowercased. Answers are drawn from a small
+    vocabulary, so each distinct string is parsed once per field. Fields are
+    visited in questionnaire order, so a questionnaire's error is the one its
+    first bad answer raises, as when parsing it alone.
+
+    Args:
+        responses_list: Answers of each questionnaire, in field order
+        stringify: Convert answers with str() first (generate_emotion_report)
+            instead of requiring strings (analyze_responses)
+
+    Returns:
+        Parsed values per numeric and categorical field (None for failed
+        questionnaires), and the error of each questionnaire or None
+    """
+    count = len(responses_list)
+    errors: List[Optional[Exception]] = [None] * count
+    values: Dict[str, List[Any]] = {}
+    for index, field in enumerate(QUESTIONNAIRE_FIELDS):
+        if field in NUMERIC_FIELDS:
+            parse = _safe_int_str if stringify else _safe_int
+        elif field in CATEGORICAL_FIELDS:
+            parse = _parse_category_str if stringify else _parse_category
+        else:
+            parse = None
+        column: List[Any] = [None] * count
+        parsed_strings: Dict[str, Any] = {}
+        for row, responses in enumerate(responses_list):
+            if errors[row] is not None:
+                continue
+            try:
+                value = responses[index]
+                if parse is None:
+                    continue
+                if type(value) is str:
+                    parsed = parsed_strings.get(value)
+                    if parsed is None:
+                        parsed = parsed_strings[value] = parse(value)
+                    column[row] = parsed
+                else:
+                    column[row] = parse(value)
+            except Exception as e:
+                errors[row] = e
+        if parse is not None:
+            values[field] = column
+    return values, errors
+
+
+def encode(values: Dict[str, List[Any]], rows: List[int]) -> Dict[str, np.ndarray]:
+    """
+    Columns of the given questionnaires.
+
+    Numeric fields become integer arrays and categorical fields option codes
+    (-1 for an answer that isn't an option).
+    """
+    columns: Dict[str, np.ndarray] = {}
+    for field, column in values.items():
+        if field in NUMERIC_FIELDS:
+            columns[field] = _int_column([column[row] for row in rows])
+        else:
+            codes = {option: code for code, option in enumerate(CATEGORICAL_FIELDS[field])}
+            columns[field] = np.array([codes.get(column[row], -1) for row in rows], dtype=np.int8)
+    return columns
+
+
+class QuestionnaireScorer:
+    """Scores batches of 15-field questionnaires with the compiled rule tables."""
+
+    def __init__(self):
+        self._risk = rule_masks(RISK_RULES, CATEGORICAL_FIELDS)
+        self._risk_weights = np.array([rule[2] for rule in RISK_RULES], dtype=np.int64)
+        self._disorders = rule_masks(DISORDER_RULES, CATEGORICAL_FIELDS)
+        self._risk_levels = rule_masks(RISK_LEVEL_RULES, CATEGORICAL_FIELDS)
+        self._patterns = rule_masks(PATTERN_RULES, CATEGORICAL_FIELDS)
+        self._fluctuating = rule_masks([(None, rule) for rule in MOOD_FLUCTUATING_RULES], CATEGORICAL_FIELDS)
+
+        # Trend status and detail for every severity code
+        self._anxiety_trends = []
+        for anxiety_level in CATEGORICAL_FIELDS["anxiety"]:
+            anxiety_status = ANXIETY_TREND.get(anxiety_level, 'stable')
+            self._anxiety_trends.append((anxiety_status, f"Anxiety levels are {anxiety_level}, showing a {anxiety_status} trend"))
+        self._stress_trends = []
+        for physical_symptoms in CATEGORICAL_FIELDS["physical_symptoms"]:
+            stress_status = STRESS_TREND.get(physical_symptoms, 'stable')
+            self._stress_trends.append((stress_status, f"Physical stress symptoms are {physical_symptoms}, indicating {stress_status} stress management"))
+
+        # emotions_count for every (mood band, anxiety code); the two emotion sets don't overlap
+        self._emotion_templates = [
+            [{**emotions, **ANXIETY_EMOTIONS.get(anxiety, {})} for anxiety in CATEGORICAL_FIELDS["anxiety"] + [None]]
+            for _, emotions in MOOD_EMOTIONS
+        ]
+
+    def _mood_band(self, mood: np.ndarray) -> np.ndarray:
+        band = np.full(len(mood), len(MOOD_EMOTIONS) - 1)
+        for index in range(len(MOOD_EMOTIONS) - 2, -1, -1):
+            band[np.asarray(mood >= MOOD_EMOTIONS[index][0], dtype=bool)] = index
+        return band
+
+    def analyze_responses(self, responses_list: List[List[Any]]) -> List[Dict[str, Any]]:
+        """
+        Emotion analyses of many questionnaires (EmotionReportGenerator.analyze_responses).
+
+        Args:
+            responses_list: Answers of each questionnaire, in field order
+
+        Returns:
+            One report per questionnaire; unparseable questionnaires get the
+            neutral report with an "error" entry
+        """
+        values, errors = parse_columns(responses_list, stringify=False)
+        valid = [row for row, error in enumerate(errors) if error is None]
+        reports: List[Dict[str, Any]] = []
+        if valid:
+            columns = encode(values, valid)
+            risk = self._risk(columns)
+            crisis_counts = (risk.astype(np.int64) @ self._risk_weights).tolist()
+            risk_factors = labels_per_row(risk, [rule[0] for rule in RISK_RULES])
+            disorders = labels_per_row(self._disorders(columns), [rule[0] for rule in DISORDER_RULES])
+            bands = self._mood_band(columns["mood"]).tolist()
+            anxiety = columns["anxiety"].tolist()
+            valences = (columns["mood"] / 10.0).tolist()
+
+            for i in range(len(valid)):
+                reports.append({
+                    "summary": {
+                        "emotions_count": dict(self._emotion_templates[bands[i]][anxiety[i]]),
+                        "average_confidence": 0.7,  # Fixed value for now
+                        "average_valence": valences[i],
+                        "crisis_count": crisis_counts[i],
+                        "risk_factors": risk_factors[i]
+                    },
+                    "disorder_indicators": disorders[i]
+                })
+
+        results = iter(reports)
+        return [next(results) if error is None else _error_report(error) for error in errors]
+
+    def emotion_reports(self, responses_list: List[List[Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Dashboard emotion reports of many questionnaires (generate_emotion_report).
+
+        Args:
+            responses_list: Answers of each questionnaire, in field order
+
+        Returns:
+            One report per questionnaire, or the exception generate_emotion_report
+            would raise for it
+        """
+        values, errors = parse_columns(responses_list, stringify=True)
+        # Severity lookups fail on answers that aren't options, anxiety first
+        for row, error in enumerate(errors):
+            if error is None:
+                for field in ("anxiety", "physical_symptoms"):
+                    value = values[field][row]
+                    if value not in CATEGORICAL_FIELDS[field]:
+                        errors[row] = KeyError(value)
+                        break
+
+        valid = [row for row, error in enumerate(errors) if error is None]
+        reports: List[Dict[str, Any]] = []
+        if valid:
+            columns = encode(values, valid)
+            levels = self._risk_levels(columns).astype(np.int64)
+            weights = np.array([rule[2] for rule in RISK_LEVEL_RULES], dtype=np.int64)
+            level_names = [rule[0] for rule in RISK_LEVEL_RULES]
+            risk = {
+                level: (levels @ np.where(np.array(level_names) == level, weights, 0)).tolist()
+                for level in ("low", "moderate", "high")
+            }
+            patterns = labels_per_row(self._patterns(columns), [rule[0] for rule in PATTERN_RULES])
+            fluctuating = self._fluctuating(columns).any(axis=1).tolist()
+            mood = columns["mood"]
+            moods = mood.tolist()
+            sleep = columns["sleep_quality"].tolist()
+            anxiety = columns["anxiety"].tolist()
+            physical = columns["physical_symptoms"].tolist()
+            depression = (10 - mood).tolist()
+            irritability = (10 - columns["concentration"]).tolist()
+            fatigue = (10 - columns["energy_levels"]).tolist()
+            low, moderate, high = risk["low"], risk["moderate"], risk["high"]
+
+            for i in range(len(valid)):
+                anxiety_status, anxiety_detail = self._anxiety_trends[anxiety[i]]
+                stress_status, stress_detail = self._stress_trends[physical[i]]
+                mood_status = 'fluctuating' if fluctuating[i] else 'stable'
+                reports.append({
+                    "mainInsight": {
+                        "mood": moods[i],
+                        "anxiety": anxiety[i] + 1,
+                        "stress": physical[i] + 1,
+                        "sleep": sleep[i]
+                    },
+                    "riskAnalysis": {
+                        "low": low[i],
+                        "moderate": moderate[i],
+                        "high": high[i]
+                    },
+                    "anxietyTrend": {
+                        "status": anxiety_status,
+                        "percentage": SEVERITY_PERCENTAGE[anxiety[i]],
+                        "detail": anxiety_detail
+                    },
+                    "stressResponse": {
+                        "status": stress_status,
+                        "percentage": SEVERITY_PERCENTAGE[physical[i]],
+                        "detail": stress_detail
+                    },
+                    "moodStability": {
+                        "status": mood_status,
+                        "detail": f"Mood appears to be {mood_status} with a base level of {moods[i]}/10"
+                    },
+                    "patterns": patterns[i],
+                    "emotions_count": {
+                        "anxiety": 0,
+                        "depression": depression[i],  # Inverse of mood score
+                        "stress": physical[i],
+                        "irritability": irritability[i],  # Lower concentration often correlates with higher irritability
+                        "fatigue": fatigue[i]  # Inverse of energy level
+                    }
+                })
+
+        results = iter(reports)
+        return [next(results) if error is None else error for error in errors]
+
+
+def _error_report(error: Exception) -> Dict[str, Any]:
+    return {
+        "error": str(error),
+        "summary": {
+            "emotions_count": {"neutral": 1},
+            "average_confidence": 0.5,
+            "average_valence": 0.5,
+            "crisis_count": 0,
+            "risk_factors": []
+        },
+        "disorder_indicators": []
+    }
+
+
+_scorer: Optional[QuestionnaireScorer] = None
+
+
+def get_scorer() -> QuestionnaireScorer:
+    """The module's scorer, compiled on first use."""
+    global _scorer
+    if _scorer is None:
+        _scorer = QuestionnaireScorer()
+    return _scorer
+
+
+def checkin_sentences(responses: List[Any]) -> List[str]:
+    """The statements a daily check-in is analyzed as, in report order."""
+    return [
+        f"My mood today is {responses[0]} out of 10",
+        f"My anxiety level is {responses[1]}",
+        f"My sleep quality was {responses[2]} out of 10",
+        f"I {'have' if responses[3] == 'yes' else 'have not'} engaged in self-care today",
+        responses[4]
+    ]
+
+
+_checkin_disorders = rule_masks(CHECKIN_DISORDER_RULES, CHECKIN_OPTIONS)
+
+
+def score_checkins(responses_list: List[List[Any]], analyzer) -> List[Dict[str, Any]]:
+    """
+    Reports for many daily check-ins (the legacy analyze_responses).
+
+    The five statements of every check-in go through the emotion analyzer
+    in one batch.
+
+    Args:
+        responses_list: [mood, anxiety, sleep, "yes"/"no" self-care, stressors] per check-in
+        analyzer: EmotionAnalyzer (analyze_batch is used when available)
+
+    Returns:
+        One report per check-in
+    """
+    sentences: List[Optional[List[Any]]] = []
+    errors: List[Optional[Exception]] = []
+    for responses in responses_list:
+        try:
+            sentences.append(checkin_sentences(responses))
+            errors.append(None)
+        except Exception as e:
+            sentences.append(None)
+            errors.append(e)
+
+    # Texts the model can take in a batch; anything else is analyzed alone so its failure stays with its check-in
+    batch_texts = [text for row in sentences if row is not None and isinstance(row[4], str) for text in row]
+    analyze_batch = getattr(analyzer, "analyze_batch", None)
+    batch_results = iter(analyze_batch(batch_texts) if analyze_batch else [analyzer.analyze(text) for text in batch_texts])
+
+    analyses: Dict[int, List[Dict[str, Any]]] = {}
+    parsed: Dict[int, Tuple[Any, ...]] = {}
+    for index, row in enumerate(sentences):
+        if row is None:
+            continue
+        try:
+            if isinstance(row[4], str):
+                analyses[index] = [next(batch_results) for _ in range(5)]
+            else:
+                analyses[index] = [analyzer.analyze(text) for text in row]
+            responses = responses_list[index]
+            parsed[index] = (
+                int(responses[0]), responses[1], int(responses[2]), responses[3],
+                bool(_STRESS_PATTERN.search(responses[4].lower()))
+            )
+        except Exception as e:
+            errors[index] = e
+
+    valid = sorted(parsed)
+    reports: Dict[int, Dict[str, Any]] = {}
+    if valid:
+        rows = [parsed[index] for index in valid]
+        anxiety_codes = {option: code for code, option in enumerate(CHECKIN_OPTIONS["anxiety"])}
+        self_care_codes = {option: code for code, option in enumerate(CHECKIN_OPTIONS["self_care"])}
+        columns = {
+            "mood": _int_column([row[0] for row in rows]),
+            "anxiety": np.array([anxiety_codes.get(row[1], -1) if isinstance(row[1], str) else -1 for row in rows], dtype=np.int8),
+            "sleep": _int_column([row[2] for row in rows]),
+            "self_care": np.array([self_care_codes.get(row[3], -1) if isinstance(row[3], str) else -1 for row in rows], dtype=np.int8),
+            "stressed": np.array([row[4] for row in rows], dtype=bool),
+        }
+        disorders = labels_per_row(_checkin_disorders(columns), [rule[0] for rule in CHECKIN_DISORDER_RULES])
+
+        results = [analyses[index] for index in valid]
+        confidence = np.array([[a["confidence"] for a in row] for row in results], dtype=np.float64)
+        valence = np.array([[a["valence"] for a in row] for row in results], dtype=np.float64)
+        # Summed left to right, as Python's sum() does
+        avg_confidence = ((((confidence[:, 0] + confidence[:, 1]) + confidence[:, 2]) + confidence[:, 3]) + confidence[:, 4]) / 5
+        avg_valence = ((((valence[:, 0] + valence[:, 1]) + valence[:, 2]) + valence[:, 3]) + valence[:, 4]) / 5
+        avg_confidence, avg_valence = avg_confidence.tolist(), avg_valence.tolist()
+
+        for position, index in enumerate(valid):
+            emotions_count: Dict[str, int] = {}
+            for analysis in results[position]:
+                emotions_count[analysis["emotion"]] = emotions_count.get(analysis["emotion"], 0) + 1
+            reports[index] = {
+                "summary": {
+                    "emotions_count": emotions_count,
+                    "average_confidence": avg_confidence[position],
+                    "average_valence": avg_valence[position],
+                    "crisis_count": sum(1 for a in results[position] if a["is_crisis"])
+                },
+                "disorder_indicators": disorders[position],
+                "status": "success"
+            }
+
+    output = []
+    for index, error in enumerate(errors):
+        if error is None:
+            output.append(reports[index])
+        else:
+            print(f"Error in analyze_responses: {error}")
+            output.append({
+                "summary": {
+                    "emotions_count": {},
+                    "average_confidence": 0.5,
+                    "average_valence": 0.0,
+                    "crisis_count": 0
+                },
+                "disorder_indicators": [],
+                "status": "error",
+                "error": str(error)
+            })
+    return output
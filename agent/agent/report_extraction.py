@@ -0,0 +1,373 @@
+"""
+Map-reduce extraction of questionnaire data from long medical reports.
+
+A whole report in one prompt overflows small context windows (llama.cpp
+runs with 4096 tokens) and makes a single slow call for long documents.
+Instead the report is split into chunks of whole pages (or paragraphs, for
+very long pages). Each chunk is sent to the LLM for the questionnaire fields
+it has evidence for, with null for the rest. Chunks can be extracted
+concurrently. The partial answers are then merged by a deterministic reducer:
+
+- numeric fields: the median of the values reported (lower middle value for
+  an even count)
+- severity fields (anxiety, physical symptoms, intrusive thoughts, self-harm):
+  the most severe value reported, so a risk mentioned anywhere is kept
+- self-care: the most common value, ties going to the lower level
+- text fields: the distinct answers in report order
+
+Fields no chunk answered get neutral defaults.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+import hashlib
+import json
+import statistics
+import sys
+
+NUMERIC_FIELDS = [
+    "mood", "sleep_quality", "energy_levels", "concentration",
+    "social_interactions", "optimism", "social_support"
+]
+
+# Options in increasing order of severity (or, for self_care, of amount)
+CATEGORICAL_FIELDS = {
+    "anxiety": ["none", "mild", "moderate", "severe"],
+    "physical_symptoms": ["none", "mild", "moderate", "severe"],
+    "self_care": ["none", "minimal", "moderate", "extensive"],
+    "intrusive_thoughts": ["none", "mild", "moderate", "severe"],
+    "self_harm": ["none", "passive", "active", "severe"]
+}
+
+# Categorical fields merged by taking the most severe answer
+SEVERITY_FIELDS = {"anxiety", "physical_symptoms", "intrusive_thoughts", "self_harm"}
+
+TEXT_FIELDS = ["stress_factors", "coping_strategies", "discuss_professional"]
+
+# Field order of the questionnaire
+QUESTIONNAIRE_FIELDS = [
+    "mood", "anxiety", "sleep_quality", "energy_levels", "physical_symptoms",
+    "concentration", "self_care", "social_interactions", "intrusive_thoughts",
+    "optimism", "stress_factors", "coping_strategies", "social_support",
+    "self_harm", "discuss_professional"
+]
+
+# Bump when normalization or reduction changes what a report extracts to
+EXTRACTION_VERSION = 2
+
+DEFAULT_NUMERIC = 5
+DEFAULT_TEXT = "Not mentioned in the report"
+
+QUESTIONNAIRE_SCHEMA = """{
+    "mood": <number 1-10 or null>,
+    "anxiety": <"none"|"mild"|"moderate"|"severe" or null>,
+    "sleep_quality": <number 1-10 or null>,
+    "energy_levels": <number 1-10 or null>,
+    "physical_symptoms": <"none"|"mild"|"moderate"|"severe" or null>,
+    "concentration": <number 1-10 or null>,
+    "self_care": <"none"|"minimal"|"moderate"|"extensive" or null>,
+    "social_interactions": <number 1-10 or null>,
+    "intrusive_thoughts": <"none"|"mild"|"moderate"|"severe" or null>,
+    "optimism": <number 1-10 or null>,
+    "stress_factors": <string describing main stressors or null>,
+    "coping_strategies": <string describing coping methods or null>,
+    "social_support": <number 1-10 or null>,
+    "self_harm": <"none"|"passive"|"active"|"severe" or null>,
+    "discuss_professional": <string about professional discussion needs or null>
+}"""
+
+EMOTION_REPORT_SCHEMA = """{
+    "summary": {
+        "emotions_count": {<emotion>: <count>},
+        "average_confidence": <number 0-1>,
+        "average_valence": <number 0-1>,
+        "crisis_count": <number>,
+        "risk_factors": [<string>]
+    },
+    "disorder_indicators": [<string>]
+}"""
+
+
+def split_report(report: Union[str, Iterable[str]], max_chars: int = 8000) -> List[str]:
+    """
+    Split a report into chunks of at most max_chars.
+
+    Consecutive pages are packed into a chunk while they fit; pages longer
+    than max_chars are split at paragraph (then line) boundaries.
+
+    Args:
+        report: Report text, or its pages in order
+        max_chars: Maximum characters per chunk
+
+    Returns:
+        Non-empty chunks in report order
+    """
+    pages = [report] if isinstance(report, str) else list(report)
+
+    sections: List[str] = []
+    for page in pages:
+        if len(page) <= max_chars:
+            sections.append(page)
+        else:
+            sections.extend(_split_long_text(page, max_chars))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for section in sections:
+        if current and size + len(section) > max_chars:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(section)
+        size += len(section)
+    if current:
+        chunks.append("".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _split_long_text(text: str, max_chars: int, separators=("\n\n", "\n")) -> List[str]:
+    """Split text at paragraph, then line, then hard boundaries."""
+    for level, separator in enumerate(separators):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            pieces = [part + separator for part in parts[:-1]] + [parts[-1]]
+            result = []
+            for piece in pieces:
+                if len(piece) <= max_chars:
+                    result.append(piece)
+                else:
+                    # A piece that is the whole text (only a trailing separator) needs finer separators
+                    result.extend(_split_long_text(piece, max_chars, separators[level + 1:] if piece == text else separators))
+            return result
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def instruction_prefix(include_emotion_report: bool = False) -> str:
+    """
+    The part of every chunk prompt that doesn't depend on the chunk.
+
+    It comes first so that models which cache the evaluated prompt (llama.cpp
+    prefix reuse, provider prompt caching) only process it once.
+    """
+    if include_emotion_report:
+        schema = (
+            "{\n\"questionnaire_data\": " + QUESTIONNAIRE_SCHEMA
+            + ",\n\"emotion_report\": " + EMOTION_REPORT_SCHEMA + "\n}"
+        )
+    else:
+        schema = QUESTIONNAIRE_SCHEMA
+
+    return f"""You are a mental health professional analyzing one part of a medical report. Extract information about the patient's mental health state from this part only.
+
+Provide a JSON response with the following structure. Use null for any field the excerpt gives no evidence for; other parts of the report are analyzed separately.
+{schema}
+
+IMPORTANT: Return ONLY the raw JSON object with no markdown formatting or additional text. Numeric values must be between 1-10 and categorical values must exactly match the options given.
+
+"""
+
+
+def extraction_fingerprint() -> str:
+    """
+    Short hash identifying the prompts and reducer in use.
+
+    Cached analyses store it, so they're invalidated when either changes.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(EXTRACTION_VERSION).encode())
+    digest.update(instruction_prefix(False).encode())
+    digest.update(instruction_prefix(True).encode())
+    digest.update(build_chunk_prompt("", 0, 1).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_chunk_prompt(chunk: str, index: int, total: int, include_emotion_report: bool = False) -> str:
+    """
+    Prompt asking for the questionnaire fields supported by one chunk.
+
+    Args:
+        chunk: The chunk text
+        index: 0-based chunk number
+        total: Number of chunks in the report
+        include_emotion_report: Also ask for a partial emotion report
+
+    Returns:
+        The prompt
+    """
+    return instruction_prefix(include_emotion_report) + f"""Report Excerpt (part {index + 1} of {total}):
+{chunk}
+
+JSON response:"""
+
+
+def parse_json_response(response_text: str) -> Dict[str, Any]:
+    """
+    Parse the JSON object in an LLM response, ignoring code fences and surrounding text.
+
+    Raises:
+        ValueError: If the response has no valid JSON object
+    """
+    start = response_text.find("{")
+    end = response_text.rfind("}") + 1
+    if start == -1 or end <= start:
+        raise ValueError(f"No JSON object in response: {response_text[:200]}")
+    try:
+        return json.loads(response_text[start:end])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in response: {e}")
+
+
+def normalize_partial(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep only valid questionnaire answers from one chunk.
+
+    Numbers are clamped to 1-10, categories must match an option, and text
+    must be non-empty; anything else becomes None.
+    """
+    partial: Dict[str, Any] = {}
+    for field in NUMERIC_FIELDS:
+        value = data.get(field)
+        try:
+            partial[field] = min(10, max(1, int(round(float(value))))) if value is not None else None
+        except (TypeError, ValueError):
+            partial[field] = None
+    for field, options in CATEGORICAL_FIELDS.items():
+        value = str(data.get(field) or "").strip().lower()
+        partial[field] = value if value in options else None
+    for field in TEXT_FIELDS:
+        value = data.get(field)
+        partial[field] = value.strip() if isinstance(value, str) and value.strip() else None
+    return partial
+
+
+def reduce_questionnaire(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk questionnaire answers into one complete questionnaire.
+
+    Args:
+        partials: Normalized answers per chunk, in report order
+
+    Returns:
+        Answers for every questionnaire field
+    """
+    merged: Dict[str, Any] = {}
+    for field in NUMERIC_FIELDS:
+        values = [partial[field] for partial in partials if partial.get(field) is not None]
+        merged[field] = statistics.median_low(values) if values else DEFAULT_NUMERIC
+
+    for field, options in CATEGORICAL_FIELDS.items():
+        values = [partial[field] for partial in partials if partial.get(field) is not None]
+        if not values:
+            merged[field] = options[0]
+        elif field in SEVERITY_FIELDS:
+            merged[field] = max(values, key=options.index)
+        else:
+            counts = Counter(values)
+            merged[field] = max(counts, key=lambda value: (counts[value], -options.index(value)))
+
+    for field in TEXT_FIELDS:
+        seen = set()
+        answers = []
+        for partial in partials:
+            value = partial.get(field)
+            if value and value.lower() not in seen:
+                seen.add(value.lower())
+                answers.append(value)
+        merged[field] = " ".join(answers) if answers else DEFAULT_TEXT
+
+    return {field: merged[field] for field in QUESTIONNAIRE_FIELDS}
+
+
+def reduce_emotion_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk emotion reports.
+
+    Emotion and crisis counts are summed, averages are averaged over the
+    chunks that reported them, and risk factors and disorder indicators are
+    combined without duplicates.
+
+    Args:
+        reports: Partial emotion reports per chunk, in report order
+
+    Returns:
+        One emotion report
+    """
+    emotions_count: Dict[str, float] = {}
+    confidences, valences = [], []
+    crisis_count = 0
+    risk_factors: List[Any] = []
+    disorder_indicators: List[Any] = []
+
+    for report in reports:
+        summary = report.get("summary") or {}
+        for emotion, count in (summary.get("emotions_count") or {}).items():
+            if isinstance(count, (int, float)):
+                emotions_count[emotion] = emotions_count.get(emotion, 0) + count
+        if isinstance(summary.get("average_confidence"), (int, float)):
+            confidences.append(summary["average_confidence"])
+        if isinstance(summary.get("average_valence"), (int, float)):
+            valences.append(summary["average_valence"])
+        if isinstance(summary.get("crisis_count"), (int, float)):
+            crisis_count += summary["crisis_count"]
+        for factor in summary.get("risk_factors") or []:
+            if factor not in risk_factors:
+                risk_factors.append(factor)
+        for indicator in report.get("disorder_indicators") or []:
+            if indicator not in disorder_indicators:
+                disorder_indicators.append(indicator)
+
+    return {
+        "summary": {
+            "emotions_count": emotions_count or {"neutral": 1},
+            "average_confidence": sum(confidences) / len(confidences) if confidences else 0.0,
+            "average_valence": sum(valences) / len(valences) if valences else 0.0,
+            "crisis_count": crisis_count,
+            "risk_factors": risk_factors
+        },
+        "disorder_indicators": disorder_indicators
+    }
+
+
+def map_chunks(
+    chunks: List[str],
+    extract_chunk: Callable[[str, int, int], Dict[str, Any]],
+    max_workers: int = 4
+) -> List[Dict[str, Any]]:
+    """
+    Run an extraction over every chunk, concurrently when max_workers > 1.
+
+    Chunks whose extraction fails are reported on stderr and skipped, so one
+    bad response doesn't lose the whole report.
+
+    Args:
+        chunks: Report chunks
+        extract_chunk: Called with (chunk, index, total); returns the parsed response
+        max_workers: Maximum concurrent extractions
+
+    Returns:
+        Parsed responses of the chunks that succeeded, in report order
+
+    Raises:
+        Exception: If every chunk failed
+    """
+    total = len(chunks)
+
+    def run(index: int) -> Optional[Dict[str, Any]]:
+        try:
+            return extract_chunk(chunks[index], index, total)
+        except Exception as e:
+            # stdout carries the JSON result for the caller, so errors go to stderr
+            print(f"Skipping report chunk {index + 1}/{total}: {e}", file=sys.stderr)
+            return None
+
+    if max_workers > 1 and total > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, total)) as executor:
+            results = list(executor.map(run, range(total)))
+    else:
+        results = [run(index) for index in range(total)]
+
+    succeeded = [result for result in results if result is not None]
+    if chunks and not succeeded:
+        raise Exception(f"Extraction failed for all {total} report chunks")
+    return succeeded
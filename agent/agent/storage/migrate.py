@@ -0,0 +1,156 @@
+"""
+Migrate per-user JSON files into the SQLite user store.
+
+Imports:
+    {user_data_dir}/{user_id}_mood_data.json   (agent.mood_tracking.MoodTracker)
+    {data_dir}/{user_id}_mood.json             (agent.tracking.mood.MoodTracker)
+    {data_dir}/{user_id}_gamification.json     (GamificationSystem)
+
+Users whose data is already in the database are skipped unless --replace is
+given, so the migration can be re-run safely. The JSON files are left in place.
+
+Run from the agent directory:
+    python -m agent.storage.migrate --db ./data/mindguard.db
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Any, Dict, Optional
+
+from agent.storage.user_store import SQLiteUserStore, SESSION_SOURCE, TRACKER_SOURCE, DEFAULT_DB_PATH
+
+
+def load_json(file_path: str) -> Optional[Any]:
+    """Load a JSON file, printing and skipping unreadable ones."""
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return None
+
+
+def user_files(directory: str, suffix: str) -> Dict[str, str]:
+    """Map user IDs to their files with the given suffix."""
+    files = {}
+    for file_path in sorted(glob.glob(os.path.join(directory, f"*{suffix}"))):
+        files[os.path.basename(file_path)[:-len(suffix)]] = file_path
+    return files
+
+
+def migrate_session_mood(store: SQLiteUserStore, user_id: str, file_path: str, replace: bool = False) -> int:
+    """
+    Import a {user_id}_mood_data.json file.
+
+    Returns:
+        Number of entries imported (0 if skipped)
+    """
+    if store.count_mood_entries(user_id, SESSION_SOURCE) and not replace:
+        return 0
+    data = load_json(file_path)
+    if not isinstance(data, dict):
+        return 0
+
+    if replace:
+        store.delete_mood_entries(user_id, SESSION_SOURCE)
+        store.delete_insights(user_id)
+    entries = data.get("entries", [])
+    store.add_mood_entries(user_id, SESSION_SOURCE, entries)
+    if not store.get_insights(user_id, limit=1):
+        store.add_insights(user_id, data.get("insights", []))
+    if data.get("last_report_date"):
+        store.set_last_report_date(user_id, data["last_report_date"])
+    return len(entries)
+
+
+def migrate_tracker_mood(store: SQLiteUserStore, user_id: str, file_path: str, replace: bool = False) -> int:
+    """
+    Import a {user_id}_mood.json file.
+
+    Returns:
+        Number of entries imported (0 if skipped)
+    """
+    if store.count_mood_entries(user_id, TRACKER_SOURCE) and not replace:
+        return 0
+    entries = load_json(file_path)
+    if not isinstance(entries, list):
+        return 0
+
+    if replace:
+        store.delete_mood_entries(user_id, TRACKER_SOURCE)
+    store.add_mood_entries(user_id, TRACKER_SOURCE, entries)
+    return len(entries)
+
+
+def migrate_gamification(store: SQLiteUserStore, user_id: str, file_path: str, replace: bool = False) -> bool:
+    """
+    Import a {user_id}_gamification.json file.
+
+    Returns:
+        Whether the profile was imported
+    """
+    if store.has_gamification_profile(user_id) and not replace:
+        return False
+    profile = load_json(file_path)
+    if not isinstance(profile, dict):
+        return False
+
+    store.save_gamification_profile(user_id, profile)
+    return True
+
+
+def migrate(db_path: str, user_data_dir: str, data_dir: str, replace: bool = False) -> Dict[str, int]:
+    """
+    Migrate all per-user JSON files into the database.
+
+    Args:
+        db_path: SQLite database to write to
+        user_data_dir: Directory with *_mood_data.json files
+        data_dir: Directory with *_mood.json and *_gamification.json files
+        replace: Re-import users that are already in the database
+
+    Returns:
+        Counts of imported entries and profiles
+    """
+    store = SQLiteUserStore(db_path)
+    stats = {"session_entries": 0, "tracker_entries": 0, "gamification_profiles": 0, "users": 0}
+    users = set()
+
+    for user_id, file_path in user_files(user_data_dir, "_mood_data.json").items():
+        stats["session_entries"] += migrate_session_mood(store, user_id, file_path, replace)
+        users.add(user_id)
+
+    for user_id, file_path in user_files(data_dir, "_mood.json").items():
+        stats["tracker_entries"] += migrate_tracker_mood(store, user_id, file_path, replace)
+        users.add(user_id)
+
+    for user_id, file_path in user_files(data_dir, "_gamification.json").items():
+        stats["gamification_profiles"] += int(migrate_gamification(store, user_id, file_path, replace))
+        users.add(user_id)
+
+    stats["users"] = len(users)
+    store.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-user JSON files into the SQLite user store")
+    parser.add_argument("--db", default=os.environ.get("USER_STORE_PATH", DEFAULT_DB_PATH),
+                        help="SQLite database path")
+    parser.add_argument("--user-data-dir", default="./user_data", help="Directory with *_mood_data.json files")
+    parser.add_argument("--data-dir", default="./data", help="Directory with *_mood.json and *_gamification.json files")
+    parser.add_argument("--replace", action="store_true", help="Re-import users already in the database")
+    args = parser.parse_args()
+
+    stats = migrate(args.db, args.user_data_dir, args.data_dir, args.replace)
+    print(f"Migrated {stats['users']} users into {args.db}: "
+          f"{stats['session_entries']} session mood entries, "
+          f"{stats['tracker_entries']} tracker mood entries, "
+          f"{stats['gamification_profiles']} gamification profiles")
+    print("Set USER_STORE=sqlite to use the database.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,670 @@
+"""
+SQLite user data store for MindGuard.
+
+This module provides a single storage layer for per-user state that was
+previously kept in per-user JSON files: mood entries and insights (from both
+mood trackers) and gamification profiles, activity counts and achievements.
+Writes touch only the affected rows, and data for all users lives in one
+database, so cross-user queries don't need to open every user's file.
+
+The store is opt-in. Set USER_STORE=sqlite (and optionally USER_STORE_PATH)
+to have MoodTracker and GamificationSystem use it; otherwise they keep using
+their JSON files. Existing files can be imported with agent.storage.migrate.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+# Sources of mood entries, one per tracker implementation
+SESSION_SOURCE = "session"    # agent.mood_tracking.MoodTracker
+TRACKER_SOURCE = "tracker"    # agent.tracking.mood.MoodTracker
+
+DEFAULT_DB_PATH = "./data/mindguard.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mood_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    mood TEXT,
+    valence REAL,
+    intensity REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mood_entries_user
+    ON mood_entries (user_id, source, timestamp);
+CREATE INDEX IF NOT EXISTS idx_mood_entries_timestamp
+    ON mood_entries (timestamp);
+
+CREATE TABLE IF NOT EXISTS mood_insights (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    timestamp TEXT,
+    type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mood_insights_user
+    ON mood_insights (user_id, id);
+
+CREATE TABLE IF NOT EXISTS mood_meta (
+    user_id TEXT PRIMARY KEY,
+    last_report_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS gamification_profiles (
+    user_id TEXT PRIMARY KEY,
+    created_at TEXT,
+    points INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    tier TEXT NOT NULL DEFAULT 'bronze',
+    streak_current INTEGER NOT NULL DEFAULT 0,
+    streak_longest INTEGER NOT NULL DEFAULT 0,
+    last_check_in TEXT,
+    emotions_recorded TEXT NOT NULL DEFAULT '[]',
+    rewards_claimed TEXT NOT NULL DEFAULT '[]',
+    wal_seq INTEGER NOT NULL DEFAULT 0,
+    change_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_gamification_points
+    ON gamification_profiles (points DESC);
+
+CREATE TABLE IF NOT EXISTS activity_counts (
+    user_id TEXT NOT NULL,
+    activity TEXT NOT NULL,
+    count REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, activity)
+);
+
+CREATE TABLE IF NOT EXISTS achievements (
+    user_id TEXT NOT NULL,
+    achievement_id TEXT NOT NULL,
+    earned_at TEXT,
+    details TEXT,
+    PRIMARY KEY (user_id, achievement_id)
+);
+CREATE INDEX IF NOT EXISTS idx_achievements_id
+    ON achievements (achievement_id);
+"""
+
+# Columns added since the first schema, created in older databases on open
+ADDED_COLUMNS = [
+    ("gamification_profiles", "wal_seq", "INTEGER NOT NULL DEFAULT 0"),
+    ("gamification_profiles", "change_seq", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Indexes on added columns, created once the columns exist
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_gamification_change
+    ON gamification_profiles (change_seq);
+"""
+
+
+class SQLiteUserStore:
+    """
+    SQLite (WAL mode) implementation of the user data store.
+
+    Connections are pooled and shared across threads; each operation runs in
+    its own transaction.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, pool_size: int = 4, timeout: float = 30.0):
+        """
+        Initialize the store, creating the database and schema if needed.
+
+        Args:
+            db_path: Path to the SQLite database file
+            pool_size: Maximum number of pooled connections
+            timeout: Seconds to wait for a database lock
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_size = pool_size
+        self._created = 0
+        self._pool_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, definition in ADDED_COLUMNS:
+                columns = [row["name"] for row in conn.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            conn.executescript(ADDED_INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new configured connection."""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL durable against application crashes
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection and run a transaction on it."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_create = self._created < self._pool_size
+                if can_create:
+                    self._created += 1
+            conn = self._connect() if can_create else self._pool.get(timeout=self.timeout)
+
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """Close all pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._pool_lock:
+            self._created = 0
+
+    # Mood entries
+
+    def add_mood_entry(self, user_id: str, source: str, entry: Dict[str, Any]):
+        """
+        Append a mood entry.
+
+        Args:
+            user_id: Unique identifier for the user
+            source: Which tracker recorded the entry (SESSION_SOURCE or TRACKER_SOURCE)
+            entry: The entry as the tracker stores it
+        """
+        self.add_mood_entries(user_id, source, [entry])
+
+    def add_mood_entries(self, user_id: str, source: str, entries: List[Dict[str, Any]]):
+        """
+        Append several mood entries in one transaction.
+
+        Args:
+            user_id: Unique identifier for the user
+            source: Which tracker recorded the entries
+            entries: Entries in chronological order
+        """
+        rows = [
+            (
+                user_id,
+                source,
+                entry.get("timestamp", ""),
+                # The session tracker calls it "mood", the other tracker "emotion"
+                entry.get("mood", entry.get("emotion")),
+                entry.get("valence"),
+                entry.get("intensity"),
+                json.dumps(entry)
+            )
+            for entry in entries
+        ]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO mood_entries (user_id, source, timestamp, mood, valence, intensity, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get_mood_entries(
+        self,
+        user_id: str,
+        source: str,
+        since: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a user's mood entries in the order they were recorded.
+
+        Args:
+            user_id: Unique identifier for the user
+            source: Which tracker recorded the entries
+            since: Optional ISO timestamp; only entries at or after it are returned
+            limit: Optional maximum number of (most recent) entries
+
+        Returns:
+            List of entries as the tracker stored them
+        """
+        query = "SELECT data FROM mood_entries WHERE user_id = ? AND source = ?"
+        params: List[Any] = [user_id, source]
+        if since:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [json.loads(row["data"]) for row in reversed(rows)]
+
+    def iter_mood_entry_batches(
+        self,
+        after_id: int = 0,
+        batch_size: int = 1000,
+        source: Optional[str] = None
+    ) -> Iterator[List[Tuple[int, str, str, Dict[str, Any]]]]:
+        """
+        All users' mood entries in insertion order, read in batches.
+
+        Args:
+            after_id: Only entries with a larger row ID are returned (for resuming)
+            batch_size: Entries per batch
+            source: Optional tracker to restrict to
+
+        Yields:
+            Lists of (row ID, user ID, source, entry)
+        """
+        query = "SELECT id, user_id, source, data FROM mood_entries WHERE id > ?"
+        if source:
+            query += " AND source = ?"
+        query += " ORDER BY id LIMIT ?"
+        while True:
+            params = [after_id, source, batch_size] if source else [after_id, batch_size]
+            with self._connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+            if not rows:
+                return
+            yield [(row["id"], row["user_id"], row["source"], json.loads(row["data"])) for row in rows]
+            after_id = rows[-1]["id"]
+
+    def count_all_mood_entries(self, after_id: int = 0, source: Optional[str] = None) -> int:
+        """Number of mood entries across all users, optionally after a row ID."""
+        query = "SELECT COUNT(*) FROM mood_entries WHERE id > ?"
+        params: List[Any] = [after_id]
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        with self._connection() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def update_mood_entries(self, updates: List[Tuple[int, Dict[str, Any]]]):
+        """
+        Replace stored mood entries in one transaction.
+
+        Args:
+            updates: (row ID, entry) pairs, with row IDs from iter_mood_entry_batches
+        """
+        rows = [
+            (
+                entry.get("mood", entry.get("emotion")),
+                entry.get("valence"),
+                entry.get("intensity"),
+                json.dumps(entry),
+                row_id
+            )
+            for row_id, entry in updates
+        ]
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE mood_entries SET mood = ?, valence = ?, intensity = ?, data = ? WHERE id = ?",
+                rows
+            )
+
+    def count_mood_entries(self, user_id: str, source: str) -> int:
+        """Number of mood entries a user has from a source."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM mood_entries WHERE user_id = ? AND source = ?",
+                (user_id, source)
+            ).fetchone()
+        return row[0]
+
+    def delete_mood_entries(self, user_id: str, source: str):
+        """Delete all of a user's mood entries from a source."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM mood_entries WHERE user_id = ? AND source = ?", (user_id, source))
+
+    # Insights and report metadata
+
+    def add_insights(self, user_id: str, insights: List[Dict[str, Any]]):
+        """
+        Append generated insights for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+            insights: Insights in the order they were generated
+        """
+        if not insights:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO mood_insights (user_id, timestamp, type, data) VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, insight.get("timestamp"), insight.get("type"), json.dumps(insight))
+                    for insight in insights
+                ]
+            )
+
+    def get_insights(self, user_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get a user's insights, oldest first.
+
+        Args:
+            user_id: Unique identifier for the user
+            limit: Optional maximum number of (most recent) insights
+
+        Returns:
+            List of insights
+        """
+        query = "SELECT data FROM mood_insights WHERE user_id = ? ORDER BY id DESC"
+        params: List[Any] = [user_id]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [json.loads(row["data"]) for row in reversed(rows)]
+
+    def delete_insights(self, user_id: str):
+        """Delete all of a user's insights."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM mood_insights WHERE user_id = ?", (user_id,))
+
+    def get_last_report_date(self, user_id: str) -> Optional[str]:
+        """Date of the user's last daily report, if any."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT last_report_date FROM mood_meta WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row["last_report_date"] if row else None
+
+    def set_last_report_date(self, user_id: str, report_date: Optional[str]):
+        """Record the date of the user's last daily report."""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO mood_meta (user_id, last_report_date) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET last_report_date = excluded.last_report_date",
+                (user_id, report_date)
+            )
+
+    # Gamification
+
+    def load_gamification_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a gamification profile in the shape GamificationSystem uses.
+
+        Args:
+            user_id: Unique identifier for the user
+
+        Returns:
+            The profile, or None if the user has none
+        """
+        with self._connection() as conn:
+            profile = conn.execute(
+                "SELECT * FROM gamification_profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if profile is None:
+                return None
+            counts = conn.execute(
+                "SELECT activity, count FROM activity_counts WHERE user_id = ? ORDER BY rowid", (user_id,)
+            ).fetchall()
+            achievements = conn.execute(
+                "SELECT achievement_id, earned_at, details FROM achievements WHERE user_id = ? "
+                "ORDER BY earned_at, rowid",
+                (user_id,)
+            ).fetchall()
+
+        return {
+            "user_id": user_id,
+            "created_at": profile["created_at"],
+            "points": profile["points"],
+            "level": profile["level"],
+            "tier": profile["tier"],
+            "streak": {
+                "current": profile["streak_current"],
+                "longest": profile["streak_longest"],
+                "last_check_in": profile["last_check_in"]
+            },
+            "achievements": {
+                row["achievement_id"]: {
+                    "earned_at": row["earned_at"],
+                    "details": json.loads(row["details"]) if row["details"] else None
+                }
+                for row in achievements
+            },
+            "activity_counts": {
+                row["activity"]: _as_number(row["count"]) for row in counts
+            },
+            "emotions_recorded": json.loads(profile["emotions_recorded"]),
+            "rewards_claimed": json.loads(profile["rewards_claimed"]),
+            # Last write-ahead log record applied (see agent.engagement.write_behind)
+            "wal_seq": profile["wal_seq"]
+        }
+
+    def save_gamification_profile(self, user_id: str, profile: Dict[str, Any]):
+        """
+        Save a gamification profile.
+
+        Only the profile row, its activity counts and any new achievements are
+        written; previously earned achievements are left untouched. The row
+        gets the next change sequence number (see iter_gamification_changes).
+
+        Args:
+            user_id: Unique identifier for the user
+            profile: Profile in the shape GamificationSystem uses
+        """
+        streak = profile.get("streak", {})
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO gamification_profiles (user_id, created_at, points, level, tier, "
+                "streak_current, streak_longest, last_check_in, emotions_recorded, rewards_claimed, wal_seq, change_seq) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                "(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM gamification_profiles)) "
+                "ON CONFLICT(user_id) DO UPDATE SET points = excluded.points, level = excluded.level, "
+                "tier = excluded.tier, streak_current = excluded.streak_current, "
+                "streak_longest = excluded.streak_longest, last_check_in = excluded.last_check_in, "
+                "emotions_recorded = excluded.emotions_recorded, rewards_claimed = excluded.rewards_claimed, "
+                "wal_seq = excluded.wal_seq, change_seq = excluded.change_seq",
+                (
+                    user_id,
+                    profile.get("created_at"),
+                    profile.get("points", 0),
+                    profile.get("level", 1),
+                    profile.get("tier", "bronze"),
+                    streak.get("current", 0),
+                    streak.get("longest", 0),
+                    streak.get("last_check_in"),
+                    json.dumps(profile.get("emotions_recorded", [])),
+                    json.dumps(profile.get("rewards_claimed", [])),
+                    profile.get("wal_seq", 0)
+                )
+            )
+            conn.executemany(
+                "INSERT INTO activity_counts (user_id, activity, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, activity) DO UPDATE SET count = excluded.count",
+                [(user_id, activity, count) for activity, count in profile.get("activity_counts", {}).items()]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO achievements (user_id, achievement_id, earned_at, details) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, achievement_id, earned.get("earned_at"), json.dumps(earned.get("details")))
+                    for achievement_id, earned in profile.get("achievements", {}).items()
+                ]
+            )
+
+    def has_gamification_profile(self, user_id: str) -> bool:
+        """Whether the user has a stored gamification profile."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM gamification_profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row is not None
+
+    # Cross-user analytics
+
+    def mood_distribution(self, since: Optional[str] = None, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Entry count and average valence and intensity per mood across all users.
+
+        Args:
+            since: Optional ISO timestamp; only entries at or after it are counted
+            source: Optional source to restrict to
+
+        Returns:
+            List of {"mood", "count", "users", "avg_valence", "avg_intensity"}, most frequent first
+        """
+        query = (
+            "SELECT mood, COUNT(*) AS count, COUNT(DISTINCT user_id) AS users, "
+            "AVG(valence) AS avg_valence, AVG(intensity) AS avg_intensity FROM mood_entries"
+        )
+        conditions, params = [], []
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if source:
+            conditions.append("source = ?")
+            params.append(source)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY mood ORDER BY count DESC"
+
+        with self._connection() as conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def top_users_by_points(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Users with the most gamification points.
+
+        Args:
+            limit: Number of users to return
+
+        Returns:
+            List of {"user_id", "points", "level", "tier"}
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT user_id, points, level, tier FROM gamification_profiles "
+                "ORDER BY points DESC, user_id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_gamification_summaries(self, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Ranking fields of every gamification profile, read in batches.
+
+        Args:
+            batch_size: Rows fetched per query
+
+        Yields:
+            {"user_id", "created_at", "points", "level", "tier", "streak": {"current"}}
+        """
+        last_user_id = ""
+        while True:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT user_id, created_at, points, level, tier, streak_current "
+                    "FROM gamification_profiles WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last_user_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _ranking_summary(row)
+            last_user_id = rows[-1]["user_id"]
+
+    def last_gamification_change(self) -> int:
+        """Change sequence number of the most recently saved gamification profile (0 if none)."""
+        with self._connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(change_seq), 0) FROM gamification_profiles").fetchone()[0]
+
+    def iter_gamification_changes(self, after_seq: int, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """
+        Ranking fields of the profiles saved since a change sequence number.
+
+        Every save gives the profile the next number, so this reads only the
+        changed rows (through the change_seq index), whichever process saved them.
+
+        Args:
+            after_seq: Last change already seen
+            batch_size: Rows fetched per query
+
+        Yields:
+            Summaries as from iter_gamification_summaries plus "change_seq", oldest change first
+        """
+        while True:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT user_id, created_at, points, level, tier, streak_current, change_seq "
+                    "FROM gamification_profiles WHERE change_seq > ? ORDER BY change_seq LIMIT ?",
+                    (after_seq, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                summary = _ranking_summary(row)
+                summary["change_seq"] = row["change_seq"]
+                yield summary
+            after_seq = rows[-1]["change_seq"]
+
+    def achievement_counts(self) -> Dict[str, int]:
+        """Number of users who have earned each achievement."""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT achievement_id, COUNT(*) AS count FROM achievements GROUP BY achievement_id"
+            ).fetchall()
+        return {row["achievement_id"]: row["count"] for row in rows}
+
+
+def _ranking_summary(row: sqlite3.Row) -> Dict[str, Any]:
+    """The fields of a profile row that leaderboards rank by, shaped like a profile."""
+    return {
+        "user_id": row["user_id"],
+        "created_at": row["created_at"],
+        "points": row["points"],
+        "level": row["level"],
+        "tier": row["tier"],
+        "streak": {"current": row["streak_current"]}
+    }
+
+
+def _as_number(value: float):
+    """Return whole-number counts as int, as they are in the JSON profiles."""
+    return int(value) if float(value).is_integer() else value
+
+
+_stores: Dict[str, SQLiteUserStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_user_store(db_path: Optional[str] = None) -> Optional[SQLiteUserStore]:
+    """
+    Get the configured user store.
+
+    The store is selected with the USER_STORE environment variable ('sqlite'
+    to enable it) and USER_STORE_PATH for the database location. Stores are
+    shared per database path.
+
+    Args:
+        db_path: Optional database path; enables the store regardless of USER_STORE
+
+    Returns:
+        The shared store, or None when per-user JSON files should be used
+    """
+    if db_path is None:
+        if os.environ.get("USER_STORE", "json").lower() != "sqlite":
+            return None
+        db_path = os.environ.get("USER_STORE_PATH", DEFAULT_DB_PATH)
+
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SQLiteUserStore(db_path)
+        return _stores[key]
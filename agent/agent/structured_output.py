@@ -0,0 +1,280 @@
+"""
+Schema-guided JSON generation for report extraction.
+
+Free-form answers had to be cut out of surrounding text and failed whole
+when the JSON was malformed. This module constrains and checks the output:
+
+- gbnf_grammar(): a llama.cpp grammar that only admits the questionnaire
+  object (fields in schema order, scores 1-10, category options), so the
+  model can't produce anything else and stops when the object is closed
+- gemini_response_schema(): the same shape as a structured-output schema
+  for Gemini's JSON mode
+- StreamingJSONParser: reads a response as it streams, checks each
+  questionnaire field against the schema as soon as its value is complete,
+  and reports when the top-level object closes, so generation can be
+  stopped there (or abandoned at the first invalid field)
+- generate_structured(): runs a streaming generation through the parser,
+  retrying the rare invalid response
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+
+from report_extraction import (
+    CATEGORICAL_FIELDS, NUMERIC_FIELDS, QUESTIONNAIRE_FIELDS, TEXT_FIELDS
+)
+
+QUESTIONNAIRE_KEY = "questionnaire_data"
+EMOTION_REPORT_KEY = "emotion_report"
+
+
+class SchemaError(ValueError):
+    """A response field doesn't match the questionnaire schema."""
+
+
+def validate_questionnaire_field(key: str, value: Any):
+    """
+    Check one questionnaire answer; null means the chunk had no evidence.
+
+    Raises:
+        SchemaError: If the field is unknown or its value invalid
+    """
+    if key not in QUESTIONNAIRE_FIELDS:
+        raise SchemaError(f"Unknown questionnaire field: {key}")
+    if value is None:
+        return
+    if key in NUMERIC_FIELDS:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 1 <= value <= 10:
+            raise SchemaError(f"{key} must be a number 1-10, got {value!r}")
+    elif key in CATEGORICAL_FIELDS:
+        if value not in CATEGORICAL_FIELDS[key]:
+            raise SchemaError(f"{key} must be one of {CATEGORICAL_FIELDS[key]}, got {value!r}")
+    elif not isinstance(value, str):
+        raise SchemaError(f"{key} must be a string, got {value!r}")
+
+
+class StreamingJSONParser:
+    """
+    Incremental reader for one JSON object arriving in pieces.
+
+    Text before the first "{" (and anything after the object closes) is
+    ignored. Whenever a member of an object is complete, on_member is called
+    with the keys leading to that object, the member's key and its value; it
+    may raise to reject the response early.
+    """
+
+    def __init__(self, on_member: Optional[Callable[[Tuple[str, ...], str, Any], None]] = None):
+        self.on_member = on_member
+        self.buffer = ""
+        self.complete = False
+        self._position = 0
+        self._start = -1
+        self._end = -1
+        self._in_string = False
+        self._escaped = False
+        # One frame per open container: [bracket, key path, start of the current member]
+        self._stack: List[list] = []
+        self._last_key: Optional[str] = None
+        self._key_start = -1
+
+    def feed(self, text: str) -> bool:
+        """
+        Add the next piece of the response.
+
+        Returns:
+            True once the top-level object is complete
+
+        Raises:
+            ValueError: If a member isn't valid JSON (or on_member rejects it)
+        """
+        if self.complete:
+            return True
+        self.buffer += text
+        buffer = self.buffer
+        for i in range(self._position, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start >= 0:
+                        self._last_key = json.loads(buffer[self._key_start:i + 1])
+                        self._key_start = -1
+                continue
+
+            if self._start < 0:
+                if char == "{":
+                    self._start = i
+                    self._stack.append(["{", (), i + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                frame = self._stack[-1]
+                # A string at the start of an object member is its key
+                if frame[0] == "{" and not buffer[frame[2]:i].strip():
+                    self._key_start = i
+            elif char in "{[":
+                frame = self._stack[-1]
+                path = frame[1] + (self._last_key,) if frame[0] == "{" else frame[1]
+                self._stack.append([char, path, i + 1])
+            elif char == ",":
+                self._close_member(i)
+            elif char in "}]":
+                if char == "}":
+                    self._close_member(i)
+                self._stack.pop()
+                if not self._stack:
+                    self._end = i + 1
+                    self.complete = True
+                    self._position = i + 1
+                    return True
+        self._position = len(buffer)
+        return False
+
+    def _close_member(self, i: int):
+        frame = self._stack[-1]
+        member = self.buffer[frame[2]:i]
+        frame[2] = i + 1
+        if frame[0] != "{" or not member.strip():
+            return
+        try:
+            (key, value), = json.loads("{" + member + "}").items()
+        except (json.JSONDecodeError, ValueError) as e:
+            raise ValueError(f"Invalid JSON member {member.strip()[:80]!r}: {e}")
+        if self.on_member:
+            self.on_member(frame[1], key, value)
+
+    def result(self) -> Dict[str, Any]:
+        """
+        The parsed object.
+
+        Raises:
+            ValueError: If the object isn't complete
+        """
+        if not self.complete:
+            raise ValueError(f"Incomplete JSON object in response: {self.buffer[:200]}")
+        return json.loads(self.buffer[self._start:self._end])
+
+
+def questionnaire_validator(path: Tuple[str, ...] = ()) -> Callable[[Tuple[str, ...], str, Any], None]:
+    """on_member callback validating the questionnaire object found at `path`."""
+    def on_member(member_path: Tuple[str, ...], key: str, value: Any):
+        if member_path == path:
+            validate_questionnaire_field(key, value)
+    return on_member
+
+
+def generate_structured(
+    generate: Callable[[], Iterable[str]],
+    on_member: Optional[Callable[[Tuple[str, ...], str, Any], None]] = None,
+    retries: int = 1
+) -> Dict[str, Any]:
+    """
+    Stream a generation into a StreamingJSONParser, stopping when the object closes.
+
+    Args:
+        generate: Starts a generation and returns its text pieces; stopping
+            iteration early should end the generation
+        on_member: Field validator (see StreamingJSONParser)
+        retries: New generations to try after an invalid or incomplete response
+
+    Returns:
+        The parsed object
+
+    Raises:
+        ValueError: If every attempt was invalid
+    """
+    error: Optional[Exception] = None
+    for _ in range(retries + 1):
+        parser = StreamingJSONParser(on_member)
+        stream = generate()
+        try:
+            for piece in stream:
+                if parser.feed(piece):
+                    break
+            return parser.result()
+        except ValueError as e:
+            error = e
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+    raise ValueError(f"No valid response after {retries + 1} attempts: {error}")
+
+
+# llama.cpp grammar pieces
+_GBNF_COMMON = r'''
+ws ::= | " " | "\n" [ \t]{0,20}
+string ::= "\"" ( [^"\\\x7F\x00-\x1F] | "\\" ( ["\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] ) )* "\""
+number ::= "-"? [0-9]+ ( "." [0-9]+ )?
+score ::= ( "10" | [1-9] ) | "null"
+text ::= string | "null"
+strings ::= "[" ws ( string ( "," ws string )* )? ws "]"
+'''
+
+_GBNF_EMOTION_REPORT = r'''
+emotion-report ::= "{" ws "\"summary\":" ws summary "," ws "\"disorder_indicators\":" ws strings ws "}"
+summary ::= "{" ws "\"emotions_count\":" ws counts "," ws "\"average_confidence\":" ws number "," ws "\"average_valence\":" ws number "," ws "\"crisis_count\":" ws number "," ws "\"risk_factors\":" ws strings ws "}"
+counts ::= "{" ws ( string ":" ws number ( "," ws string ":" ws number )* )? ws "}"
+'''
+
+
+def _gbnf_literal(value: str) -> str:
+    """A GBNF string literal matching the JSON string `value`."""
+    return '"\\"' + value + '\\""'
+
+
+def _gbnf_key(name: str) -> str:
+    """A GBNF string literal matching `"name":`."""
+    return '"\\"' + name + '\\":"'
+
+
+def gbnf_grammar(include_emotion_report: bool = False) -> str:
+    """
+    llama.cpp grammar for the chunk answer.
+
+    Args:
+        include_emotion_report: Answer is {"questionnaire_data": ..., "emotion_report": ...}
+            instead of the bare questionnaire
+
+    Returns:
+        GBNF source (for LlamaGrammar.from_string)
+    """
+    rules = []
+    members = []
+    for field in QUESTIONNAIRE_FIELDS:
+        if field in NUMERIC_FIELDS:
+            value_rule = "score"
+        elif field in TEXT_FIELDS:
+            value_rule = "text"
+        else:
+            value_rule = field.replace("_", "-")
+            options = " | ".join(_gbnf_literal(option) for option in CATEGORICAL_FIELDS[field])
+            rules.append(f'{value_rule} ::= {options} | "null"')
+        members.append(f'{_gbnf_key(field)} ws {value_rule}')
+    rules.append('questionnaire ::= "{" ws ' + ' "," ws '.join(members) + ' ws "}"')
+
+    if include_emotion_report:
+        root = (
+            f'root ::= "{{" ws {_gbnf_key(QUESTIONNAIRE_KEY)} ws questionnaire "," ws '
+            f'{_gbnf_key(EMOTION_REPORT_KEY)} ws emotion-report ws "}}"'
+        )
+        return "\n".join([root] + rules) + _GBNF_EMOTION_REPORT + _GBNF_COMMON
+    return "\n".join(['root ::= questionnaire'] + rules) + _GBNF_COMMON
+
+
+def gemini_response_schema() -> Dict[str, Any]:
+    """Gemini structured-output schema for the bare questionnaire."""
+    properties: Dict[str, Any] = {}
+    for field in QUESTIONNAIRE_FIELDS:
+        if field in NUMERIC_FIELDS:
+            properties[field] = {"type": "integer", "nullable": True}
+        elif field in TEXT_FIELDS:
+            properties[field] = {"type": "string", "nullable": True}
+        else:
+            properties[field] = {"type": "string", "enum": CATEGORICAL_FIELDS[field], "nullable": True}
+    return {"type": "object", "properties": properties, "required": list(QUESTIONNAIRE_FIELDS)}
@@ -7,11 +7,203 @@ other relaxation techniques.
 """
 
 from typing import Dict, List, Any, Optional, Union, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+import bisect
 import os
 import json
 import random
 
 
+# Content catalog for TherapeuticModalities.recommend_for_emotion, keyed by category
+DEFAULT_RECOMMENDATION_CATEGORIES = {
+    "anxiety": {
+        "primary": {
+            "title": "Anxiety Management Techniques",
+            "description": "Learn evidence-based strategies to manage anxiety and reduce stress.",
+            "type": "Guide",
+            "duration": "10 min read"
+        },
+        "articles": [
+            {
+                "title": "Understanding and Managing Anxiety",
+                "type": "Article",
+                "duration": "5 min read",
+                "description": "Learn about the science of anxiety and practical coping strategies.",
+                "action": {"label": "Read Now", "url": "/guides/anxiety-management"}
+            },
+            {
+                "title": "Breathing Exercises for Anxiety Relief",
+                "type": "Exercise Guide",
+                "duration": "3 min read",
+                "description": "Simple breathing techniques you can use anywhere to calm anxiety.",
+                "action": {"label": "Start Exercise", "url": "/exercises/breathing"}
+            }
+        ],
+        "videos": [
+            {
+                "title": "Guided Anxiety Relief Meditation",
+                "type": "Video",
+                "duration": "10 minutes",
+                "description": "A calming meditation session to help reduce anxiety symptoms.",
+                "action": {"label": "Watch Now", "url": "/meditations/anxiety-relief"}
+            }
+        ]
+    },
+    "stress": {
+        "primary": {
+            "title": "Stress Management Toolkit",
+            "description": "Essential tools and techniques for managing daily stress.",
+            "type": "Guide",
+            "duration": "15 min read"
+        },
+        "articles": [
+            {
+                "title": "Quick Stress Relief Techniques",
+                "type": "Guide",
+                "duration": "5 min read",
+                "description": "Fast and effective ways to reduce stress in any situation.",
+                "action": {"label": "Read Now", "url": "/guides/stress-relief"}
+            }
+        ],
+        "videos": [
+            {
+                "title": "Progressive Muscle Relaxation",
+                "type": "Exercise Video",
+                "duration": "15 minutes",
+                "description": "Learn how to release physical tension and reduce stress.",
+                "action": {"label": "Start Exercise", "url": "/exercises/muscle-relaxation"}
+            }
+        ]
+    },
+    "low_mood": {
+        "primary": {
+            "title": "Mood Enhancement Strategies",
+            "description": "Evidence-based techniques to improve your mood and energy levels.",
+            "type": "Guide",
+            "duration": "12 min read"
+        },
+        "articles": [
+            {
+                "title": "Building a Positive Daily Routine",
+                "type": "Guide",
+                "duration": "8 min read",
+                "description": "Create a daily schedule that supports better mental health.",
+                "action": {"label": "Read Now", "url": "/guides/daily-routine"}
+            }
+        ],
+        "videos": [
+            {
+                "title": "Mood-Boosting Exercise Routine",
+                "type": "Workout Video",
+                "duration": "20 minutes",
+                "description": "A gentle exercise session designed to increase energy and mood.",
+                "action": {"label": "Start Workout", "url": "/exercises/mood-boost"}
+            }
+        ]
+    },
+    "sleep_issues": {
+        "primary": {
+            "title": "Sleep Improvement Guide",
+            "description": "Comprehensive guide to better sleep quality and habits.",
+            "type": "Guide",
+            "duration": "10 min read"
+        },
+        "articles": [
+            {
+                "title": "Creating a Perfect Sleep Environment",
+                "type": "Guide",
+                "duration": "5 min read",
+                "description": "Tips for optimizing your bedroom for better sleep.",
+                "action": {"label": "Read Now", "url": "/guides/sleep-environment"}
+            }
+        ],
+        "videos": [
+            {
+                "title": "Bedtime Relaxation Routine",
+                "type": "Relaxation Video",
+                "duration": "15 minutes",
+                "description": "A calming routine to help you prepare for restful sleep.",
+                "action": {"label": "Watch Now", "url": "/relaxation/bedtime"}
+            }
+        ]
+    }
+}
+
+# Emotions routed to each recommendation category (anything else gets "stress")
+RECOMMENDATION_CATEGORY_MAP = {
+    "anxiety": "anxiety", "fear": "anxiety", "panic": "anxiety",
+    "stress": "stress", "overwhelmed": "stress", "tension": "stress",
+    "sadness": "low_mood", "depression": "low_mood", "hopelessness": "low_mood",
+    "insomnia": "sleep_issues", "fatigue": "sleep_issues", "exhaustion": "sleep_issues"
+}
+
+# Primary recommendation used instead of the category guide for high intensity emotions
+PROFESSIONAL_SUPPORT_RECOMMENDATION = {
+    "title": "Professional Support Resources",
+    "description": "Consider reaching out to a mental health professional for additional support.",
+    "type": "Resource Guide",
+    "duration": "5 min read",
+    "action": {"label": "Find Support", "url": "/resources/professional-help"}
+}
+
+# Labels produced by EmotionAnalyzer; lookup tables are precomputed for these
+# in addition to the emotions each modality maps explicitly
+ANALYZER_EMOTIONS = (
+    "joy", "contentment", "excitement", "gratitude", "pride", "love", "hope",
+    "surprise", "confusion", "neutral", "sadness", "fear", "anxiety", "anger",
+    "disgust", "frustration", "guilt", "hopelessness", "loneliness", "grief",
+    "dread", "embarrassment", "crisis"
+)
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Recursively copy (possibly frozen) catalog data into plain dicts and lists."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(item) for item in value]
+    return value
+
+
+@lru_cache(maxsize=None)
+def _load_catalog(resources_path: str, filename: str) -> Optional[MappingProxyType]:
+    """
+    Load a JSON catalog from the resources directory once per process.
+
+    Args:
+        resources_path: Directory containing resource files
+        filename: Catalog file name
+
+    Returns:
+        The frozen catalog, or None if the file is missing or invalid
+    """
+    file_path = os.path.join(resources_path, filename)
+    if not os.path.exists(file_path):
+        return None
+
+    try:
+        with open(file_path, 'r') as f:
+            return _freeze(json.load(f))
+    except Exception as e:
+        print(f"Error loading therapeutic resource {file_path}: {e}")
+        return None
+
+
+def _intensity_band(intensity: float, threshold: float) -> str:
+    """Bucket an intensity value into the band used by the lookup tables."""
+    return "high" if intensity > threshold else "normal"
+
+
 class TherapeuticModalities:
     """
     Provides access to various therapeutic techniques and resources.
@@ -36,162 +228,58 @@ class TherapeuticModalities:
         self.music_therapy = MusicTherapy(os.path.join(resources_path, "music"))
         self.meditation = GuidedMeditation(os.path.join(resources_path, "meditation"))
         self.breathing = BreathingExercises(os.path.join(resources_path, "breathing"))
-        
-    def recommend_for_emotion(self, emotion: str, intensity: float) -> Dict[str, Any]:
-        """Generate personalized therapeutic recommendations based on emotional state."""
-        recommendations = {
-            "primary_recommendation": {},
-            "articles": [],
-            "videos": []
-        }
 
-        # Map emotions to recommendation categories
-        emotion_categories = {
-            "anxiety": {
-                "primary": {
-                    "title": "Anxiety Management Techniques",
-                    "description": "Learn evidence-based strategies to manage anxiety and reduce stress.",
-                    "type": "Guide",
-                    "duration": "10 min read"
-                },
-                "articles": [
-                    {
-                        "title": "Understanding and Managing Anxiety",
-                        "type": "Article",
-                        "duration": "5 min read",
-                        "description": "Learn about the science of anxiety and practical coping strategies.",
-                        "action": {"label": "Read Now", "url": "/guides/anxiety-management"}
-                    },
-                    {
-                        "title": "Breathing Exercises for Anxiety Relief",
-                        "type": "Exercise Guide",
-                        "duration": "3 min read",
-                        "description": "Simple breathing techniques you can use anywhere to calm anxiety.",
-                        "action": {"label": "Start Exercise", "url": "/exercises/breathing"}
-                    }
-                ],
-                "videos": [
-                    {
-                        "title": "Guided Anxiety Relief Meditation",
-                        "type": "Video",
-                        "duration": "10 minutes",
-                        "description": "A calming meditation session to help reduce anxiety symptoms.",
-                        "action": {"label": "Watch Now", "url": "/meditations/anxiety-relief"}
-                    }
-                ]
-            },
-            "stress": {
-                "primary": {
-                    "title": "Stress Management Toolkit",
-                    "description": "Essential tools and techniques for managing daily stress.",
-                    "type": "Guide",
-                    "duration": "15 min read"
-                },
-                "articles": [
-                    {
-                        "title": "Quick Stress Relief Techniques",
-                        "type": "Guide",
-                        "duration": "5 min read",
-                        "description": "Fast and effective ways to reduce stress in any situation.",
-                        "action": {"label": "Read Now", "url": "/guides/stress-relief"}
-                    }
-                ],
-                "videos": [
-                    {
-                        "title": "Progressive Muscle Relaxation",
-                        "type": "Exercise Video",
-                        "duration": "15 minutes",
-                        "description": "Learn how to release physical tension and reduce stress.",
-                        "action": {"label": "Start Exercise", "url": "/exercises/muscle-relaxation"}
-                    }
-                ]
-            },
-            "low_mood": {
-                "primary": {
-                    "title": "Mood Enhancement Strategies",
-                    "description": "Evidence-based techniques to improve your mood and energy levels.",
-                    "type": "Guide",
-                    "duration": "12 min read"
-                },
-                "articles": [
-                    {
-                        "title": "Building a Positive Daily Routine",
-                        "type": "Guide",
-                        "duration": "8 min read",
-                        "description": "Create a daily schedule that supports better mental health.",
-                        "action": {"label": "Read Now", "url": "/guides/daily-routine"}
-                    }
-                ],
-                "videos": [
-                    {
-                        "title": "Mood-Boosting Exercise Routine",
-                        "type": "Workout Video",
-                        "duration": "20 minutes",
-                        "description": "A gentle exercise session designed to increase energy and mood.",
-                        "action": {"label": "Start Workout", "url": "/exercises/mood-boost"}
-                    }
-                ]
-            },
-            "sleep_issues": {
-                "primary": {
-                    "title": "Sleep Improvement Guide",
-                    "description": "Comprehensive guide to better sleep quality and habits.",
-                    "type": "Guide",
-                    "duration": "10 min read"
-                },
-                "articles": [
-                    {
-                        "title": "Creating a Perfect Sleep Environment",
-                        "type": "Guide",
-                        "duration": "5 min read",
-                        "description": "Tips for optimizing your bedroom for better sleep.",
-                        "action": {"label": "Read Now", "url": "/guides/sleep-environment"}
-                    }
-                ],
-                "videos": [
-                    {
-                        "title": "Bedtime Relaxation Routine",
-                        "type": "Relaxation Video",
-                        "duration": "15 minutes",
-                        "description": "A calming routine to help you prepare for restful sleep.",
-                        "action": {"label": "Watch Now", "url": "/relaxation/bedtime"}
-                    }
-                ]
-            }
-        }
+        # Content catalog, optionally overridden by recommendations.json
+        catalog = _load_catalog(resources_path, "recommendations.json")
+        self.recommendation_categories = catalog if catalog is not None else _freeze(DEFAULT_RECOMMENDATION_CATEGORIES)
 
-        # Determine primary emotion category
-        if emotion in ["anxiety", "fear", "panic"]:
-            category = "anxiety"
-        elif emotion in ["stress", "overwhelmed", "tension"]:
-            category = "stress"
-        elif emotion in ["sadness", "depression", "hopelessness"]:
-            category = "low_mood"
-        elif emotion in ["insomnia", "fatigue", "exhaustion"]:
-            category = "sleep_issues"
-        else:
-            category = "stress"  # Default category
+        # Precomputed (emotion, intensity band) -> recommendations table
+        self._recommendation_table = self._build_recommendation_table()
 
-        # Get recommendations for the category
-        category_recs = emotion_categories.get(category, emotion_categories["stress"])
+    def _build_recommendation_table(self) -> Dict[Tuple[Optional[str], str], Dict[str, Any]]:
+        """Precompute the recommendations for every known emotion and intensity band."""
+        emotions = set(RECOMMENDATION_CATEGORY_MAP) | set(ANALYZER_EMOTIONS)
 
-        # Adjust recommendations based on intensity
-        if intensity > 0.7:  # High intensity
-            recommendations["primary_recommendation"] = {
-                "title": "Professional Support Resources",
-                "description": "Consider reaching out to a mental health professional for additional support.",
-                "type": "Resource Guide",
-                "duration": "5 min read",
-                "action": {"label": "Find Support", "url": "/resources/professional-help"}
+        table = {}
+        for band in ("normal", "high"):
+            # Unknown emotions share the default entry
+            table[(None, band)] = self._build_recommendations("stress", band)
+            for emotion in emotions:
+                category = RECOMMENDATION_CATEGORY_MAP.get(emotion, "stress")
+                table[(emotion, band)] = self._build_recommendations(category, band)
+
+        return table
+
+    def _build_recommendations(self, category: str, band: str) -> MappingProxyType:
+        """Build the (read-only) recommendations for a category and intensity band."""
+        categories = self.recommendation_categories
+        category_recs = categories.get(category, categories["stress"])
+
+        # High intensity emotions point to professional support and only the most important content
+        if band == "high":
+            recommendations = {
+                "primary_recommendation": PROFESSIONAL_SUPPORT_RECOMMENDATION,
+                "articles": category_recs["articles"][:1],
+                "videos": category_recs["videos"][:1]
             }
-            recommendations["articles"] = category_recs["articles"][:1]  # Limit to most important
-            recommendations["videos"] = category_recs["videos"][:1]  # Limit to most important
         else:
-            recommendations["primary_recommendation"] = category_recs["primary"]
-            recommendations["articles"] = category_recs["articles"]
-            recommendations["videos"] = category_recs["videos"]
+            recommendations = {
+                "primary_recommendation": category_recs["primary"],
+                "articles": category_recs["articles"],
+                "videos": category_recs["videos"]
+            }
+
+        return _freeze(recommendations)
+
+    def recommend_for_emotion(self, emotion: str, intensity: float) -> Dict[str, Any]:
+        """Generate personalized therapeutic recommendations based on emotional state."""
+        band = _intensity_band(intensity, 0.7)
+        recommendations = self._recommendation_table.get((emotion, band))
+        if recommendations is None:
+            recommendations = self._recommendation_table[(None, band)]
 
-        return recommendations
+        # The table is frozen; hand out deep copies callers are free to modify
+        return _thaw(recommendations)
     
     def _select_primary_recommendation(self, emotion: str, intensity: float) -> Dict[str, Any]:
         """
@@ -266,6 +354,30 @@ class TherapeuticModalities:
             ])
 
 
+# Emotions mapped to MusicTherapy playlist categories (anything else gets "focus")
+MUSIC_EMOTION_MAP = {
+    "anxiety": "anxiety",
+    "stress": "anxiety",
+    "fear": "anxiety",
+    "worry": "anxiety",
+    "sadness": "sadness",
+    "grief": "sadness",
+    "depression": "sadness",
+    "hopelessness": "sadness",
+    "anger": "anger",
+    "frustration": "anger",
+    "annoyance": "anger",
+    "joy": "joy",
+    "happiness": "joy",
+    "excitement": "joy",
+    "contentment": "joy",
+    "neutral": "focus",
+    "tired": "sleep",
+    "exhaustion": "sleep",
+    "fatigue": "sleep"
+}
+
+
 class MusicTherapy:
     """Provides music therapy resources and recommendations."""
     
@@ -279,10 +391,14 @@ class MusicTherapy:
         self.resources_path = resources_path
         self.playlists = self._initialize_playlists()
         self.binaural_beats = self._initialize_binaural_beats()
+        self._recommendation_table = self._build_recommendation_table()
         
     def _initialize_playlists(self) -> Dict[str, List[Dict[str, Any]]]:
         """Initialize music playlists for different emotional states."""
-        # In a real implementation, this would load from files or a database
+        catalog = _load_catalog(self.resources_path, "playlists.json")
+        if catalog is not None:
+            return _thaw(catalog)
+        
         return {
             # Playlists for different emotional states
             "anxiety": [
@@ -319,6 +435,10 @@ class MusicTherapy:
         
     def _initialize_binaural_beats(self) -> Dict[str, List[Dict[str, Any]]]:
         """Initialize binaural beats for different brain states."""
+        catalog = _load_catalog(self.resources_path, "binaural_beats.json")
+        if catalog is not None:
+            return _thaw(catalog)
+        
         return {
             "relaxation": [
                 {"title": "Alpha Waves", "frequency": "8-12Hz", "duration": "20:00", "url": "https://example.com/alpha-waves"},
@@ -338,6 +458,38 @@ class MusicTherapy:
             ]
         }
     
+    def _build_recommendation_table(self) -> Dict[Tuple[str, str], Tuple[str, Tuple, Optional[Tuple]]]:
+        """Precompute playlist and binaural options for every known emotion and intensity band."""
+        emotions = set(MUSIC_EMOTION_MAP) | set(ANALYZER_EMOTIONS)
+        return {
+            (emotion, band): self._build_recommendation_entry(emotion, band)
+            for emotion in emotions
+            for band in ("normal", "high")
+        }
+    
+    def _build_recommendation_entry(self, emotion: str, band: str) -> Tuple[str, Tuple, Optional[Tuple]]:
+        """
+        Resolve the playlist category and candidate tracks for an emotion.
+        
+        Args:
+            emotion: The emotional state
+            band: Intensity band ("normal" or "high")
+            
+        Returns:
+            Tuple of (playlist category, playlist items, binaural beat options or None)
+        """
+        category = MUSIC_EMOTION_MAP.get(emotion.lower(), "focus")
+        playlist_items = tuple(self.playlists.get(category, self.playlists["focus"]))
+        
+        # For high intensity negative emotions, also recommend binaural beats
+        binaural_options = None
+        if band == "high" and emotion in ["anxiety", "stress", "fear", "anger"]:
+            binaural_options = tuple(self.binaural_beats["relaxation"])
+        elif emotion in ["tired", "exhaustion", "fatigue"]:
+            binaural_options = tuple(self.binaural_beats["focus"])
+        
+        return category, playlist_items, binaural_options
+    
     def recommend_for_emotion(self, emotion: str, intensity: float = 0.5) -> Dict[str, Any]:
         """
         Recommend music based on emotional state.
@@ -349,46 +501,16 @@ class MusicTherapy:
         Returns:
             Dictionary with recommended music
         """
-        # Map emotions to playlist categories
-        emotion_map = {
-            "anxiety": "anxiety",
-            "stress": "anxiety",
-            "fear": "anxiety",
-            "worry": "anxiety",
-            "sadness": "sadness",
-            "grief": "sadness",
-            "depression": "sadness",
-            "hopelessness": "sadness",
-            "anger": "anger",
-            "frustration": "anger",
-            "annoyance": "anger",
-            "joy": "joy",
-            "happiness": "joy",
-            "excitement": "joy",
-            "contentment": "joy",
-            "neutral": "focus",
-            "tired": "sleep",
-            "exhaustion": "sleep",
-            "fatigue": "sleep"
-        }
-        
-        # Get the playlist category
-        category = emotion_map.get(emotion.lower(), "focus")
-        
-        # Select playlist items
-        playlist_items = self.playlists.get(category, self.playlists["focus"])
-        
-        # For high intensity negative emotions, also recommend binaural beats
-        binaural_recommendation = None
-        if intensity > 0.7 and emotion in ["anxiety", "stress", "fear", "anger"]:
-            binaural_recommendation = random.choice(self.binaural_beats["relaxation"])
-        elif emotion in ["tired", "exhaustion", "fatigue"]:
-            binaural_recommendation = random.choice(self.binaural_beats["focus"])
+        band = _intensity_band(intensity, 0.7)
+        entry = self._recommendation_table.get((emotion, band))
+        if entry is None:
+            entry = self._build_recommendation_entry(emotion, band)
+        category, playlist_items, binaural_options = entry
         
         return {
             "playlist_category": category,
             "recommendations": random.sample(playlist_items, min(2, len(playlist_items))),
-            "binaural_beats": binaural_recommendation
+            "binaural_beats": random.choice(binaural_options) if binaural_options else None
         }
     
     def get_playlist_by_goal(self, goal: str) -> List[Dict[str, Any]]:
@@ -436,6 +558,25 @@ class MusicTherapy:
         }
 
 
+# Emotions mapped to GuidedMeditation categories (anything else gets "focus")
+MEDITATION_EMOTION_MAP = {
+    "anxiety": "anxiety",
+    "stress": "stress",
+    "fear": "anxiety",
+    "worry": "anxiety",
+    "sadness": "self-compassion",
+    "grief": "self-compassion",
+    "depression": "self-compassion",
+    "anger": "stress",
+    "frustration": "stress",
+    "joy": "gratitude",
+    "happiness": "gratitude",
+    "neutral": "focus",
+    "tired": "body-scan",
+    "exhaustion": "body-scan"
+}
+
+
 class GuidedMeditation:
     """Provides guided meditation and mindfulness resources."""
     
@@ -448,10 +589,33 @@ class GuidedMeditation:
         """
         self.resources_path = resources_path
         self.meditations = self._initialize_meditations()
+        self._load_additional_meditations(os.path.join(resources_path, "meditations.jsonl"))
+        self._build_indexes()
+        
+    def _build_indexes(self):
+        """Build the emotion lookup table and the duration index over all meditations."""
+        self._recommendation_table = {
+            emotion: self._build_recommendation_entry(emotion)
+            for emotion in set(MEDITATION_EMOTION_MAP) | set(ANALYZER_EMOTIONS)
+        }
+        
+        # (seconds, category, meditation) sorted by duration, with the
+        # durations kept in a parallel list for bisect lookups
+        index = [
+            (self._parse_duration_seconds(meditation["duration"]), category, meditation)
+            for category, meditations in self.meditations.items()
+            for meditation in meditations
+        ]
+        index.sort(key=lambda item: item[0])
+        self._duration_index = index
+        self._durations = [seconds for seconds, _, _ in index]
         
     def _initialize_meditations(self) -> Dict[str, List[Dict[str, Any]]]:
         """Initialize guided meditations for different purposes."""
-        # In a real implementation, this would load from files or a database
+        catalog = _load_catalog(self.resources_path, "meditations.json")
+        if catalog is not None:
+            return _thaw(catalog)
+        
         return {
             "anxiety": [
                 {"title": "Calming Anxiety", "duration": "10:00", "level": "beginner", "url": "https://example.com/calming-anxiety"},
@@ -483,6 +647,63 @@ class GuidedMeditation:
             ]
         }
     
+    def _load_additional_meditations(self, file_path: str):
+        """
+        Stream extra meditations from a JSON Lines file into the catalog.
+        
+        Each line is a meditation object with an additional "category" field,
+        which keeps large catalogs cheap to load and append to.
+        
+        Args:
+            file_path: Path to the JSON Lines file
+        """
+        if not os.path.exists(file_path):
+            return
+            
+        try:
+            with open(file_path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    meditation = json.loads(line)
+                    category = meditation.pop("category", "focus")
+                    self.meditations.setdefault(category, []).append(meditation)
+        except Exception as e:
+            print(f"Error loading meditations from {file_path}: {e}")
+    
+    def add_meditation(self, category: str, meditation: Dict[str, Any]):
+        """
+        Add a meditation to the catalog and keep the indexes up to date.
+        
+        Args:
+            category: Meditation category
+            meditation: Meditation with at least a "duration" in "MM:SS" format
+        """
+        new_category = category not in self.meditations
+        self.meditations.setdefault(category, []).append(meditation)
+        
+        if new_category:
+            self._build_indexes()
+            return
+            
+        seconds = self._parse_duration_seconds(meditation["duration"])
+        position = bisect.bisect_right(self._durations, seconds)
+        self._durations.insert(position, seconds)
+        self._duration_index.insert(position, (seconds, category, meditation))
+        
+        # Emotion lookups hold tuples of their category's meditations, or of
+        # "focus" for categories without meditations
+        for emotion, (entry_category, _) in self._recommendation_table.items():
+            source = entry_category if entry_category in self.meditations else "focus"
+            if source == category:
+                self._recommendation_table[emotion] = self._build_recommendation_entry(emotion)
+    
+    def _build_recommendation_entry(self, emotion: str) -> Tuple[str, Tuple]:
+        """Resolve the meditation category and candidate meditations for an emotion."""
+        category = MEDITATION_EMOTION_MAP.get(emotion.lower(), "focus")
+        return category, tuple(self.meditations.get(category, self.meditations["focus"]))
+    
     def recommend_for_emotion(self, emotion: str) -> Dict[str, Any]:
         """
         Recommend meditation based on emotional state.
@@ -493,30 +714,11 @@ class GuidedMeditation:
         Returns:
             Dictionary with recommended meditation
         """
-        # Map emotions to meditation categories
-        emotion_map = {
-            "anxiety": "anxiety",
-            "stress": "stress",
-            "fear": "anxiety",
-            "worry": "anxiety",
-            "sadness": "self-compassion",
-            "grief": "self-compassion",
-            "depression": "self-compassion",
-            "anger": "stress",
-            "frustration": "stress",
-            "joy": "gratitude",
-            "happiness": "gratitude",
-            "neutral": "focus",
-            "tired": "body-scan",
-            "exhaustion": "body-scan"
-        }
-        
-        # Get the meditation category
-        category = emotion_map.get(emotion.lower(), "focus")
-        
-        # Select meditation items
-        meditation_items = self.meditations.get(category, self.meditations["focus"])
-        
+        entry = self._recommendation_table.get(emotion)
+        if entry is None:
+            entry = self._build_recommendation_entry(emotion)
+        category, meditation_items = entry
+
         return {
             "meditation_type": category,
             "recommendations": random.sample(meditation_items, min(2, len(meditation_items))),
@@ -533,36 +735,53 @@ class GuidedMeditation:
         Returns:
             A meditation recommendation
         """
-        all_meditations = []
-        for category, meditations in self.meditations.items():
-            all_meditations.extend(meditations)
+        # Everything before the cutoff fits in the available time
+        cutoff = bisect.bisect_right(self._durations, duration_seconds)
         
-        # Filter by duration
-        duration_minutes = duration_seconds / 60
-        suitable_meditations = [
-            m for m in all_meditations 
-            if self._parse_duration(m["duration"]) <= duration_minutes
-        ]
-        
-        if suitable_meditations:
-            meditation = random.choice(suitable_meditations)
+        if cutoff:
+            _, category, meditation = self._duration_index[random.randrange(cutoff)]
             return {
                 "type": "timed_meditation",
                 "meditation": meditation,
-                "category": next(cat for cat, meds in self.meditations.items() if meditation in meds),
+                "category": category,
                 "message": f"This {meditation['duration']} meditation fits in your available time"
             }
         else:
             # Return the shortest available meditation
-            all_meditations.sort(key=lambda m: self._parse_duration(m["duration"]))
-            meditation = all_meditations[0]
+            _, category, meditation = self._duration_index[0]
             return {
                 "type": "timed_meditation",
                 "meditation": meditation,
-                "category": next(cat for cat, meds in self.meditations.items() if meditation in meds),
+                "category": category,
                 "message": "This is our shortest meditation option"
             }
     
+    def get_longest_meditation(self, duration_seconds: int) -> Dict[str, Any]:
+        """
+        Get the longest meditation that fits within the specified duration.
+        
+        Args:
+            duration_seconds: Maximum duration in seconds
+            
+        Returns:
+            A meditation recommendation
+        """
+        cutoff = bisect.bisect_right(self._durations, duration_seconds)
+        
+        if cutoff:
+            _, category, meditation = self._duration_index[cutoff - 1]
+            message = f"This {meditation['duration']} meditation makes the most of your available time"
+        else:
+            _, category, meditation = self._duration_index[0]
+            message = "This is our shortest meditation option"
+            
+        return {
+            "type": "timed_meditation",
+            "meditation": meditation,
+            "category": category,
+            "message": message
+        }
+    
     def _parse_duration(self, duration_str: str) -> float:
         """
         Parse duration string (e.g., "10:00") to minutes.
@@ -581,20 +800,25 @@ class GuidedMeditation:
         except (ValueError, IndexError):
             return 10.0  # Default to 10 minutes
     
+    def _parse_duration_seconds(self, duration_str: str) -> int:
+        """
+        Parse duration string (e.g., "10:00") to whole seconds.
+        
+        Args:
+            duration_str: Duration string in format "MM:SS"
+            
+        Returns:
+            Duration in seconds
+        """
+        return round(self._parse_duration(duration_str) * 60)
+    
     def get_short_meditation(self) -> Dict[str, Any]:
         """Get a short meditation for quick practice."""
-        all_meditations = []
-        for category, meditations in self.meditations.items():
-            all_meditations.extend(meditations)
-        
         # Find meditations under 5 minutes
-        short_meditations = [
-            m for m in all_meditations 
-            if self._parse_duration(m["duration"]) <= 5
-        ]
+        cutoff = bisect.bisect_right(self._durations, 5 * 60)
         
-        if short_meditations:
-            meditation = random.choice(short_meditations)
+        if cutoff:
+            _, _, meditation = self._duration_index[random.randrange(cutoff)]
             return {
                 "type": "short_meditation",
                 "meditation": meditation,
@@ -602,13 +826,27 @@ class GuidedMeditation:
             }
         else:
             # Get the shortest meditation available
-            meditation = min(all_meditations, key=lambda m: self._parse_duration(m["duration"]))
+            _, _, meditation = self._duration_index[0]
             return {
                 "type": "short_meditation",
                 "meditation": meditation,
                 "message": "A brief meditation practice"
             }
 
+# Emotions mapped to BreathingExercises types (anything else gets "balancing")
+BREATHING_EMOTION_MAP = {
+    "anxiety": "calming",
+    "stress": "calming",
+    "fear": "grounding",
+    "panic": "emergency",
+    "anger": "balancing",
+    "frustration": "balancing",
+    "sadness": "balancing",
+    "tired": "energizing",
+    "fatigue": "energizing",
+    "neutral": "balancing"
+}
+
 
 class BreathingExercises:
     """Provides breathing exercises and techniques."""
@@ -622,9 +860,18 @@ class BreathingExercises:
         """
         self.resources_path = resources_path
         self.exercises = self._initialize_exercises()
+        self._exercise_table = {
+            (emotion, band): self._select_exercise(emotion, band)
+            for emotion in set(BREATHING_EMOTION_MAP) | set(ANALYZER_EMOTIONS)
+            for band in ("normal", "high")
+        }
         
     def _initialize_exercises(self) -> Dict[str, Dict[str, Any]]:
         """Initialize breathing exercises for different needs."""
+        catalog = _load_catalog(self.resources_path, "exercises.json")
+        if catalog is not None:
+            return _thaw(catalog)
+        
         return {
             "calming": {
                 "name": "4-7-8 Breathing",
@@ -697,6 +944,16 @@ class BreathingExercises:
             }
         }
     
+    def _select_exercise(self, emotion: str, band: str) -> Dict[str, Any]:
+        """Resolve the breathing exercise for an emotion and intensity band."""
+        # Determine exercise type, with emergency override for high intensity
+        if band == "high" and emotion in ["anxiety", "fear", "panic"]:
+            exercise_type = "emergency"
+        else:
+            exercise_type = BREATHING_EMOTION_MAP.get(emotion.lower(), "balancing")
+        
+        return self.exercises.get(exercise_type, self.exercises["balancing"])
+    
     def get_exercise(self, emotion: str, intensity: float = 0.5) -> Dict[str, Any]:
         """
         Get a breathing exercise based on emotional state.
@@ -708,27 +965,12 @@ class BreathingExercises:
         Returns:
             A breathing exercise recommendation
         """
-        # Map emotions to exercise types
-        emotion_map = {
-            "anxiety": "calming",
-            "stress": "calming",
-            "fear": "grounding",
-            "panic": "emergency",
-            "anger": "balancing",
-            "frustration": "balancing",
-            "sadness": "balancing",
-            "tired": "energizing",
-            "fatigue": "energizing",
-            "neutral": "balancing"
-        }
+        band = _intensity_band(intensity, 0.8)
+        exercise = self._exercise_table.get((emotion, band))
+        if exercise is None:
+            exercise = self._select_exercise(emotion, band)
         
-        # Determine exercise type, with emergency override for high intensity
-        if intensity > 0.8 and emotion in ["anxiety", "fear", "panic"]:
-            exercise_type = "emergency"
-        else:
-            exercise_type = emotion_map.get(emotion.lower(), "balancing")
-        
-        return self.exercises.get(exercise_type, self.exercises["balancing"])
+        return exercise
     
     def get_quick_exercise(self) -> Dict[str, Any]:
         """Get a quick breathing exercise for immediate use."""
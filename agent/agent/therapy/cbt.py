@@ -5,8 +5,22 @@ This module provides CBT techniques, exercises, and thought reframing strategies
 that can be used by the AI agent to deliver evidence-based therapeutic interventions.
 """
 
-from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple, Optional
+import hashlib
 import re
+import threading
+
+import numpy as np
+
+# Word tokenizer shared by the example index and text similarity
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Minimum similarity for a text to count as "like" an example, per mode
+DEFAULT_SIMILARITY_THRESHOLDS = {
+    "overlap": 0.5,
+    "embedding": 0.75
+}
 
 
 class CBTModule:
@@ -18,8 +32,37 @@ class CBTModule:
     and offering guided exercises for anxiety and depression.
     """
     
-    def __init__(self):
-        """Initialize the CBT module."""
+    def __init__(
+        self,
+        similarity_mode: str = "overlap",
+        embeddings: Optional[Any] = None,
+        embedding_provider: Optional[str] = None,
+        similarity_threshold: Optional[float] = None,
+        cache_size: int = 1024
+    ):
+        """
+        Initialize the CBT module.
+        
+        Args:
+            similarity_mode: How user text is compared to distortion examples,
+                'overlap' (word overlap) or 'embedding' (cosine similarity)
+            embeddings: Optional LangChain embeddings instance for 'embedding' mode;
+                created with LLMFactory.create_embeddings if not provided
+            embedding_provider: Optional provider passed to LLMFactory.create_embeddings
+            similarity_threshold: Minimum similarity to an example; defaults per mode
+            cache_size: Number of embedded inputs to keep in the similarity cache
+        """
+        if similarity_mode not in DEFAULT_SIMILARITY_THRESHOLDS:
+            raise ValueError(f"Unsupported similarity mode: {similarity_mode}")
+            
+        self.similarity_mode = similarity_mode
+        self.embeddings = embeddings
+        self.embedding_provider = embedding_provider
+        self.similarity_threshold = similarity_threshold
+        self.cache_size = cache_size
+        self._similarity_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
         # Common cognitive distortions with examples and reframing strategies
         self.cognitive_distortions = {
             "all-or-nothing": {
@@ -235,6 +278,162 @@ class CBTModule:
                 }
             ]
         }
+        
+        self._build_distortion_index()
+    
+    def _build_distortion_index(self):
+        """
+        Precompute the pattern matcher and example index used for detection.
+        
+        Call again after modifying cognitive_distortions.
+        """
+        # One matcher for every pattern. Matching inside a lookahead reports
+        # the longest pattern at each position, so patterns contained in a
+        # matched one are added back through _contained_patterns.
+        patterns = sorted(
+            {pattern for info in self.cognitive_distortions.values() for pattern in info["patterns"]},
+            key=len, reverse=True
+        )
+        self._pattern_matcher = re.compile(
+            "(?=(" + "|".join(re.escape(pattern) for pattern in patterns) + "))"
+        ) if patterns else None
+        self._contained_patterns = {
+            pattern: {other for other in patterns if other in pattern}
+            for pattern in patterns
+        }
+        
+        # Example token sets as a token -> examples posting matrix (CSR by token),
+        # so overlap with every example is one sparse matrix-vector product
+        self._examples = []
+        vocabulary = {}
+        postings = []
+        example_sizes = []
+        
+        for distortion, info in self.cognitive_distortions.items():
+            for example in info["examples"]:
+                example = example.lower()
+                tokens = set(TOKEN_PATTERN.findall(example))
+                example_index = len(self._examples)
+                self._examples.append((distortion, example))
+                example_sizes.append(len(tokens))
+                
+                for token in tokens:
+                    if token not in vocabulary:
+                        vocabulary[token] = len(postings)
+                        postings.append([])
+                    postings[vocabulary[token]].append(example_index)
+        
+        self._vocabulary = vocabulary
+        self._posting_offsets = np.cumsum([0] + [len(p) for p in postings], dtype=np.int64)
+        self._posting_examples = np.array(
+            [example_index for p in postings for example_index in p], dtype=np.int64
+        )
+        self._example_sizes = np.array(example_sizes, dtype=np.int64)
+        
+        with self._cache_lock:
+            self._similarity_cache.clear()
+        if self.similarity_mode == "embedding":
+            self._build_embedding_index()
+    
+    def _build_embedding_index(self):
+        """Embed every distortion example once into a normalized float32 matrix."""
+        try:
+            if self.embeddings is None:
+                from agent.llm_factory import LLMFactory
+                self.embeddings = LLMFactory.create_embeddings(self.embedding_provider)
+                
+            vectors = np.asarray(
+                self.embeddings.embed_documents([example for _, example in self._examples]),
+                dtype=np.float32
+            )
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._example_matrix = vectors / np.where(norms == 0, 1.0, norms)
+        except Exception as e:
+            print(f"Error building embedding index, falling back to word overlap: {e}")
+            self.similarity_mode = "overlap"
+            self._example_matrix = None
+    
+    def _embedding_similarities(self, text: str) -> np.ndarray:
+        """
+        Cosine similarity of the text against every indexed example.
+        
+        Results are cached by a hash of the text.
+        
+        Args:
+            text: The lowercased user text
+            
+        Returns:
+            Array of similarity scores, one per example
+        """
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            if key in self._similarity_cache:
+                self._similarity_cache.move_to_end(key)
+                return self._similarity_cache[key]
+            
+        query = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            similarities = np.zeros(len(self._examples), dtype=np.float32)
+        else:
+            similarities = self._example_matrix @ (query / norm)
+        
+        with self._cache_lock:
+            self._similarity_cache[key] = similarities
+            if len(self._similarity_cache) > self.cache_size:
+                self._similarity_cache.popitem(last=False)
+        return similarities
+    
+    def _match_patterns(self, text: str) -> set:
+        """Return every distortion pattern that occurs in the (lowercased) text."""
+        if self._pattern_matcher is None:
+            return set()
+            
+        matched = set()
+        for match in self._pattern_matcher.finditer(text):
+            pattern = match.group(1)
+            if pattern not in matched:
+                matched |= self._contained_patterns[pattern]
+        return matched
+    
+    def _example_similarities(self, text: str) -> Tuple[np.ndarray, str]:
+        """
+        Similarity of the text against every indexed example.
+        
+        In 'overlap' mode this matches _calculate_text_similarity for each example.
+        
+        Args:
+            text: The lowercased user text
+            
+        Returns:
+            Tuple of (similarity scores, one per example, and the mode that
+            produced them; 'overlap' if embedding the text failed)
+        """
+        if self.similarity_mode == "embedding" and text.strip():
+            try:
+                return self._embedding_similarities(text), "embedding"
+            except Exception as e:
+                print(f"Error embedding text, using word overlap: {e}")
+        
+        similarities = np.zeros(len(self._examples))
+        words = set(TOKEN_PATTERN.findall(text))
+        
+        if not words or not self._examples:
+            return similarities, "overlap"
+            
+        token_ids = [self._vocabulary[word] for word in words if word in self._vocabulary]
+        if token_ids:
+            rows = [
+                self._posting_examples[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+                for i in token_ids
+            ]
+            overlap = np.bincount(np.concatenate(rows), minlength=len(self._examples))
+            # Examples without any tokens score 0, as in _calculate_text_similarity
+            has_tokens = self._example_sizes > 0
+            similarities[has_tokens] = overlap[has_tokens] / np.maximum(
+                len(words), self._example_sizes[has_tokens]
+            )
+        return similarities, "overlap"
     
     def detect_cognitive_distortions(self, text: str) -> List[Dict]:
         """
@@ -249,23 +448,32 @@ class CBTModule:
         text = text.lower()
         detected = []
         
+        matched_patterns = self._match_patterns(text)
+        similar_examples = {}
+        similarities, mode = self._example_similarities(text)
+        # A configured threshold is for the configured mode, not the overlap fallback
+        threshold = self.similarity_threshold
+        if threshold is None or mode != self.similarity_mode:
+            threshold = DEFAULT_SIMILARITY_THRESHOLDS[mode]
+        
+        for index in np.flatnonzero(similarities > threshold):
+            distortion, example = self._examples[index]
+            similar_examples.setdefault(distortion, []).append(example)
+        
         for distortion, info in self.cognitive_distortions.items():
             confidence = 0.0
             matches = []
             
             # Check for pattern matches
             for pattern in info["patterns"]:
-                if pattern in text:
+                if pattern in matched_patterns:
                     confidence += 0.2
                     matches.append(pattern)
             
             # Check for example-like statements (more weight)
-            for example in info["examples"]:
-                example = example.lower()
-                similarity = self._calculate_text_similarity(text, example)
-                if similarity > 0.5:
-                    confidence += 0.3
-                    matches.append(f"Similar to: {example}")
+            for example in similar_examples.get(distortion, []):
+                confidence += 0.3
+                matches.append(f"Similar to: {example}")
             
             # If we found matches, add to detected list
             if matches and confidence > 0.2:
@@ -373,8 +581,8 @@ class CBTModule:
             Similarity score between 0 and 1
         """
         # Simple word overlap similarity
-        words1 = set(re.findall(r'\w+', text1.lower()))
-        words2 = set(re.findall(r'\w+', text2.lower()))
+        words1 = set(TOKEN_PATTERN.findall(text1.lower()))
+        words2 = set(TOKEN_PATTERN.findall(text2.lower()))
         
         if not words1 or not words2:
             return 0.0
@@ -0,0 +1,246 @@
+"""
+Mood chart rendering off the request path.
+
+Charts are drawn by render_chart() with matplotlib's object-oriented API on
+an Agg canvas (no pyplot, so no global figure state and no GUI backend), in
+worker processes of a ChartRenderer; matplotlib is only imported there.
+Rendered PNG/SVG files are cached on disk by (user, report type, data
+version), in a directory named by a hash of the user ID (so no ID can
+escape the cache directory or share another user's), where the data
+version is a digest of the chart's series, so a chart is redrawn only when
+its data (or the day) changes and concurrent requests for the same chart
+share one render.
+
+chart_data() gives the series themselves as JSON-ready dicts, for clients
+that draw charts themselves.
+
+Settings (environment):
+    CHART_CACHE_DIR   cache directory (default ./data/charts)
+    CHART_WORKERS     rendering processes (default 2)
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from agent.tracking.engine import MoodSeries
+from agent.tracking.timeseries import period_report
+
+REPORT_DAYS = {"weekly": 7, "monthly": 30}
+REPORT_TYPES = ("daily",) + tuple(REPORT_DAYS)
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+DEFAULT_CACHE_DIR = "./data/charts"
+
+
+def chart_data(series: MoodSeries, report_type: str = "weekly", today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    The series a chart plots.
+
+    Args:
+        series: The mood history
+        report_type: "daily" (today's entries), "weekly" or "monthly" (daily means)
+        today: Day the chart ends on; defaults to today
+
+    Returns:
+        {"type", "title", "labels", "valence", "intensity", ...}; valence and
+        intensity have None where a day has no entries
+
+    Raises:
+        ValueError: If the report type is unknown
+    """
+    today = today or date.today()
+    if report_type == "daily":
+        rows = series.on_day(today)
+        return {
+            "type": "daily",
+            "title": "Today's Mood",
+            "date": today.isoformat(),
+            "labels": [datetime.fromtimestamp(ts).strftime("%H:%M") for ts in series.timestamps[rows].tolist()],
+            "valence": series.valences[rows].tolist(),
+            "intensity": series.intensities[rows].tolist(),
+            "emotions": [series.emotions[i] for i in series.emotion_ids[rows].tolist()],
+        }
+    if report_type not in REPORT_DAYS:
+        raise ValueError(f"Unknown report type: {report_type} (expected one of {', '.join(REPORT_TYPES)})")
+
+    report = period_report(series, REPORT_DAYS[report_type], today)
+    return {
+        "type": report_type,
+        "title": f"{report_type.capitalize()} Mood Tracking",
+        "start": report["start"],
+        "end": report["end"],
+        "labels": report["days"],
+        "valence": report["daily_valence"],
+        "intensity": report["daily_intensity"],
+        "rolling_valence": report["rolling_valence"],
+        "counts": report["daily_counts"],
+        "trend": report["trend"],
+    }
+
+
+def data_version(data: Dict[str, Any]) -> str:
+    """Digest of chart data; changes whenever the chart would."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _floats(values) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def render_chart(data: Dict[str, Any], fmt: str = "png") -> bytes:
+    """
+    Draw chart data (from chart_data) as PNG or SVG.
+
+    Runs in renderer worker processes, but can be called directly.
+    """
+    # Imported here so only rendering processes load matplotlib
+    from io import BytesIO
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    x = np.arange(len(data["labels"]))
+    valence = _floats(data["valence"])
+
+    # Plot valence line, with gaps on days without entries
+    ax.plot(x, valence, marker='o', linewidth=2, label="Mood Valence")
+    if data.get("rolling_valence"):
+        ax.plot(x, _floats(data["rolling_valence"]), linestyle="--", linewidth=1, label="Rolling average")
+
+    # Add intensity as area
+    ax.fill_between(x, np.nan_to_num(_floats(data["intensity"])), alpha=0.2, color="orange", label="Intensity")
+
+    # Add labels and title
+    ax.set_xticks(x)
+    ax.set_xticklabels(data["labels"], rotation=45 if len(x) > 10 else 0, ha="right" if len(x) > 10 else "center")
+    ax.set_xlabel("Time" if data["type"] == "daily" else "Date")
+    ax.set_ylabel("Valence (-1 to +1)")
+    ax.set_title(data["title"])
+    ax.grid(True, linestyle="--", alpha=0.7)
+    ax.legend()
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _user_dir(user_id: str) -> str:
+    """Cache directory name of a user: a hash, so any ID is a safe and distinct path component."""
+    return hashlib.sha256(user_id.encode()).hexdigest()[:32]
+
+
+class ChartRenderer:
+    """
+    Renders charts in a process pool, caching the files on disk.
+
+    Thread-safe; use one per process (see get_renderer).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, workers: int = 2):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[Tuple[str, str, str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, user_id: str, report_type: str, version: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, _user_dir(user_id), f"{report_type}-{version}.{fmt}")
+
+    def submit(self, user_id: str, data: Dict[str, Any], fmt: str = "png") -> Future:
+        """
+        Start rendering a chart, or reuse a cached or in-flight render.
+
+        Args:
+            user_id: Whose chart it is
+            data: Chart data from chart_data
+            fmt: "png" or "svg"
+
+        Returns:
+            Future of the file's bytes
+
+        Raises:
+            ValueError: If the format is unknown
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown chart format: {fmt} (expected one of {', '.join(FORMATS)})")
+        version = data_version(data)
+        key = (user_id, data["type"], version, fmt)
+        path = self._path(*key)
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            try:
+                with open(path, "rb") as f:
+                    future = Future()
+                    future.set_result(f.read())
+                    return future
+            except OSError:
+                pass
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._pool.submit(render_chart, data, fmt)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._store(key, path, done))
+        return future
+
+    def _store(self, key: Tuple[str, str, str, str], path: str, future: Future):
+        """Write a finished render to the cache, replacing older versions of the chart."""
+        try:
+            if not future.cancelled() and future.exception() is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                for old_path in glob.glob(os.path.join(os.path.dirname(path), f"{key[1]}-*.{key[3]}")):
+                    os.remove(old_path)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(future.result())
+                os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error caching chart {path}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def render(self, user_id: str, data: Dict[str, Any], fmt: str = "png", timeout: Optional[float] = None) -> bytes:
+        """Render a chart, waiting for the result."""
+        return self.submit(user_id, data, fmt).result(timeout)
+
+    async def render_async(self, user_id: str, data: Dict[str, Any], fmt: str = "png") -> bytes:
+        """Render a chart without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(user_id, data, fmt))
+
+    def close(self):
+        """Shut the worker processes down."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+_renderer: Optional[ChartRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> ChartRenderer:
+    """Shared renderer, configured from the environment."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer(
+                os.environ.get("CHART_CACHE_DIR", DEFAULT_CACHE_DIR),
+                int(os.environ.get("CHART_WORKERS", "2"))
+            )
+        return _renderer
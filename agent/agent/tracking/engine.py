@@ -0,0 +1,275 @@
+"""
+Columnar mood history shared by both mood trackers.
+
+agent.mood_tracking.MoodTracker (the chat workflow's tracker) and
+agent.tracking.mood.MoodTracker store entries in different shapes: the
+first calls the emotion "mood" and keeps the local date, the second calls it
+"emotion". MoodSeries holds either kind as parallel numpy arrays (timestamp,
+day, valence, intensity, emotion id and trigger ids), so their summaries,
+distributions and trigger counts are array operations over a selection of
+rows instead of loops over entry dicts. Entries are appended in amortized
+constant time as they are recorded.
+
+Emotions and triggers are interned: the arrays hold integer ids into
+MoodSeries.emotions / MoodSeries.triggers.
+
+A series is an index over the entries, not a replacement for them: the
+trackers still keep their entry dicts, which they save to JSON and return
+from history queries, so every entry is held twice. The columns add about
+40 bytes per entry to the dicts' memory.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def entry_emotion(entry: Dict[str, Any]) -> str:
+    """The emotion of an entry from either tracker."""
+    # The session tracker calls it "mood", the other tracker "emotion"
+    emotion = entry.get("emotion", entry.get("mood"))
+    return emotion if isinstance(emotion, str) else str(emotion)
+
+
+class MoodSeries:
+    """
+    Mood entries as parallel arrays.
+
+    The column properties are views of the first len(series) rows; they stay
+    valid until the next append.
+    """
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(1, capacity)
+        self._size = 0
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._days = np.zeros(capacity, dtype=np.int32)
+        self._valences = np.zeros(capacity, dtype=np.float64)
+        self._intensities = np.zeros(capacity, dtype=np.float64)
+        self._emotion_ids = np.zeros(capacity, dtype=np.int32)
+        # Triggers of row i are _trigger_ids[_trigger_offsets[i]:_trigger_offsets[i + 1]]
+        self._trigger_offsets = np.zeros(capacity + 1, dtype=np.int32)
+        self._trigger_ids = np.zeros(capacity, dtype=np.int32)
+        self.emotions: List[str] = []
+        self.triggers: List[str] = []
+        self._emotion_index: Dict[str, int] = {}
+        self._trigger_index: Dict[str, int] = {}
+        # Whether rows are in time / day order (as when recorded live), so
+        # ranges can be found by binary search
+        self._times_sorted = True
+        self._days_sorted = True
+
+    @classmethod
+    def from_entries(cls, entries: Sequence[Dict[str, Any]]) -> "MoodSeries":
+        """Build a series from entries of either tracker, in order."""
+        series = cls(capacity=len(entries))
+        for entry in entries:
+            series.append_entry(entry)
+        return series
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the columns (including spare capacity), not by the entries they were built from."""
+        return sum(getattr(self, name).nbytes for name in (
+            "_timestamps", "_days", "_valences", "_intensities", "_emotion_ids", "_trigger_offsets", "_trigger_ids"
+        ))
+
+    # Columns
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """POSIX timestamps."""
+        return self._timestamps[:self._size]
+
+    @property
+    def days(self) -> np.ndarray:
+        """Proleptic ordinals (date.toordinal) of the entries' local dates."""
+        return self._days[:self._size]
+
+    @property
+    def valences(self) -> np.ndarray:
+        return self._valences[:self._size]
+
+    @property
+    def intensities(self) -> np.ndarray:
+        return self._intensities[:self._size]
+
+    @property
+    def emotion_ids(self) -> np.ndarray:
+        return self._emotion_ids[:self._size]
+
+    # Appending
+
+    def _intern(self, value: str, values: List[str], index: Dict[str, int]) -> int:
+        value_id = index.get(value)
+        if value_id is None:
+            value_id = index[value] = len(values)
+            values.append(value)
+        return value_id
+
+    def _grow(self, rows: int, trigger_count: int):
+        if self._size + rows > len(self._timestamps):
+            capacity = max(len(self._timestamps) * 3 // 2, self._size + rows)
+            for name in ("_timestamps", "_days", "_valences", "_intensities", "_emotion_ids"):
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                setattr(self, name, grown)
+            offsets = np.zeros(capacity + 1, dtype=np.int32)
+            offsets[:self._size + 1] = self._trigger_offsets[:self._size + 1]
+            self._trigger_offsets = offsets
+        used = self._trigger_offsets[self._size]
+        if used + trigger_count > len(self._trigger_ids):
+            grown = np.zeros(max(len(self._trigger_ids) * 3 // 2, used + trigger_count), dtype=np.int32)
+            grown[:used] = self._trigger_ids[:used]
+            self._trigger_ids = grown
+
+    def append(
+        self,
+        timestamp: datetime,
+        emotion: str,
+        valence: float,
+        intensity: float,
+        triggers: Iterable[str] = (),
+        day: Optional[date] = None
+    ) -> int:
+        """
+        Append one entry.
+
+        Args:
+            timestamp: When it was recorded
+            emotion: The emotion
+            valence: Positive/negative value
+            intensity: Strength of the emotion
+            triggers: Triggers of the emotion
+            day: Local date the entry counts for; defaults to the timestamp's date
+
+        Returns:
+            The new row's index
+        """
+        trigger_ids = [self._intern(trigger, self.triggers, self._trigger_index) for trigger in triggers]
+        self._grow(1, len(trigger_ids))
+        row = self._size
+        self._timestamps[row] = timestamp.timestamp()
+        self._days[row] = (day or timestamp.date()).toordinal()
+        if row:
+            self._times_sorted = self._times_sorted and self._timestamps[row] >= self._timestamps[row - 1]
+            self._days_sorted = self._days_sorted and self._days[row] >= self._days[row - 1]
+        self._valences[row] = valence
+        self._intensities[row] = intensity
+        self._emotion_ids[row] = self._intern(emotion, self.emotions, self._emotion_index)
+        start = self._trigger_offsets[row]
+        self._trigger_ids[start:start + len(trigger_ids)] = trigger_ids
+        self._trigger_offsets[row + 1] = start + len(trigger_ids)
+        self._size += 1
+        return row
+
+    def append_entry(self, entry: Dict[str, Any]) -> int:
+        """Append an entry dict of either tracker."""
+        timestamp = datetime.fromisoformat(entry["timestamp"])
+        day = date.fromisoformat(entry["date"]) if entry.get("date") else None
+        return self.append(
+            timestamp,
+            entry_emotion(entry),
+            entry.get("valence") or 0.0,
+            entry.get("intensity") or 0.0,
+            entry.get("triggers") or (),
+            day
+        )
+
+    # Selection
+
+    def since(self, timestamp: float) -> np.ndarray:
+        """Rows recorded at or after a POSIX timestamp."""
+        if self._times_sorted:
+            return np.arange(np.searchsorted(self.timestamps, timestamp), self._size)
+        return np.flatnonzero(self.timestamps >= timestamp)
+
+    def day_range(self, first_day: date, last_day: Optional[date] = None) -> np.ndarray:
+        """Rows whose local date is from `first_day` to `last_day` (inclusive; open-ended if None)."""
+        first, last = first_day.toordinal(), last_day.toordinal() if last_day else None
+        if self._days_sorted:
+            end = self._size if last is None else np.searchsorted(self.days, last, side="right")
+            return np.arange(np.searchsorted(self.days, first), end)
+        mask = self.days >= first
+        if last is not None:
+            mask &= self.days <= last
+        return np.flatnonzero(mask)
+
+    def on_or_after_day(self, day: date) -> np.ndarray:
+        """Rows whose local date is on or after `day`."""
+        return self.day_range(day)
+
+    def on_day(self, day: date) -> np.ndarray:
+        """Rows whose local date is `day`."""
+        return self.day_range(day, day)
+
+    def newest_first(self) -> np.ndarray:
+        """All rows by timestamp, newest first; rows with equal timestamps keep their order."""
+        return np.argsort(-self.timestamps, kind="stable")
+
+    # Aggregates over a selection of rows (in the given order)
+
+    def emotion_counts(self, rows: np.ndarray) -> List[Tuple[str, int]]:
+        """
+        How often each emotion occurs in the rows.
+
+        Returns:
+            (emotion, count) pairs in order of first occurrence in `rows`
+        """
+        return self._counts(self.emotion_ids[rows], self.emotions)
+
+    def dominant_emotion(self, rows: np.ndarray) -> Optional[str]:
+        """The most frequent emotion in the rows; ties go to the one occurring first."""
+        counts = self.emotion_counts(rows)
+        return max(counts, key=lambda item: item[1])[0] if counts else None
+
+    def trigger_counts(self, rows: np.ndarray) -> List[Tuple[str, int]]:
+        """
+        How often each trigger occurs in the rows.
+
+        Returns:
+            (trigger, count) pairs in order of first occurrence in `rows`
+        """
+        offsets = self._trigger_offsets
+        starts, ends = offsets[rows], offsets[np.asarray(rows) + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return []
+        # Positions of every selected row's triggers in _trigger_ids, row by row
+        positions = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(lengths.sum())
+        return self._counts(self._trigger_ids[positions], self.triggers)
+
+    @staticmethod
+    def _counts(ids: np.ndarray, names: List[str]) -> List[Tuple[str, int]]:
+        if not len(ids):
+            return []
+        unique, first, counts = np.unique(ids, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return [(names[unique[i]], int(counts[i])) for i in order]
+
+    def daily_means(self, rows: np.ndarray, first_day: date, days: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mean valence and intensity per day of a date range.
+
+        Args:
+            rows: Rows to include (outside the range they are ignored)
+            first_day: First day of the range
+            days: Number of days
+
+        Returns:
+            (valence means, intensity means, entry counts), one value per day;
+            days without entries have means of 0
+        """
+        offsets = self.days[rows] - first_day.toordinal()
+        in_range = (offsets >= 0) & (offsets < days)
+        offsets, rows = offsets[in_range], np.asarray(rows)[in_range]
+        counts = np.bincount(offsets, minlength=days)
+        divisor = np.maximum(counts, 1)
+        valences = np.bincount(offsets, weights=self.valences[rows], minlength=days) / divisor
+        intensities = np.bincount(offsets, weights=self.intensities[rows], minlength=days) / divisor
+        return valences, intensities, counts
@@ -10,6 +10,10 @@ from datetime import datetime
 import json
 import os
 
+from agent.storage.user_store import get_user_store, TRACKER_SOURCE
+from agent.tracking.engine import MoodSeries
+from agent.tracking.timeseries import period_report
+
 
 class MoodTracker:
     """
@@ -19,17 +23,22 @@ class MoodTracker:
     recommendations based on observed mood trends.
     """
     
-    def __init__(self, user_id: str, storage_dir: str = "./data"):
+    def __init__(self, user_id: str, storage_dir: str = "./data", store=None):
         """
         Initialize the mood tracker.
         
         Args:
             user_id: Unique identifier for the user
             storage_dir: Directory to store mood tracking data
+            store: Optional user data store; defaults to the configured store,
+                or a per-user JSON file in storage_dir if none is configured
         """
         self.user_id = user_id
         self.storage_dir = storage_dir
+        self.store = store if store is not None else get_user_store()
         self.mood_data = self._load_mood_data()
+        # Columnar copy of the entries for summaries, kept alongside them
+        self.series = MoodSeries.from_entries(self.mood_data)
         
         # Emotional valence mapping (positive/negative/neutral)
         self.emotion_valence = {
@@ -80,6 +89,9 @@ class MoodTracker:
         Returns:
             List of mood entries
         """
+        if self.store is not None:
+            return self.store.get_mood_entries(self.user_id, TRACKER_SOURCE)
+        
         # Create directory if it doesn't exist
         os.makedirs(self.storage_dir, exist_ok=True)
         
@@ -137,9 +149,13 @@ class MoodTracker:
         
         # Add to mood data
         self.mood_data.append(entry)
+        self.series.append_entry(entry)
         
         # Save to storage
-        self._save_mood_data()
+        if self.store is not None:
+            self.store.add_mood_entry(self.user_id, TRACKER_SOURCE, entry)
+        else:
+            self._save_mood_data()
         
         return entry
     
@@ -153,11 +169,7 @@ class MoodTracker:
         Returns:
             List of recent mood entries
         """
-        return sorted(
-            self.mood_data, 
-            key=lambda x: x["timestamp"], 
-            reverse=True
-        )[:limit]
+        return [self.mood_data[i] for i in self.series.newest_first()[:limit]]
     
     def get_mood_summary(self, days: int = 7) -> Dict[str, Any]:
         """
@@ -176,61 +188,40 @@ class MoodTracker:
         ).timestamp() - (days * 86400)
         
         # Filter entries within timeframe
-        recent_entries = [
-            entry for entry in self.mood_data
-            if datetime.fromisoformat(entry["timestamp"]).timestamp() >= cutoff
-        ]
+        rows = self.series.since(cutoff)
         
-        if not recent_entries:
+        if not len(rows):
             return {
                 "period": f"Last {days} days",
                 "entries_count": 0,
                 "message": "No mood data recorded in this period."
             }
         
-        # Calculate statistics
-        emotions = [entry["emotion"] for entry in recent_entries]
-        valences = [entry["valence"] for entry in recent_entries]
-        triggers = []
-        for entry in recent_entries:
-            if "triggers" in entry and entry["triggers"]:
-                triggers.extend(entry["triggers"])
-        
-        # Count emotions
-        emotion_counts = {}
-        for emotion in emotions:
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        # Find dominant emotion
-        dominant_emotion = max(emotion_counts.items(), key=lambda x: x[1])[0]
-        
-        # Count triggers
-        trigger_counts = {}
-        for trigger in triggers:
-            trigger_counts[trigger] = trigger_counts.get(trigger, 0) + 1
+        # Count emotions and find the dominant one
+        emotion_counts = dict(self.series.emotion_counts(rows))
+        dominant_emotion = self.series.dominant_emotion(rows)
         
         # Find common triggers
         common_triggers = sorted(
-            trigger_counts.items(), 
-            key=lambda x: x[1], 
+            self.series.trigger_counts(rows),
+            key=lambda x: x[1],
             reverse=True
         )[:3]
         
         # Calculate average valence (positive/negative balance)
-        avg_valence = sum(valences) / len(valences) if valences else 0
+        valences = self.series.valences[rows]
+        avg_valence = float(valences.mean())
         
         # Detect trends
         is_improving = False
         if len(valences) >= 3:
             # Simple trend detection - average of first half vs second half
             mid_point = len(valences) // 2
-            first_half_avg = sum(valences[:mid_point]) / mid_point if mid_point > 0 else 0
-            second_half_avg = sum(valences[mid_point:]) / (len(valences) - mid_point) if (len(valences) - mid_point) > 0 else 0
-            is_improving = second_half_avg > first_half_avg
+            is_improving = bool(valences[mid_point:].mean() > valences[:mid_point].mean())
         
         return {
             "period": f"Last {days} days",
-            "entries_count": len(recent_entries),
+            "entries_count": len(rows),
             "dominant_emotion": dominant_emotion,
             "emotion_distribution": emotion_counts,
             "average_valence": avg_valence,
@@ -239,6 +230,19 @@ class MoodTracker:
             "is_improving": is_improving
         }
     
+    def get_mood_trends(self, days: int = 30) -> Dict[str, Any]:
+        """
+        Day-by-day mood analytics for a period ending today.
+        
+        Args:
+            days: Number of days to include
+            
+        Returns:
+            Daily valence means, rolling mean, trend slope and volatility
+            (see agent.tracking.timeseries.period_report)
+        """
+        return period_report(self.series, days=days)
+    
     def get_insights(self) -> List[str]:
         """
         Generate insights about mood patterns.
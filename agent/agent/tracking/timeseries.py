@@ -0,0 +1,150 @@
+"""
+Time-series analytics over a MoodSeries.
+
+Reports group a period's entries by local day in one bincount, then derive
+everything else from the per-day arrays:
+
+- rolling means of daily valence (over the days that have entries)
+- a least-squares trend slope of daily valence, in valence per day
+- volatility: the standard deviation of daily valence and its RMSSD (root
+  mean square of successive differences, the usual measure of mood
+  instability in experience-sampling research)
+
+With entries recorded in time order the period is found by binary search,
+so a weekly or monthly report is a fixed handful of array operations (a few
+hundred microseconds) however many years of history the series holds.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from agent.tracking.engine import MoodSeries
+
+# Daily-valence slope (per day) above which a period counts as improving or declining
+TREND_SLOPE_THRESHOLD = 0.05
+
+# Rolling-mean window (days) per report length
+ROLLING_WINDOWS = {7: 3, 30: 7}
+
+
+def daily_groups(series: MoodSeries, rows: np.ndarray, first_day: date, days: int) -> Dict[str, np.ndarray]:
+    """
+    Group rows by local day.
+
+    Args:
+        series: The mood history
+        rows: Rows to group (rows outside the range are ignored)
+        first_day: First day of the range
+        days: Number of days
+
+    Returns:
+        {"counts", "valence", "intensity"}, one value per day; the means are
+        NaN for days without entries
+    """
+    valences, intensities, counts = series.daily_means(rows, first_day, days)
+    empty = counts == 0
+    valences[empty] = np.nan
+    intensities[empty] = np.nan
+    return {"counts": counts, "valence": valences, "intensity": intensities}
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over `window` positions, skipping NaNs.
+
+    Returns:
+        One mean per position; NaN where the window holds no values
+    """
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    window_counts = counts[ends] - counts[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, (sums[ends] - sums[starts]) / window_counts, np.nan)
+
+
+def trend_slope(values: np.ndarray) -> Optional[float]:
+    """
+    Least-squares slope of values against their position, skipping NaNs.
+
+    Returns:
+        Change per position, or None with fewer than two values
+    """
+    x = np.flatnonzero(~np.isnan(values))
+    if len(x) < 2:
+        return None
+    y = values[x]
+    x_centered = x - x.mean()
+    return float(np.dot(x_centered, y - y.mean()) / np.dot(x_centered, x_centered))
+
+
+def volatility(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    Spread of values (NaNs skipped).
+
+    Returns:
+        {"std", "rmssd"}; RMSSD uses successive values present, and either is
+        None without enough values
+    """
+    present = values[~np.isnan(values)]
+    return {
+        "std": float(present.std()) if len(present) else None,
+        "rmssd": float(np.sqrt(np.mean(np.diff(present) ** 2))) if len(present) > 1 else None,
+    }
+
+
+def _json_values(values: np.ndarray) -> List[Optional[float]]:
+    """Floats for JSON, with None for NaN."""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def period_report(series: MoodSeries, days: int = 7, end_day: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Analytics of the `days` days ending on `end_day` (default today).
+
+    Args:
+        series: The mood history
+        days: Length of the period
+        end_day: Last day of the period
+
+    Returns:
+        Report with the period's days, entry count, daily valence/intensity
+        means (None for days without entries), rolling mean of valence, trend
+        slope and direction, volatility and emotion distribution
+    """
+    end_day = end_day or date.today()
+    first_day = end_day - timedelta(days=days - 1)
+    rows = series.day_range(first_day, end_day)
+    groups = daily_groups(series, rows, first_day, days)
+    valence = groups["valence"]
+
+    slope = trend_slope(valence)
+    trend = "stable"
+    if slope is not None and slope > TREND_SLOPE_THRESHOLD:
+        trend = "improving"
+    elif slope is not None and slope < -TREND_SLOPE_THRESHOLD:
+        trend = "declining"
+    window = ROLLING_WINDOWS.get(days, max(1, days // 4))
+
+    emotion_counts = series.emotion_counts(rows)
+    return {
+        "start": first_day.isoformat(),
+        "end": end_day.isoformat(),
+        "days": np.arange(np.datetime64(first_day), np.datetime64(end_day) + 1).astype(str).tolist(),
+        "entry_count": len(rows),
+        "daily_counts": groups["counts"].tolist(),
+        "daily_valence": _json_values(valence),
+        "daily_intensity": _json_values(groups["intensity"]),
+        "rolling_valence": _json_values(rolling_mean(valence, window)),
+        "rolling_window": window,
+        "average_valence": float(series.valences[rows].mean()) if len(rows) else None,
+        "trend_slope": slope,
+        "trend": trend,
+        "volatility": volatility(valence),
+        "emotion_distribution": dict(emotion_counts),
+        "dominant_emotion": max(emotion_counts, key=lambda item: item[1])[0] if emotion_counts else None,
+    }
@@ -1,14 +1,18 @@
 from typing import TypedDict, List, Optional, Dict, Any
+import time
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, END
 from transformers import pipeline  # For emotional analysis
 
 from agent.memory import MemoryManager
 from agent.llm_factory import LLMFactory
-from agent.emotion_analysis import EmotionAnalyzer
+from agent.model_server import get_emotion_analyzer
 from agent.mood_tracking import MoodTracker
 from agent.therapeutic_modalities import TherapeuticModalities
 from agent.engagement.gamification import GamificationSystem
+from agent.engagement.leaderboard import get_leaderboard
+from agent import observability
+from agent.observability import traced_node
 
 
 class AgentState(TypedDict):
@@ -37,28 +41,30 @@ class MentalHealthAgent:
         self.memory = MemoryManager(provider=provider)
         
         # Initialize enhanced components
-        self.emotion_analyzer = EmotionAnalyzer(
+        # Shared across agents, or served by the model server when one is configured
+        self.emotion_analyzer = get_emotion_analyzer(
             offline_mode=False,  # Try online first, fallback to offline
             cache_dir="./cached_models"
         )
         
         self.mood_tracker = MoodTracker(user_id=user_id)
         self.therapeutic_modalities = TherapeuticModalities()
-        self.gamification = GamificationSystem(user_id=user_id)
+        # Profiles are saved write-behind; a chat turn records one or more activities
+        self.gamification = GamificationSystem(user_id=user_id, write_behind=True, leaderboard=get_leaderboard())
         
         self.workflow = self._build_enhanced_workflow()
 
     def _build_enhanced_workflow(self):
         workflow = StateGraph(AgentState)
 
-        # Enhanced node sequence
-        workflow.add_node("safety_check", self.safety_check)
-        workflow.add_node("emotional_assessment", self.emotional_assessment)
-        workflow.add_node("mood_tracking", self.track_mood)
-        workflow.add_node("therapy_recommendations", self.generate_recommendations)
-        workflow.add_node("clinical_response", self.generate_clinical_response)
-        workflow.add_node("update_gamification_node", self.update_gamification)
-        workflow.add_node("escalate", self.escalate_with_resources)
+        # Enhanced node sequence, each node timed and traced
+        workflow.add_node("safety_check", traced_node("safety_check", self.safety_check))
+        workflow.add_node("emotional_assessment", traced_node("emotional_assessment", self.emotional_assessment))
+        workflow.add_node("mood_tracking", traced_node("mood_tracking", self.track_mood))
+        workflow.add_node("therapy_recommendations", traced_node("therapy_recommendations", self.generate_recommendations))
+        workflow.add_node("clinical_response", traced_node("clinical_response", self.generate_clinical_response))
+        workflow.add_node("update_gamification_node", traced_node("update_gamification_node", self.update_gamification))
+        workflow.add_node("escalate", traced_node("escalate", self.escalate_with_resources))
 
         # Define the enhanced workflow path
         workflow.set_entry_point("safety_check")
@@ -80,6 +86,9 @@ class MentalHealthAgent:
 
     def safety_check(self, state: AgentState):
         """Enhanced safety check with PII filtering and crisis keyword check"""
+        # Every turn enters here, so this is where turns are counted (the
+        # denominator of the escalation rate)
+        observability.CHAT_TURNS.inc()
         text = state["user_input"].lower()
         crisis_keywords = {
             "suicide", "kill myself", "end it all",
@@ -201,16 +210,24 @@ class MentalHealthAgent:
         ])
 
         chain = prompt | self.llm
+        provider = self.provider or self.llm._llm_type
         
         try:
-            response = chain.invoke({
-                "user_input": state["user_input"],
-                "emotional_state": emotional_state,
-                "context": context,
-                "therapeutic_recommendations": self._format_recommendations(therapeutic_recommendations),
-                "mood_insights": self._format_insights(mood_insights),
-                "conversation_history": self.memory.get_history()
-            })
+            start = time.perf_counter()
+            try:
+                with observability.span("llm.invoke", provider=provider):
+                    response = chain.invoke({
+                        "user_input": state["user_input"],
+                        "emotional_state": emotional_state,
+                        "context": context,
+                        "therapeutic_recommendations": self._format_recommendations(therapeutic_recommendations),
+                        "mood_insights": self._format_insights(mood_insights),
+                        "conversation_history": self.memory.get_history()
+                    })
+            except Exception:
+                observability.record_llm_call(provider, time.perf_counter() - start, error=True)
+                raise
+            observability.record_llm_call(provider, time.perf_counter() - start, response)
 
             # Store interaction with emotional metadata
             self.memory.save_conversation(
@@ -306,6 +323,7 @@ class MentalHealthAgent:
         
         # Record this important interaction in the gamification system
         self.gamification.record_activity("crisis_support", {"emotion": emotion})
+        observability.ESCALATIONS.inc(emotion=emotion)
         
         return {
             "response": full_message,
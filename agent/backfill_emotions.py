@@ -0,0 +1,338 @@
+"""
+Re-score the emotion of every stored mood entry.
+
+After upgrading the emotion model, run this to re-analyze the `context` text
+of all historical mood entries and write the new emotion, valence and
+intensity back. Entries are analyzed in large batches across a pool of worker
+processes, each loading the model once.
+
+Progress is checkpointed, so an interrupted run picks up where it stopped when
+started again with the same arguments. Use --restart to start over.
+
+Reads from the SQLite user store when --db is given or USER_STORE=sqlite is
+set, otherwise from the per-user JSON files. Store entries are append-only, so
+the store can be backfilled while the app is running; JSON files are rewritten
+whole, so stop the app before backfilling them.
+
+Usage:
+    python backfill_emotions.py --workers 8 --model ./cached_models/emotion_model
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agent.emotion_analysis import EmotionAnalyzer
+from agent.storage.user_store import SQLiteUserStore, SESSION_SOURCE, TRACKER_SOURCE, DEFAULT_DB_PATH
+
+DEFAULT_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+# Set in each worker process by _init_worker
+_analyzer: Optional[EmotionAnalyzer] = None
+_batch_size = 32
+
+
+def _init_worker(model_path: str, offline_mode: bool, cache_dir: str, batch_size: int, threads: int):
+    """
+    Load the analyzer once per worker process.
+
+    Raises:
+        RuntimeError: If the model was requested but couldn't be loaded (the
+            analyzer would silently fall back to the lexicon)
+    """
+    global _analyzer, _batch_size
+    # Workers share the CPU; don't let each one start a thread per core
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _analyzer = EmotionAnalyzer(model_path=model_path, offline_mode=offline_mode, cache_dir=cache_dir)
+    if not offline_mode and _analyzer.analyzer == _analyzer._hybrid_emotion_analyzer:
+        raise RuntimeError(f"Couldn't load emotion model {model_path}; use --offline to backfill with the lexicon")
+    _batch_size = batch_size
+
+
+def _score_texts(texts: List[str]) -> List[Dict[str, Any]]:
+    """Analyze a chunk of texts in a worker."""
+    return _analyzer.analyze_batch(texts, _batch_size) if texts else []
+
+
+def _has_context(entry: Dict[str, Any]) -> bool:
+    context = entry.get("context")
+    return isinstance(context, str) and bool(context.strip())
+
+
+def _apply_result(entry: Dict[str, Any], source: str, result: Dict[str, Any]) -> bool:
+    """
+    Write an analysis result into an entry.
+
+    Returns:
+        Whether the entry's emotion changed
+    """
+    # The session tracker calls it "mood", the other tracker "emotion"
+    field = "mood" if source == SESSION_SOURCE else "emotion"
+    changed = entry.get(field) != result["emotion"]
+    entry[field] = result["emotion"]
+    entry["valence"] = result["valence"]
+    entry["intensity"] = result["intensity"]
+    return changed
+
+
+def _rescore_file(file_path: str, source: str, dry_run: bool) -> Tuple[int, int]:
+    """
+    Re-score all entries of one user's JSON file in a worker.
+
+    Returns:
+        (entries re-scored, entries whose emotion changed)
+    """
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    entries = data.get("entries", []) if source == SESSION_SOURCE else data
+
+    targets = [entry for entry in entries if _has_context(entry)]
+    if not targets:
+        return 0, 0
+
+    results = _score_texts([entry["context"] for entry in targets])
+    changed = sum(_apply_result(entry, source, result) for entry, result in zip(targets, results))
+
+    if not dry_run:
+        temp_path = file_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, file_path)
+    return len(targets), changed
+
+
+def _ordered_results(executor: ProcessPoolExecutor, tasks: Iterable[Tuple[Any, tuple]], window: int) -> Iterator[Tuple[Any, Any]]:
+    """
+    Run (context, args) tasks through the pool, yielding (context, result) in submission order.
+
+    At most `window` tasks are in flight, so tasks are read lazily from the
+    source instead of all at once.
+    """
+    pending = deque()
+    for context, args in tasks:
+        pending.append((context, executor.submit(*args)))
+        if len(pending) >= window:
+            context, future = pending.popleft()
+            yield context, future.result()
+    while pending:
+        context, future = pending.popleft()
+        yield context, future.result()
+
+
+class _Progress:
+    """Prints throughput at most every `interval` seconds."""
+
+    def __init__(self, total: Optional[int], unit: str, interval: float = 5.0):
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.done = 0
+        self.scored = 0
+        self.changed = 0
+        self.started = time.time()
+        self._last_report = self.started
+
+    def update(self, done: int, scored: int, changed: int):
+        self.done += done
+        self.scored += scored
+        self.changed += changed
+        now = time.time()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = max(time.time() - self.started, 1e-9)
+        rate = self.scored / elapsed
+        line = f"{self.done:,}"
+        if self.total:
+            line += f"/{self.total:,}"
+        line += f" {self.unit}, {self.scored:,} entries re-scored ({self.changed:,} changed), {rate:,.0f} entries/s"
+        if self.total and not final and self.done:
+            remaining = (self.total - self.done) * elapsed / self.done
+            line += f", ~{remaining / 60:.1f} min left"
+        if final:
+            line = f"Done in {elapsed:.1f}s: " + line
+        print(line, flush=True)
+
+
+def _load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def backfill_store(
+    store: SQLiteUserStore,
+    executor: ProcessPoolExecutor,
+    checkpoint: Dict[str, Any],
+    checkpoint_path: str,
+    chunk_size: int,
+    window: int,
+    dry_run: bool = False
+) -> _Progress:
+    """
+    Re-score all mood entries in the store, in row order.
+
+    The checkpoint records the last row written back, so resuming skips
+    everything before it.
+    """
+    after_id = checkpoint.get("last_id", 0)
+    progress = _Progress(store.count_all_mood_entries(after_id), "entries")
+
+    def tasks():
+        for rows in store.iter_mood_entry_batches(after_id, chunk_size):
+            targets = [row for row in rows if _has_context(row[3])]
+            texts = [row[3]["context"] for row in targets]
+            yield (rows, targets), (_score_texts, texts)
+
+    for (rows, targets), results in _ordered_results(executor, tasks(), window):
+        changed = sum(_apply_result(entry, source, result) for (_, _, source, entry), result in zip(targets, results))
+        if not dry_run:
+            if targets:
+                store.update_mood_entries([(row_id, entry) for row_id, _, _, entry in targets])
+            checkpoint["last_id"] = rows[-1][0]
+            _save_checkpoint(checkpoint_path, checkpoint)
+        progress.update(len(rows), len(targets), changed)
+    return progress
+
+
+def backfill_files(
+    user_data_dir: str,
+    data_dir: str,
+    executor: ProcessPoolExecutor,
+    checkpoint: Dict[str, Any],
+    checkpoint_path: str,
+    window: int,
+    dry_run: bool = False
+) -> _Progress:
+    """
+    Re-score the mood entries of every per-user JSON file, one file per task.
+
+    The checkpoint records the files already rewritten, by absolute path.
+    """
+    user_data_dir, data_dir = os.path.abspath(user_data_dir), os.path.abspath(data_dir)
+    files = [(path, SESSION_SOURCE) for path in sorted(glob.glob(os.path.join(user_data_dir, "*_mood_data.json")))]
+    files += [(path, TRACKER_SOURCE) for path in sorted(glob.glob(os.path.join(data_dir, "*_mood.json")))]
+
+    completed = set(checkpoint.get("completed_files", []))
+    remaining = [(path, source) for path, source in files if path not in completed]
+    progress = _Progress(len(remaining), "files")
+
+    tasks = ((path, (_rescore_file, path, source, dry_run)) for path, source in remaining)
+    last_saved = time.time()
+    for path, (scored, changed) in _ordered_results(executor, tasks, window):
+        completed.add(path)
+        progress.update(1, scored, changed)
+        # Re-scoring a file twice is harmless, so the checkpoint is saved periodically rather than per file
+        if not dry_run and time.time() - last_saved >= 5.0:
+            checkpoint["completed_files"] = sorted(completed)
+            _save_checkpoint(checkpoint_path, checkpoint)
+            last_saved = time.time()
+
+    if not dry_run:
+        checkpoint["completed_files"] = sorted(completed)
+        _save_checkpoint(checkpoint_path, checkpoint)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score the emotion of all stored mood entries")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Emotion model name or path")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the lexicon and rule-based analyzer instead of the model")
+    parser.add_argument("--cache-dir", default="./cached_models", help="Directory to cache models")
+    parser.add_argument("--db", default=None,
+                        help="SQLite user store to backfill (default: USER_STORE_PATH if USER_STORE=sqlite)")
+    parser.add_argument("--user-data-dir", default="./user_data", help="Directory with *_mood_data.json files")
+    parser.add_argument("--data-dir", default="./data", help="Directory with *_mood.json files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Entries sent to a worker at a time")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per model forward pass")
+    parser.add_argument("--checkpoint", default="./data/backfill_checkpoint.json", help="Checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Re-score and report without writing anything")
+    args = parser.parse_args()
+
+    db_path = args.db
+    if db_path is None and os.environ.get("USER_STORE", "").lower() == "sqlite":
+        db_path = os.environ.get("USER_STORE_PATH", DEFAULT_DB_PATH)
+
+    target = {"db": os.path.abspath(db_path)} if db_path else {
+        "user_data_dir": os.path.abspath(args.user_data_dir),
+        "data_dir": os.path.abspath(args.data_dir)
+    }
+    model = "lexicon" if args.offline else args.model
+
+    checkpoint = None if args.restart or args.dry_run else _load_checkpoint(args.checkpoint)
+    if checkpoint is not None:
+        if checkpoint.get("target") != target or checkpoint.get("model") != model:
+            print(f"Checkpoint {args.checkpoint} is for a different model or data location; "
+                  f"use --restart to start over")
+            return
+        print(f"Resuming from {args.checkpoint}")
+    else:
+        checkpoint = {"target": target, "model": model}
+
+    checkpoint_dir = os.path.dirname(args.checkpoint)
+    if checkpoint_dir and not args.dry_run:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    workers = max(1, args.workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(args.model, args.offline, args.cache_dir, args.batch_size, threads)
+    )
+    # Enough chunks in flight to keep every worker busy while results are written back
+    window = workers * 2
+
+    try:
+        with executor:
+            if db_path:
+                print(f"Backfilling mood entries in {db_path} with {workers} workers")
+                store = SQLiteUserStore(db_path)
+                try:
+                    progress = backfill_store(store, executor, checkpoint, args.checkpoint,
+                                              args.chunk_size, window, args.dry_run)
+                finally:
+                    store.close()
+            else:
+                print(f"Backfilling mood files in {args.user_data_dir} and {args.data_dir} with {workers} workers")
+                progress = backfill_files(args.user_data_dir, args.data_dir, executor, checkpoint,
+                                          args.checkpoint, window, args.dry_run)
+    except BrokenProcessPool:
+        # The worker's error (e.g. the model failing to load) has been printed above
+        print("Backfill stopped: a worker process failed to start")
+        return
+
+    progress.report(final=True)
+    if args.dry_run:
+        print("Dry run: nothing was written.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+End-to-end benchmark for the chat pipeline.
+
+Drives MentalHealthAgent.workflow directly, or the FastAPI /chat endpoint in
+process, with synthetic multi-user conversation traces. Runs fully offline:
+the offline fallback LLM and embeddings stand in for the real providers and
+Hugging Face downloads are disabled, so results are comparable across
+machines without network access.
+
+Reports p50/p95/p99 latency, requests/sec, RSS and a per-node latency
+breakdown, optionally written to JSON and compared against a previous run.
+
+Run from the agent directory:
+    python -m benchmarks.chat_pipeline --users 20 --turns 10
+    python -m benchmarks.chat_pipeline --target api --concurrency 8 --output run.json
+    python -m benchmarks.chat_pipeline --compare baseline.json
+    python -m benchmarks.chat_pipeline --provider mock --target api --concurrency 16
+
+With --provider mock the LLM call is simulated by agent.mock_llm.MockLLM, so
+realistic provider latency (configured through MOCK_LLM_* variables) shows up
+in the results; --provider mock-http sends it to a running mock server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Offline stand-ins must be selected before any agent module is imported
+os.environ["OFFLINE_MODE"] = "true"
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# Messages for synthetic conversations, grouped by the kind of turn they represent
+MESSAGE_BANK = {
+    "greeting": [
+        "Hi there",
+        "Hello, I wanted to check in today",
+        "Hey, it's me again"
+    ],
+    "anxious": [
+        "I'm really anxious about my exam tomorrow and can't stop worrying",
+        "My mind keeps racing at night and I feel so nervous",
+        "Work has been so stressful lately, I feel tense all the time"
+    ],
+    "sad": [
+        "I've been feeling really sad and down this week",
+        "I feel lonely since my friend moved away",
+        "Everything feels gloomy and I'm upset most days"
+    ],
+    "positive": [
+        "I had a great day today and feel happy",
+        "I'm feeling grateful for my family",
+        "Things are going well and I'm proud of my progress"
+    ],
+    "tired": [
+        "I'm exhausted and haven't been sleeping well",
+        "I feel tired all the time lately"
+    ],
+    "crisis": [
+        "I feel hopeless and I don't want to live anymore",
+        "Sometimes I think everyone would be better off without me"
+    ]
+}
+
+# Relative frequency of each kind of turn in a trace
+TURN_WEIGHTS = {
+    "greeting": 0.1,
+    "anxious": 0.3,
+    "sad": 0.25,
+    "positive": 0.2,
+    "tired": 0.13,
+    "crisis": 0.02
+}
+
+# Workflow nodes reported in the per-node breakdown
+WORKFLOW_NODES = (
+    "safety_check",
+    "emotional_assessment",
+    "mood_tracking",
+    "therapy_recommendations",
+    "clinical_response",
+    "update_gamification_node",
+    "escalate"
+)
+
+
+def generate_traces(users: int, turns: int, seed: int = 42) -> List[Tuple[str, str]]:
+    """
+    Generate interleaved multi-user conversation turns.
+
+    Args:
+        users: Number of simulated users
+        turns: Turns per user
+        seed: Random seed, so traces are identical across runs
+
+    Returns:
+        List of (user_id, message) in the order they are sent
+    """
+    rng = random.Random(seed)
+    kinds = list(TURN_WEIGHTS)
+    weights = [TURN_WEIGHTS[kind] for kind in kinds]
+
+    conversations = []
+    for user in range(users):
+        user_id = f"bench_user_{user:04d}"
+        messages = [
+            rng.choice(MESSAGE_BANK[rng.choices(kinds, weights)[0]])
+            for _ in range(turns)
+        ]
+        conversations.append([(user_id, message) for message in messages])
+
+    # Round-robin across users, like concurrent conversations arriving
+    return [
+        conversation[turn]
+        for turn in range(turns)
+        for conversation in conversations
+    ]
+
+
+def initial_state(message: str) -> Dict[str, Any]:
+    """Initial workflow state for a turn, as built by the /chat handler."""
+    return {
+        "user_input": message,
+        "history": [],
+        "response": "",
+        "needs_escalation": False,
+        "emotional_state": {
+            "emotion": "neutral",
+            "confidence": 0.5,
+            "valence": 0.0,
+            "is_crisis": False,
+            "intensity": 0.1
+        },
+        "therapeutic_recommendations": None,
+        "mood_insights": None,
+        "gamification_update": None
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile with linear interpolation between closest ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Summarize per-request latencies (seconds) into milliseconds and throughput."""
+    return {
+        "requests": len(latencies),
+        "elapsed_s": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0
+    }
+
+
+def _node_breakdown() -> Dict[str, Dict[str, float]]:
+    """Per-node call counts and mean latency from the observability histograms."""
+    from agent import observability
+
+    breakdown = {}
+    for node in WORKFLOW_NODES:
+        snapshot = observability.NODE_LATENCY.snapshot(node=node)
+        if snapshot["count"]:
+            breakdown[node] = {
+                "calls": snapshot["count"],
+                "total_ms": snapshot["sum"] * 1000,
+                "mean_ms": snapshot["sum"] / snapshot["count"] * 1000
+            }
+    return breakdown
+
+
+def run_workflow(traces: List[Tuple[str, str]], provider: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Drive MentalHealthAgent.workflow directly, one agent per user.
+
+    Args:
+        traces: (user_id, message) turns
+        provider: LLM provider passed to each agent
+
+    Returns:
+        Latency summary with agent setup cost
+    """
+    from agent.workflow import MentalHealthAgent
+
+    agents = {}
+    setup_start = time.perf_counter()
+    for user_id, _ in traces:
+        if user_id not in agents:
+            agents[user_id] = MentalHealthAgent(provider=provider, user_id=user_id)
+    setup_elapsed = time.perf_counter() - setup_start
+
+    latencies = []
+    start = time.perf_counter()
+    for user_id, message in traces:
+        turn_start = time.perf_counter()
+        agents[user_id].workflow.invoke(initial_state(message))
+        latencies.append(time.perf_counter() - turn_start)
+    elapsed = time.perf_counter() - start
+
+    summary = _latency_summary(latencies, elapsed)
+    summary["agent_setup_ms"] = setup_elapsed / len(agents) * 1000 if agents else 0.0
+    return summary
+
+
+async def _run_api(traces: List[Tuple[str, str]], concurrency: int) -> Dict[str, Any]:
+    """Send the traces to the /chat endpoint in process with bounded concurrency."""
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("httpx is required for --target api (pip install httpx)")
+
+    from main import app
+
+    # Turns for the same user stay ordered; different users run concurrently
+    queues: Dict[str, List[str]] = {}
+    for user_id, message in traces:
+        queues.setdefault(user_id, []).append(message)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+
+        async def converse(user_id: str, messages: List[str]):
+            nonlocal errors
+            for message in messages:
+                async with semaphore:
+                    turn_start = time.perf_counter()
+                    response = await client.post("/chat", json={"message": message, "user_id": user_id})
+                    latencies.append(time.perf_counter() - turn_start)
+                    if response.status_code != 200:
+                        errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(user_id, messages) for user_id, messages in queues.items()))
+        elapsed = time.perf_counter() - start
+
+    summary = _latency_summary(latencies, elapsed)
+    summary["errors"] = errors
+    summary["concurrency"] = concurrency
+    return summary
+
+
+def run_api(traces: List[Tuple[str, str]], concurrency: int = 1) -> Dict[str, Any]:
+    """
+    Drive the FastAPI /chat endpoint in process.
+
+    The first turn for each user includes creating its chat instance, as it
+    would in the server.
+
+    Args:
+        traces: (user_id, message) turns
+        concurrency: Maximum requests in flight
+
+    Returns:
+        Latency summary
+    """
+    return asyncio.run(_run_api(traces, concurrency))
+
+
+def _tree_files(root: str) -> set:
+    """Files under a directory, ignoring bytecode caches."""
+    return {
+        os.path.join(path, name)
+        for path, dirs, names in os.walk(root)
+        if "__pycache__" not in path.split(os.sep)
+        for name in names
+    }
+
+
+def run(
+    target: str = "workflow",
+    users: int = 10,
+    turns: int = 10,
+    concurrency: int = 1,
+    seed: int = 42,
+    provider: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run the benchmark in a scratch working directory.
+
+    Args:
+        target: 'workflow' or 'api'
+        users: Number of simulated users
+        turns: Turns per user
+        concurrency: Maximum requests in flight (api target only)
+        seed: Trace seed
+        provider: LLM provider, e.g. 'mock' (default: offline fallback LLM)
+
+    Returns:
+        Benchmark results
+    """
+    from agent import observability
+
+    from agent.engagement.write_behind import close_all
+
+    traces = generate_traces(users, turns, seed)
+    rss_before = current_rss_mb()
+    original_cwd = os.getcwd()
+    files_before = _tree_files(original_cwd)
+
+    # Mood, gamification and user id files are written relative to the cwd
+    with tempfile.TemporaryDirectory(prefix="mindguard-bench-") as scratch:
+        sys.path.insert(0, original_cwd)
+        os.chdir(scratch)
+        try:
+            observability.REGISTRY.reset()
+            if target == "api":
+                # The /chat handler picks its provider from the environment
+                if provider:
+                    os.environ["LLM_PROVIDER"] = provider
+                results = run_api(traces, concurrency)
+            else:
+                results = run_workflow(traces, provider)
+        finally:
+            # Buffered gamification profiles would otherwise be flushed at exit
+            close_all()
+            os.chdir(original_cwd)
+            sys.path.remove(original_cwd)
+
+    leaked = _tree_files(original_cwd) - files_before
+    assert not leaked, f"Benchmark wrote outside its scratch directory: {sorted(leaked)}"
+
+    results.update({
+        "target": target,
+        "users": users,
+        "turns_per_user": turns,
+        "seed": seed,
+        "provider": provider or "offline",
+        "rss_before_mb": rss_before,
+        "rss_after_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+        "nodes": _node_breakdown(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    })
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Print the change from a baseline run and flag regressions.
+
+    Args:
+        current: Results of this run
+        baseline: Results of a previous run
+        tolerance: Allowed relative slowdown (0.1 = 10%)
+
+    Returns:
+        True if no latency or throughput metric regressed beyond tolerance
+    """
+    ok = True
+    print(f"\nComparison with baseline ({baseline.get('timestamp', 'unknown')}):")
+
+    # (metric, True if higher is better)
+    metrics = [
+        ("p50_ms", False), ("p95_ms", False), ("p99_ms", False),
+        ("requests_per_sec", True), ("peak_rss_mb", False)
+    ]
+    for metric, higher_is_better in metrics:
+        before, after = baseline.get(metric), current.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {metric:<18} {before:10.2f} -> {after:10.2f} ({change:+.1%}){flag}")
+
+    for node, stats in current.get("nodes", {}).items():
+        before = baseline.get("nodes", {}).get(node, {}).get("mean_ms")
+        if before:
+            change = (stats["mean_ms"] - before) / before
+            print(f"  node {node:<26} {before:8.3f} -> {stats['mean_ms']:8.3f} ms ({change:+.1%})")
+
+    return ok
+
+
+def print_results(results: Dict[str, Any]):
+    """Print a human-readable summary."""
+    print(f"Target: {results['target']}, users: {results['users']}, turns/user: {results['turns_per_user']}")
+    print(f"Requests: {results['requests']} in {results['elapsed_s']:.2f}s "
+          f"({results['requests_per_sec']:.1f} req/s)")
+    print(f"Latency ms  p50 {results['p50_ms']:.2f}  p95 {results['p95_ms']:.2f}  "
+          f"p99 {results['p99_ms']:.2f}  max {results['max_ms']:.2f}")
+    print(f"RSS MB  before {results['rss_before_mb']:.1f}  after {results['rss_after_mb']:.1f}  "
+          f"peak {results['peak_rss_mb']:.1f}")
+    if "agent_setup_ms" in results:
+        print(f"Agent setup: {results['agent_setup_ms']:.2f} ms/user")
+    if results.get("errors"):
+        print(f"Errors: {results['errors']}")
+
+    if results["nodes"]:
+        print("Per-node mean latency:")
+        for node, stats in results["nodes"].items():
+            print(f"  {node:<26} {stats['mean_ms']:8.3f} ms  ({stats['calls']} calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MindGuard chat pipeline offline")
+    parser.add_argument("--target", choices=["workflow", "api"], default="workflow",
+                        help="Drive the LangGraph workflow directly or the /chat endpoint")
+    parser.add_argument("--users", type=int, default=10, help="Number of simulated users")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per user")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight (api target)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for synthetic traces")
+    parser.add_argument("--provider", choices=["mock", "mock-http"],
+                        help="Simulate provider latency with the mock LLM")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative regression allowed before --compare fails")
+    args = parser.parse_args()
+
+    results = run(args.target, args.users, args.turns, args.concurrency, args.seed, args.provider)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark for PDF text extraction.
+
+Generates a synthetic multi-page report and times the original
+concatenating extractor against the streaming extractor, in-process and
+with worker processes.
+
+Run from the agent directory:
+    python -m benchmarks.pdf_extraction --pages 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, Optional, Sequence
+
+import fitz  # PyMuPDF
+
+from agent.pdf_text import iter_pdf_pages, iter_pdf_pages_parallel
+
+WORDS = (
+    "patient reports low mood poor sleep anxiety moderate stress work family "
+    "medication sertraline therapy session assessment history symptoms appetite "
+    "concentration energy support plan follow review clinician observed affect"
+).split()
+
+
+def make_report(path: str, pages: int, lines_per_page: int = 60, seed: int = 0):
+    """Write a PDF with `pages` pages of dense text."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def _concat_extract(pdf_path: str) -> str:
+    """The original extractor: one string grown page by page."""
+    doc = fitz.open(pdf_path)
+    text = ""
+    for page in doc:
+        text += page.get_text()
+    doc.close()
+    return text
+
+
+def _time(func, repeat: int) -> float:
+    """Best wall time over `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(pages: int = 500, workers: Sequence[int] = (2, 4), repeat: int = 3, path: Optional[str] = None) -> Dict[str, float]:
+    """
+    Run the benchmark.
+
+    Args:
+        pages: Pages in the generated report
+        workers: Worker counts to time the parallel extractor with
+        repeat: Runs per case (the best is reported)
+        path: Existing PDF to use instead of a generated one
+
+    Returns:
+        Milliseconds per extraction for each case
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if path is None:
+            path = os.path.join(temp_dir, "report.pdf")
+            make_report(path, pages)
+
+        expected = _concat_extract(path)
+        results = {"concat (original)": _time(lambda: _concat_extract(path), repeat)}
+        results["streaming join"] = _time(lambda: "".join(iter_pdf_pages(path)), repeat)
+        assert "".join(iter_pdf_pages(path)) == expected
+
+        for count in workers:
+            assert "".join(iter_pdf_pages_parallel(path, count)) == expected
+            results[f"parallel x{count}"] = _time(lambda: "".join(iter_pdf_pages_parallel(path, count)), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction")
+    parser.add_argument("--pages", type=int, default=500, help="Pages in the generated report")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Worker counts to try")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case")
+    parser.add_argument("--pdf", default=None, help="Benchmark an existing PDF instead")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.workers, args.repeat, args.pdf)
+    pages = args.pages if args.pdf is None else fitz.open(args.pdf).page_count
+    print(f"Pages: {pages}")
+    for name, millis in results.items():
+        print(f"{name:<20} {millis:9.1f} ms  {pages / millis * 1000:8.0f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
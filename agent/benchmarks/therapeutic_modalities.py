@@ -0,0 +1,87 @@
+"""
+Benchmark for therapeutic recommendation lookups.
+
+Times TherapeuticModalities.recommend_for_emotion and the per-modality
+recommenders across every emotion they know about, at each intensity band,
+plus duration-based meditation lookups.
+
+Run from the agent directory:
+    python -m benchmarks.therapeutic_modalities
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+
+from agent.therapeutic_modalities import (
+    TherapeuticModalities,
+    ANALYZER_EMOTIONS,
+    RECOMMENDATION_CATEGORY_MAP,
+    MUSIC_EMOTION_MAP,
+    MEDITATION_EMOTION_MAP,
+    BREATHING_EMOTION_MAP,
+)
+
+# One intensity per band used by the lookup tables
+INTENSITIES = (0.3, 0.75, 0.9)
+
+# Available-time budgets in seconds for duration lookups
+DURATIONS = (60, 300, 600, 900, 1800)
+
+
+def _all_emotions() -> List[str]:
+    """Every emotion any of the modalities maps, plus the analyzer's labels."""
+    emotions = (
+        set(ANALYZER_EMOTIONS) | set(RECOMMENDATION_CATEGORY_MAP) | set(MUSIC_EMOTION_MAP)
+        | set(MEDITATION_EMOTION_MAP) | set(BREATHING_EMOTION_MAP)
+    )
+    return sorted(emotions)
+
+
+def _time_calls(func: Callable, cases: List[Tuple], repeat: int) -> float:
+    """Return the mean time per call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in cases:
+            func(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(cases)) * 1e6
+
+
+def run(repeat: int = 200) -> Dict[str, float]:
+    """
+    Run the benchmark.
+
+    Args:
+        repeat: Number of passes over all (emotion, intensity) cases
+
+    Returns:
+        Mean microseconds per call for each recommender
+    """
+    therapies = TherapeuticModalities()
+    emotions = _all_emotions()
+    cases = [(emotion, intensity) for emotion in emotions for intensity in INTENSITIES]
+
+    return {
+        "recommend_for_emotion": _time_calls(therapies.recommend_for_emotion, cases, repeat),
+        "music_therapy": _time_calls(therapies.music_therapy.recommend_for_emotion, cases, repeat),
+        "meditation": _time_calls(therapies.meditation.recommend_for_emotion, [(e,) for e in emotions], repeat),
+        "breathing": _time_calls(therapies.breathing.get_exercise, cases, repeat),
+        "meditation_by_duration": _time_calls(
+            therapies.meditation.get_meditation_by_duration, [(s,) for s in DURATIONS], repeat
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark therapeutic recommendation lookups")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over all emotions")
+    args = parser.parse_args()
+
+    print(f"Emotions: {len(_all_emotions())}, intensities: {INTENSITIES}")
+    for name, micros in run(args.repeat).items():
+        print(f"{name:<24} {micros:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
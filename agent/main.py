@@ -1,10 +1,17 @@
+import asyncio
 import os
+import re
 import uuid
 from typing import Dict, Optional, List
 from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from agent.workflow import MentalHealthAgent
+from agent.engagement.leaderboard import get_leaderboard
+from agent.mood_tracking import MoodTracker
+from agent.tracking.charts import FORMATS, get_renderer
+from agent import observability
 
 from dotenv import load_dotenv
 load_dotenv()  # Loads API keys from .env file
@@ -20,6 +27,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def build_leaderboard():
+    """Build the leaderboard before serving, so no chat request pays for it."""
+    get_leaderboard()
+
 # Store chat instances for different users
 chat_instances: Dict[str, 'MentalHealthChat'] = {}
 
@@ -120,6 +132,10 @@ class MentalHealthChat:
 
     def _determine_provider(self):
         """Determine which provider to use based on available API keys."""
+        # An explicit provider (e.g. 'mock' for load testing) takes precedence
+        if os.environ.get("LLM_PROVIDER"):
+            return os.environ["LLM_PROVIDER"].lower()
+        
         # Set priority order: OpenAI, Groq, Gemini
         if os.environ.get("OPENAI_API_KEY"):
             return "openai"
@@ -145,23 +161,24 @@ class MentalHealthChat:
 
     async def get_response(self, message: str) -> Dict:
         try:
-            result = self.agent.workflow.invoke({
-                "user_input": message,
-                "history": [],
-                "response": "",
-                "needs_escalation": False,
-                "emotional_state": {
-                    "emotion": "neutral",
-                    "confidence": 0.5,
-                    "valence": 0.0,
-                    "is_crisis": False,
-                    "intensity": 0.1
-                },
-                "therapeutic_recommendations": None,
-                "mood_insights": None,
-                "gamification_update": None,
-                "response_guidelines": RESPONSE_GUIDELINES
-            })
+            with observability.span("chat.turn", provider=self.provider_name):
+                result = self.agent.workflow.invoke({
+                    "user_input": message,
+                    "history": [],
+                    "response": "",
+                    "needs_escalation": False,
+                    "emotional_state": {
+                        "emotion": "neutral",
+                        "confidence": 0.5,
+                        "valence": 0.0,
+                        "is_crisis": False,
+                        "intensity": 0.1
+                    },
+                    "therapeutic_recommendations": None,
+                    "mood_insights": None,
+                    "gamification_update": None,
+                    "response_guidelines": RESPONSE_GUIDELINES
+                })
 
             response = result.get("response", "I'm here to listen. Could you tell me more about that?")
             words = response.split()
@@ -384,8 +401,81 @@ async def get_health_history(user_id: str):
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for workflow nodes, LLM calls and escalations."""
+    return Response(content=observability.render_metrics(), media_type=observability.CONTENT_TYPE_LATEST)
+
+@app.get("/leaderboard")
+async def leaderboard_top(board: str = "points", limit: int = 10, offset: int = 0):
+    """Top users by points, level or streak."""
+    try:
+        entries = await asyncio.to_thread(get_leaderboard().top, board, min(max(limit, 0), 100), max(offset, 0))
+        return {"board": board, "entries": entries}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/leaderboard/cohorts")
+async def leaderboard_cohorts(by: str = "tier"):
+    """Average points, level and streak per tier, level or signup month."""
+    try:
+        return {"by": by, "cohorts": await asyncio.to_thread(get_leaderboard().cohort_stats, by)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/leaderboard/users/{user_id}")
+async def leaderboard_rank(user_id: str, board: str = "points"):
+    """A user's rank on a leaderboard."""
+    try:
+        rank = await asyncio.to_thread(get_leaderboard().rank, user_id, board)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rank is None:
+        raise HTTPException(status_code=404, detail=f"User {user_id} is not ranked")
+    return rank
+
+@app.get("/mood-chart/{user_id}")
+async def mood_chart(user_id: str, report: str = "weekly", format: str = "png"):
+    """A user's mood chart as PNG or SVG, or its data series with format=json."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    if format != "json" and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    tracker = await asyncio.to_thread(MoodTracker, user_id)
+    try:
+        data = tracker.get_chart_data(report)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "json":
+        return data
+    image = await get_renderer().render_async(user_id, data, format)
+    return Response(content=image, media_type=FORMATS[format])
+
 if __name__ == "__main__":
+    import argparse
+    import secrets
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+
+    parser = argparse.ArgumentParser(description="Run the MindGuard API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="API worker processes; with more than one, models are served by a single model server "
+                             "and the leaderboard needs USER_STORE=sqlite")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        if os.environ.get("USER_STORE", "").lower() != "sqlite":
+            print("Warning: without USER_STORE=sqlite each worker keeps its own partial leaderboard")
+        from agent.model_server import start_server_process, parse_address, DEFAULT_ADDRESS
+
+        # Workers inherit these and send model calls to the one server process
+        os.environ.setdefault("MODEL_SERVER_ADDRESS", DEFAULT_ADDRESS)
+        os.environ.setdefault("MODEL_SERVER_AUTHKEY", secrets.token_hex(16))
+        model_server = start_server_process(parse_address(os.environ["MODEL_SERVER_ADDRESS"]))
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+        model_server.terminate()
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
 
 